@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+# Python module
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+# Cost of render budgets and how they bound pathological messages.
+#
+#     python benchmarks/bench_budget.py [iterations]
+#
+# Translates a small message without a budget and with a budget which isn't
+# reached (the overhead of the checks), then a list with 100000 items without
+# a budget and with max_length/max_time budgets (the bounded tail).
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdark.i18n import I18NMessage, RenderBudget, TranslationService
+
+EN_LOCALE = 'en'
+
+def create_service(budget):
+    ts = TranslationService(default_locale=EN_LOCALE, budget=budget)
+    ts.message_provider.merge_catalogs({
+        EN_LOCALE: {
+            'pdark.i18n.number.int': '%d',
+            'pdark.i18n.list.comma': ', ',
+            'pdark.i18n.list.and': ' and ',
+            'bench.hello': ['Hello, ', {'arg': 'name'}, '! You have ', {'arg': 'count'}, ' messages.'],
+            'bench.items': ['Items: ', {'arg': 'values'}],
+        },
+    })
+    return ts
+
+def timed(iterations, func):
+    start = time.perf_counter()
+    for i in range(iterations):
+        func()
+    return (time.perf_counter() - start) * 1e6 / iterations
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    
+    small = I18NMessage('bench.hello', None, name='Bob', count=3)
+    huge = I18NMessage('bench.items', None, values=list(range(100000)))
+    
+    cases = (
+        ('small, no budget', None, small, iterations),
+        ('small, budget', RenderBudget(max_time=1, max_length=1000, max_depth=20), small, iterations),
+        ('huge, no budget', None, huge, 10),
+        ('huge, max_length', RenderBudget(max_length=1000), huge, 100),
+        ('huge, max_time', RenderBudget(max_time=0.005), huge, 100),
+    )
+    
+    print('%-18s %12s %8s' % ('case', 'us/call', 'length'))
+    for name, budget, message, n in cases:
+        ts = create_service(budget)
+        length = len(ts.translate(message))
+        print('%-18s %12.2f %8d' % (name, timed(n, lambda: ts.translate(message)), length))
+
+if __name__ == '__main__':
+    main()
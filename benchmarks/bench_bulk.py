@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+# Python module
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Measure the parallel efficiency of BulkRenderer.
+#
+#     python benchmarks/bench_bulk.py [messages] [max workers]
+#
+# Efficiency is the speed-up over one in-process worker divided by the number
+# of workers; 1.0 means perfect scaling.
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import SyntheticWorkload
+import pdark.i18n.babel
+from pdark.i18n.bulk import BulkRenderer, CatalogSetup
+
+def run(setup, messages, locale, workers, chunk_size):
+    with BulkRenderer(setup, max_workers=workers, chunk_size=chunk_size) as renderer:
+        # Start the pool before measuring
+        list(renderer.render(messages[:1], locale))
+        
+        start = time.perf_counter()
+        for text in renderer.render(messages, locale):
+            pass
+        return time.perf_counter() - start
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)
+    
+    workload = SyntheticWorkload(keys=1000, nesting=2)
+    messages = [message for message, locale in workload.messages(count)]
+    locale = workload.locales[-1]
+    setup = CatalogSetup(workload.default_locale, workload.catalogs(), pdark.i18n.babel.setup)
+    
+    print('%d messages, %d CPUs' % (count, os.cpu_count() or 1))
+    print('%-8s %12s %10s' % ('workers', 'msg/s', 'efficiency'))
+    
+    serial = None
+    workers = 1
+    while workers <= max_workers:
+        duration = run(setup, messages, locale, workers, 1000)
+        if serial is None:
+            serial = duration
+        print('%-8d %12.0f %10.2f' % (workers, count / duration, serial / duration / workers))
+        workers *= 2
+
+if __name__ == '__main__':
+    main()
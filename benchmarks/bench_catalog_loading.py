@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+# Python module
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Compare loading a generated catalog with register_message(), with CatalogLoader
+# in one process and with CatalogLoader in process pools of increasing size.
+#
+# The main process has to receive and merge the results of all workers, so
+# the time for that bounds the speedup of any number of cores. It's measured
+# for dicts and for the PackedCatalogs which the workers send.
+#
+#     python benchmarks/bench_catalog_loading.py [keys] [locales]
+
+import json
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdark.i18n import TranslationService
+from pdark.i18n.catalog import CatalogLoader, check_catalog, pack_catalog, read_catalog
+
+def generate_catalogs(directory, keys, locales):
+    per_locale = keys // locales
+    for i in range(locales):
+        catalog = {}
+        for k in range(per_locale):
+            key = 'app.module%d.message%d' % (k % 100, k)
+            if k % 3 == 0:
+                catalog[key] = 'Plain text number %d in locale %d' % (k, i)
+            else:
+                catalog[key] = ['Value ', {'arg': 'value'}, ' of ', {'arg': 'items', 'type': 'or'}, ' (%d)' % k]
+        
+        with open(os.path.join(directory, 'l%02d.json' % i), 'w', encoding='utf-8') as fh:
+            json.dump(catalog, fh)
+
+def register_all(directory):
+    ts = TranslationService(default_locale='l00')
+    start = time.perf_counter()
+    count = 0
+    for locale, path in CatalogLoader(None).find_catalogs(directory).items():
+        for key, pattern in read_catalog(path).items():
+            ts.message_provider.register_message(key, locale, pattern)
+            count += 1
+    return time.perf_counter() - start, count
+
+def load(directory, max_workers):
+    ts = TranslationService(default_locale='l00')
+    start = time.perf_counter()
+    counts = CatalogLoader(ts.message_provider, max_workers=max_workers).load_directory(directory)
+    return time.perf_counter() - start, sum(counts.values())
+
+def receive(directory, worker):
+    '''Time the part of a parallel load which runs in the main process.'''
+    files = CatalogLoader(None).find_catalogs(directory)
+    results = [pickle.dumps(worker(locale, path, None)) for locale, path in files.items()]
+    
+    ts = TranslationService(default_locale='l00')
+    start = time.perf_counter()
+    catalogs = dict(pickle.loads(result) for result in results)
+    ts.message_provider.merge_catalogs(catalogs)
+    return time.perf_counter() - start
+
+def main():
+    keys = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    locales = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    
+    directory = tempfile.mkdtemp(prefix='pdark-i18n-catalogs-')
+    try:
+        generate_catalogs(directory, keys, locales)
+        
+        eager, count = register_all(directory)
+        print('%d messages in %d locales, %d CPUs' % (count, locales, os.cpu_count()))
+        print('register_message %7.3fs' % eager)
+        
+        serial, count = load(directory, 1)
+        print('workers=1        %7.3fs' % serial)
+        
+        validated = CatalogLoader(TranslationService(default_locale='l00').message_provider, max_workers=1, validate=True)
+        start = time.perf_counter()
+        validated.load_directory(directory)
+        print('validate=True    %7.3fs' % (time.perf_counter() - start))
+        
+        for name, worker in (('dict', check_catalog), ('packed', pack_catalog)):
+            duration = receive(directory, worker)
+            print('main process, %-6s results %7.3fs, max speedup %.1f' % (name, duration, serial / duration))
+        
+        workers = 2
+        while workers <= os.cpu_count():
+            duration, count = load(directory, workers)
+            print('workers=%-2d       %7.3fs speedup %.2f' % (workers, duration, serial / duration))
+            workers *= 2
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+# Python module
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Startup with compiled catalogs compared to parsing the JSON catalogs.
+#
+#     python benchmarks/bench_compiled.py [keys] [locales] [messages]
+#
+# Writes a synthetic workload as JSON catalogs and compiles them with
+# pdark.i18n.compiler. Each sample is a new process which loads the texts and
+# renders the messages twice: The first time, the texts are parsed or the
+# compiled modules are imported; the second time shows the steady state.
+# The .pyc files are warm, like in a deployed application.
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import SyntheticWorkload
+from pdark.i18n.compiler import CatalogCompiler
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS)
+
+SAMPLE = '''
+import sys
+import time
+sys.path[:0] = [%(root)r, %(benchmarks)r, %(directory)r]
+from synthetic import SyntheticWorkload
+from pdark.i18n import MessageParser, TranslationService
+from pdark.i18n.catalog import CatalogLoader
+from pdark.i18n.compiled import CompiledMessageProvider
+
+workload = SyntheticWorkload(keys=%(keys)d, locales=%(locales)d, functions=0)
+messages = workload.messages(%(messages)d)
+ts = TranslationService(default_locale=workload.default_locale)
+
+t0 = time.perf_counter()
+if %(compiled)r:
+    ts.message_provider = CompiledMessageProvider(workload.default_locale, MessageParser(ts), 'compiled_texts')
+else:
+    CatalogLoader(ts.message_provider, max_workers=1).load_directory(%(catalogs)r)
+t1 = time.perf_counter()
+for message, locale in messages:
+    ts.translate(message, locale)
+t2 = time.perf_counter()
+for message, locale in messages:
+    ts.translate(message, locale)
+t3 = time.perf_counter()
+print('%%.0f %%.0f %%.0f' %% ((t1 - t0) * 1e3, (t2 - t1) * 1e3, (t3 - t2) * 1e3))
+'''
+
+def main():
+    keys = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    locales = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    messages = int(sys.argv[3]) if len(sys.argv) > 3 else 20000
+    
+    directory = tempfile.mkdtemp(prefix='pdark-i18n-compiled-')
+    try:
+        catalogs = os.path.join(directory, 'catalogs')
+        os.mkdir(catalogs)
+        workload = SyntheticWorkload(keys=keys, locales=locales, functions=0)
+        for locale, catalog in workload.catalogs().items():
+            with open(os.path.join(catalogs, locale + '.json'), 'w', encoding='utf-8') as fh:
+                json.dump(catalog, fh)
+        CatalogCompiler().compile_directory(catalogs, os.path.join(directory, 'compiled_texts'))
+        
+        env = dict(os.environ, PYTHONPYCACHEPREFIX=os.path.join(directory, 'pycache'))
+        env.pop('PYTHONDONTWRITEBYTECODE', None)
+        
+        print('%d keys, %d locales, %d messages' % (keys, locales, messages))
+        print('%-10s %10s %14s %14s' % ('texts', 'load ms', 'first run ms', 'second run ms'))
+        for name, compiled in (('parsed', False), ('compiled', True)):
+            script = SAMPLE % dict(root=ROOT, benchmarks=BENCHMARKS, directory=directory, catalogs=catalogs,
+                keys=keys, locales=locales, messages=messages, compiled=compiled)
+            samples = []
+            # The first run writes the .pyc files
+            for i in range(4):
+                output = subprocess.run([sys.executable, '-c', script], env=env, check=True, capture_output=True, text=True).stdout
+                samples.append([int(x) for x in output.split()])
+            times = [min(sample[i] for sample in samples[1:]) for i in range(3)]
+            print('%-10s %10d %14d %14d' % (name, times[0], times[1], times[2]))
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+# Python module
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Cost of messages with expensive arguments which are rarely rendered.
+#
+#     python benchmarks/bench_deferred.py [messages] [rendered percent]
+#
+# Creates messages whose argument summarizes a list of numbers, like a debug log
+# message, and renders only some of them. Compares computing the argument when
+# the message is created with defer().
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdark.i18n import I18NMessage, TranslationService, defer
+
+EN_LOCALE = 'en'
+VALUES = list(range(500))
+
+def summary(values):
+    return ', '.join('%d' % v for v in sorted(values)[:20])
+
+def run(count, rendered, deferred):
+    ts = TranslationService(default_locale=EN_LOCALE)
+    ts.message_provider.register_message('bench.stats', EN_LOCALE, ['Stats: ', {'arg': 0}])
+    
+    step = max(1, int(100 / rendered)) if rendered else count + 1
+    start = time.perf_counter()
+    for i in range(count):
+        if deferred:
+            message = I18NMessage('bench.stats', None, defer(summary, VALUES))
+        else:
+            message = I18NMessage('bench.stats', None, summary(VALUES))
+        if i % step == 0:
+            ts.translate(message)
+    return time.perf_counter() - start
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    rendered = float(sys.argv[2]) if len(sys.argv) > 2 else 1
+    
+    print('%d messages, %g%% rendered' % (count, rendered))
+    print('%-10s %10s %14s' % ('arguments', 'seconds', 'us/message'))
+    for name, deferred in (('eager', False), ('deferred', True)):
+        duration = run(count, rendered, deferred)
+        print('%-10s %10.3f %14.2f' % (name, duration, duration * 1e6 / count))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# Python module
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+# Throughput of the duration and relative-time formatters compared to Babel.
+#
+#     python benchmarks/bench_durations.py [iterations]
+#
+# Formats a feed of timedeltas ("3 minutes", "in 2 hours", "5 days ago")
+# with babel.dates.format_timedelta() and with the formatters of
+# pdark.i18n.babel, which look the texts up in tables per (locale, style).
+
+import datetime
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from babel.dates import format_timedelta
+from pdark.i18n import TranslationService
+from pdark.i18n.babel import RelativeTime, RelativeTimeFormatterFactory, TimedeltaFormatterFactory
+
+LOCALES = ['en', 'de', 'ru']
+
+def timed(func, values):
+    start = time.perf_counter()
+    for value in values:
+        func(value)
+    return (time.perf_counter() - start) * 1e6 / len(values)
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    
+    random.seed(1)
+    deltas = [datetime.timedelta(seconds=random.choice((1, -1)) * random.randint(0, 86400 * 10)) for i in range(iterations)]
+    relative = [RelativeTime(delta) for delta in deltas]
+    
+    ts = TranslationService(default_locale='en')
+    durations = TimedeltaFormatterFactory(ts)
+    relative_times = RelativeTimeFormatterFactory(ts)
+    
+    print('%-8s %-8s %12s %12s %8s' % ('locale', 'case', 'babel us', 'table us', 'speedup'))
+    for locale in LOCALES:
+        formatter = durations.create_formatter(locale)
+        babel = timed(lambda delta: format_timedelta(delta, locale=locale), deltas)
+        table = timed(formatter.format, deltas)
+        print('%-8s %-8s %12.2f %12.2f %7.1fx' % (locale, 'duration', babel, table, babel / table))
+        
+        formatter = relative_times.create_formatter(locale)
+        babel = timed(lambda delta: format_timedelta(delta, add_direction=True, locale=locale), deltas)
+        table = timed(formatter.format, relative)
+        print('%-8s %-8s %12.2f %12.2f %7.1fx' % (locale, 'relative', babel, table, babel / table))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+# Python module
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Translate one message into many locales.
+#
+#     python benchmarks/bench_fan_out.py [locales] [translated locales] [iterations]
+#
+# A notification with nested messages and string arguments is translated into
+# all the locales with a translate() per locale and with translate_to_locales().
+# Only some locales have texts; the others fall back to the default locale and
+# share the output. The second case has a number argument, so nothing is shared.
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdark.i18n import I18NMessage, TranslationService
+
+EN_LOCALE = 'en'
+
+def create_service(translated):
+    ts = TranslationService(default_locale=EN_LOCALE)
+    catalogs = {}
+    for i in range(translated):
+        locale = EN_LOCALE if i == 0 else 'l%d' % i
+        catalogs[locale] = {
+            'pdark.i18n.number.int': '%d',
+            'bench.notification': ['[%s] ' % locale, {'arg': 'subject'}, ': ', {'arg': 'body'}],
+            'bench.subject': ['Order ', {'arg': 'order'}, ' shipped'],
+            'bench.body': ['Hello ', {'arg': 'name'}, ', your ', {'arg': 'product'}, ' is on its way.'],
+            'bench.count': [{'arg': 'count'}, ' items'],
+        }
+    ts.message_provider.merge_catalogs(catalogs)
+    return ts
+
+def notification(argument):
+    subject = I18NMessage('bench.subject', None, order='A-1234')
+    body = I18NMessage('bench.body', None, name='Alice', product=argument)
+    return I18NMessage('bench.notification', None, subject=subject, body=body)
+
+def timed(iterations, func):
+    start = time.perf_counter()
+    for i in range(iterations):
+        func()
+    return (time.perf_counter() - start) * 1e6 / iterations
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    translated = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    iterations = int(sys.argv[3]) if len(sys.argv) > 3 else 2000
+    
+    ts = create_service(translated)
+    locales = [EN_LOCALE] + ['l%d' % i for i in range(1, count)]
+    
+    print('%d locales, %d with texts' % (count, translated))
+    print('%-10s %16s %20s' % ('argument', 'translate() us', 'to_locales() us'))
+    for name, argument in (('string', 'book'), ('message', I18NMessage('bench.count', None, count=3))):
+        message = notification(argument)
+        assert ts.translate_to_locales(message, locales) == dict((locale, ts.translate(message, locale)) for locale in locales)
+        
+        loop = timed(iterations, lambda: dict((locale, ts.translate(message, locale)) for locale in locales))
+        fan_out = timed(iterations, lambda: ts.translate_to_locales(message, locales))
+        print('%-10s %16.1f %20.1f' % (name, loop, fan_out))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+# Python module
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Parse throughput of IcuMessageParser compared to the lists of MessageParser.
+#
+#     python benchmarks/bench_icu_parse.py [keys]
+#
+# Every fourth pattern gets a plural. Also prints the size of the catalog as JSON
+# and the throughput when decoding the JSON is included, like for catalogs on disk.
+
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import SyntheticWorkload
+from pdark.i18n import MessageParser
+from pdark.i18n.icu import IcuMessageParser
+
+def to_icu(pattern, index):
+    result = ''.join(part if isinstance(part, str) else '{%s}' % part['arg'] for part in pattern)
+    if index % 4 == 0:
+        result += ' ({a0, plural, =0 {none} one {# item} other {# items}})'
+    return result
+
+def to_list(pattern, index):
+    if index % 4 == 0:
+        # The closest thing lists can express
+        pattern = pattern + [' (', {'arg': 'a0'}, ' items)']
+    return pattern
+
+def parse_all(parser, patterns):
+    for pattern in patterns:
+        parser.parse(pattern)
+
+def load_and_parse_all(parser, data):
+    parse_all(parser, json.loads(data))
+
+def measure(func, *args):
+    result = None
+    for i in range(3):
+        start = time.perf_counter()
+        func(*args)
+        duration = time.perf_counter() - start
+        result = duration if result is None else min(result, duration)
+    return result
+
+def main():
+    keys = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    
+    workload = SyntheticWorkload(keys=keys, functions=0)
+    locale = workload.default_locale
+    patterns = [workload.pattern(i, locale) for i in range(keys)]
+    
+    syntaxes = (
+        ('list', MessageParser(None), [to_list(pattern, i) for i, pattern in enumerate(patterns)]),
+        ('icu', IcuMessageParser(None), [to_icu(pattern, i) for i, pattern in enumerate(patterns)]),
+    )
+    
+    print('%d patterns' % keys)
+    print('%-6s %12s %14s %14s' % ('syntax', 'JSON bytes', 'patterns/s', 'with JSON/s'))
+    for name, parser, catalog in syntaxes:
+        data = json.dumps(catalog, ensure_ascii=False)
+        parse_time = measure(parse_all, parser, catalog)
+        load_time = measure(load_and_parse_all, parser, data)
+        print('%-6s %12d %14.0f %14.0f' % (name, len(data.encode('utf-8')), keys / parse_time, keys / load_time))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+# Python module
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Re-render a large tree of messages in which only some leaves change.
+#
+#     python benchmarks/bench_incremental.py [rows] [changed rows] [ticks]
+#
+# A dashboard is a list of rows; each row has a label and a value message.
+# Every tick changes some values and renders the whole tree again, with
+# translate() and with an IncrementalRenderer. The trees are built before the
+# time is measured.
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdark.i18n import I18NMessage, TranslationService
+from pdark.i18n.incremental import IncrementalRenderer
+
+EN_LOCALE = 'en'
+
+def create_service():
+    ts = TranslationService(default_locale=EN_LOCALE)
+    ts.message_provider.register_patterns(EN_LOCALE, {
+        'pdark.i18n.number.int': '%d',
+        'pdark.i18n.list.comma': '\n',
+        'pdark.i18n.list.and': '\n',
+        'bench.dashboard': ['Dashboard\n', {'arg': 'rows'}],
+        'bench.row': [{'arg': 'label'}, ': ', {'arg': 'value'}],
+        'bench.label': ['Server ', {'arg': 'name'}, ' in ', {'arg': 'zone'}],
+        'bench.value': [{'arg': 'count'}, ' requests, ', {'arg': 'errors'}, ' errors'],
+    })
+    return ts
+
+def dashboard(values):
+    rows = []
+    for i, (count, errors) in enumerate(values):
+        label = I18NMessage('bench.label', None, name='srv%d' % i, zone='zone%d' % (i % 4))
+        value = I18NMessage('bench.value', None, count=count, errors=errors)
+        rows.append(I18NMessage('bench.row', None, label=label, value=value))
+    return I18NMessage('bench.dashboard', None, rows=rows)
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    changed = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    ticks = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+    
+    ts = create_service()
+    renderer = IncrementalRenderer(ts)
+    r = random.Random(42)
+    
+    values = [(r.randrange(1000), r.randrange(10)) for i in range(rows)]
+    updates = []
+    for tick in range(ticks):
+        for i in r.sample(range(rows), changed):
+            values[i] = (r.randrange(1000), r.randrange(10))
+        updates.append(list(values))
+    
+    assert ts.translate(dashboard(updates[0])) == renderer.render(dashboard(updates[0]))
+    
+    print('%d rows, %d changed per tick' % (rows, changed))
+    print('%-12s %12s' % ('renderer', 'ms/tick'))
+    for name, render in (('translate', ts.translate), ('incremental', renderer.render)):
+        trees = [dashboard(update) for update in updates]
+        start = time.perf_counter()
+        for tree in trees:
+            render(tree)
+        print('%-12s %12.2f' % (name, (time.perf_counter() - start) * 1e3 / ticks))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# Python module
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Memory of parsed catalogs.
+#
+#     python benchmarks/bench_interning.py [keys] [locales]
+#
+# Parses all the patterns of a synthetic catalog with one parser (which shares
+# identical fragments) and with a new parser per pattern (no sharing) and
+# prints the bytes per pattern which the formatters keep alive.
+
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import SyntheticWorkload
+from pdark.i18n import MessageParser
+
+def measure(catalogs, shared):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    
+    parser = MessageParser(None)
+    formatters = []
+    for catalog in catalogs.values():
+        for pattern in catalog.values():
+            if not shared:
+                parser = MessageParser(None)
+            formatters.append(parser.parse(pattern))
+    
+    duration = time.perf_counter() - start
+    del parser
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return len(formatters), size, duration
+
+def main():
+    keys = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    locales = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    
+    workload = SyntheticWorkload(keys=keys, locales=locales, functions=0)
+    catalogs = workload.catalogs()
+    
+    print('%d keys, %d locales' % (keys, locales))
+    print('%-8s %10s %12s %14s' % ('parser', 'patterns', 'bytes', 'bytes/pattern'))
+    for name, shared in (('fresh', False), ('shared', True)):
+        count, size, duration = measure(catalogs, shared)
+        print('%-8s %10d %12d %14.0f' % (name, count, size, size / count))
+
+if __name__ == '__main__':
+    main()
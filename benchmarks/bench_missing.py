@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+# Python module
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Cost of missing texts compared to texts which exist.
+#
+#     python benchmarks/bench_missing.py [iterations]
+#
+# Compares a hit, a miss with FailOnMissingTextsStrategy (the exception is
+# caught), a miss with try_translate(), which returns MISSING, and a key
+# fallback (alt key and default text).
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdark.i18n import I18NMessage, I18nException, TranslationService
+
+EN_LOCALE = 'en'
+
+def timed(iterations, func, message):
+    start = time.perf_counter()
+    for i in range(iterations):
+        func(message)
+    return (time.perf_counter() - start) * 1e6 / iterations
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    
+    ts = TranslationService(default_locale=EN_LOCALE)
+    provider = ts.message_provider
+    provider.register_message('bench.title', EN_LOCALE, 'Title')
+    provider.add_key_fallback('bench.admin_title', ['bench.admin_title2', 'bench.title'])
+    provider.add_key_fallback('bench.subtitle', ['bench.subtitle2'], 'Subtitle')
+    
+    def translate_or_none(message):
+        try:
+            return ts.translate(message)
+        except I18nException:
+            return None
+    
+    cases = (
+        ('hit', ts.translate, I18NMessage('bench.title')),
+        ('miss, exception', translate_or_none, I18NMessage('bench.unknown')),
+        ('miss, MISSING', ts.try_translate, I18NMessage('bench.unknown')),
+        ('fallback key', ts.translate, I18NMessage('bench.admin_title')),
+        ('default text', ts.translate, I18NMessage('bench.subtitle')),
+    )
+    
+    print('%-18s %10s' % ('case', 'us/call'))
+    for name, func, message in cases:
+        print('%-18s %10.2f' % (name, timed(iterations, func, message)))
+
+if __name__ == '__main__':
+    main()
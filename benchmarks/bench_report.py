@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+# Python module
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Time the message report on a generated source tree.
+#
+#     python benchmarks/bench_report.py [files] [workers]
+#
+# Every tenth module defines messages, the others call them. Prints the time
+# of a cold run (empty cache), a warm run and a run after touching 1% of the files.
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdark.i18n.report import SourceScanner
+
+DEFINITIONS = '''from pdark.i18n import i18n
+
+@i18n
+def message_a(name):
+    pass
+
+@i18n
+def message_b(count, unit):
+    pass
+
+def helper(value):
+    return value * 2
+'''
+
+USAGES = '''from pkg%(package)d.defs%(defs)d import message_a, message_b
+from pkg%(package)d import defs%(defs)d as defs
+
+class View%(index)d(object):
+    def __init__(self, name):
+        self.name = name
+    
+    def render(self, items):
+        result = []
+        for i, item in enumerate(items):
+            if i %% 2:
+                result.append(message_a(self.name))
+            else:
+                result.append(defs.message_b(i, 'm'))
+            result.append(defs.helper(item))
+        return result
+'''
+
+def generate(root, count):
+    for index in range(count):
+        package = index // 1000
+        directory = os.path.join(root, 'pkg%d' % package)
+        if index % 1000 == 0:
+            os.makedirs(directory)
+            open(os.path.join(directory, '__init__.py'), 'w').close()
+        
+        if index % 10 == 0:
+            name, text = 'defs%d.py' % index, DEFINITIONS
+        else:
+            name, text = 'view%d.py' % index, USAGES % {'package': package, 'defs': index - index % 10, 'index': index}
+        with open(os.path.join(directory, name), 'w') as fh:
+            fh.write(text)
+
+def run(root, cache_file, workers):
+    scanner = SourceScanner(cache_file=cache_file, max_workers=workers)
+    start = time.perf_counter()
+    index = scanner.scan(root)
+    duration = time.perf_counter() - start
+    return duration, scanner, index
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    
+    directory = tempfile.mkdtemp()
+    try:
+        root = os.path.join(directory, 'src')
+        generate(root, count)
+        cache_file = os.path.join(directory, 'cache.json')
+        
+        print('%d files, %d CPUs' % (count, os.cpu_count() or 1))
+        duration, scanner, index = run(root, cache_file, workers)
+        usages = sum(len(places) for places in index.usages.values())
+        print('cold:    %6.2f s  %d messages, %d usages' % (duration, len(index.definitions), usages))
+        
+        duration, scanner, index = run(root, cache_file, workers)
+        print('warm:    %6.2f s  %d parsed' % (duration, scanner.parsed))
+        
+        for dirpath, dirs, files in os.walk(root):
+            for name in files[::100]:
+                with open(os.path.join(dirpath, name), 'a') as fh:
+                    fh.write('\n')
+        duration, scanner, index = run(root, cache_file, workers)
+        print('changed: %6.2f s  %d parsed' % (duration, scanner.parsed))
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    main()
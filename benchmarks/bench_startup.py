@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+# Python module
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Measure the import time of pdark.i18n and the latency of the first translation.
+#
+# Run from the root of the project:
+#
+#     python benchmarks/bench_startup.py
+
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Most applications have already loaded logging, so it's not counted
+FIRST_TRANSLATE = '''
+import logging
+import time
+t0 = time.perf_counter()
+from pdark.i18n import *
+import pdark.i18n.babel
+t1 = time.perf_counter()
+ts = TranslationService(default_locale='en')
+pdark.i18n.babel.setup(ts)
+ts.message_provider.register_message('x.hello', 'en', ['Hello, ', {'arg': 0}])
+t2 = time.perf_counter()
+ts.translate(I18NMessage('x.hello', None, 'world'))
+t3 = time.perf_counter()
+ts.translate(I18NMessage('x.hello', None, 'world'))
+t4 = time.perf_counter()
+print('%.0f %.0f %.0f %.0f' % ((t1 - t0) * 1e6, (t2 - t1) * 1e6, (t3 - t2) * 1e6, (t4 - t3) * 1e6))
+'''
+
+# Measure with warm .pyc files like a deployed application would see them
+PYCACHE = tempfile.mkdtemp(prefix='pdark-i18n-pycache-')
+
+def run(*args):
+    env = dict(os.environ, PYTHONPATH=ROOT, PYTHONPYCACHEPREFIX=PYCACHE)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    return subprocess.run([sys.executable] + list(args), cwd=ROOT, env=env, check=True, capture_output=True, text=True)
+
+def import_times(module):
+    '''Return the cumulative import time in us per module from python -X importtime.'''
+    result = {}
+    for line in run('-X', 'importtime', '-c', 'import %s' % module).stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        
+        self_us, cumulative, name = line[len('import time:'):].split('|')
+        result[name.strip()] = int(cumulative)
+    return result
+
+def main():
+    run('-c', FIRST_TRANSLATE)
+    
+    for module in ('pdark.i18n', 'pdark.i18n.babel'):
+        times = import_times(module)
+        print('import %-20s %6d modules' % (module, len(times)))
+    
+    samples = [[int(x) for x in run('-c', FIRST_TRANSLATE).stdout.split()] for i in range(20)]
+    labels = ('import', 'create service', 'first translate', 'second translate')
+    for i, label in enumerate(labels):
+        print('%-27s %6d us' % (label, min(sample[i] for sample in samples)))
+
+if __name__ == '__main__':
+    main()
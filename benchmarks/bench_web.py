@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+# Python module
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Throughput of the WSGI middleware compared to handlers which translate themselves.
+#
+#     python benchmarks/bench_web.py [requests] [messages per response]
+#
+# Both handlers return the same JSON. The classic handler negotiates the locale
+# and calls translate() for each message; with the middleware, the handler
+# returns the messages and they are rendered in one pass.
+
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import SyntheticWorkload
+import pdark.i18n.babel
+from pdark.i18n import AcceptLanguageNegotiator, TranslationService
+from pdark.i18n.test_support import wsgi_request
+from pdark.i18n.web import I18nWsgiMiddleware, JsonPayload
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    
+    workload = SyntheticWorkload(keys=1000, nesting=2)
+    ts = TranslationService(default_locale=workload.default_locale)
+    ts.message_provider.merge_catalogs(workload.catalogs())
+    pdark.i18n.babel.setup(ts)
+    
+    # Every response shows a header message and rows which refer to it
+    header = workload.message()
+    rows = [[workload.message(), header] for i in range(count)]
+    locale = workload.locales[-1]
+    negotiator = AcceptLanguageNegotiator.for_provider(ts.message_provider)
+    
+    def classic(environ, start_response):
+        locale = negotiator.negotiate(environ.get('HTTP_ACCEPT_LANGUAGE')) or ts.default_locale
+        data = {'header': ts.translate(header, locale), 'rows': [[ts.translate(message, locale) for message in row] for row in rows]}
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        start_response('200 OK', [('Content-Type', 'application/json; charset=utf-8')])
+        return [body]
+    
+    def handler(environ, start_response):
+        return JsonPayload({'header': header, 'rows': rows})
+    
+    apps = (
+        ('classic', classic),
+        ('middleware', I18nWsgiMiddleware(handler, ts, negotiator)),
+    )
+    headers = {'Accept-Language': locale.replace('_', '-')}
+    
+    bodies = [wsgi_request(app, headers=headers)[2] for name, app in apps]
+    assert json.loads(bodies[0]) == json.loads(bodies[1])
+    
+    print('%d requests, %d messages per response' % (requests, 2 * count + 1))
+    print('%-12s %10s' % ('app', 'req/s'))
+    for name, app in apps:
+        start = time.perf_counter()
+        for i in range(requests):
+            wsgi_request(app, headers=headers)
+        duration = time.perf_counter() - start
+        print('%-12s %10.0f' % (name, requests / duration))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+# Python module
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Compare the wire format for I18N messages with pickle and JSON.
+#
+#     python benchmarks/bench_wire.py [messages]
+
+import json
+import os
+import pickle
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import SyntheticWorkload
+from pdark.i18n import I18NMessage
+from pdark.i18n.wire import decode_messages, encode_messages
+
+def to_json(message):
+    return {'key': message.key, 'locale': message.locale, 'args': message.args, 'kwargs': message.kwargs}
+
+def from_json(data):
+    if 'key' in data:
+        return I18NMessage(data['key'], data['locale'], *data['args'], **data['kwargs'])
+    return data
+
+def json_encode(messages):
+    return json.dumps(messages, default=to_json).encode('utf-8')
+
+def json_decode(data):
+    return json.loads(data, object_hook=from_json)
+
+def pickle_encode(messages):
+    return pickle.dumps(messages, pickle.HIGHEST_PROTOCOL)
+
+CODECS = (
+    ('wire', encode_messages, decode_messages),
+    ('pickle', pickle_encode, pickle.loads),
+    ('json', json_encode, json_decode),
+)
+
+def best_of(n, func, *args):
+    result = None
+    for i in range(n):
+        start = time.perf_counter()
+        func(*args)
+        duration = time.perf_counter() - start
+        result = duration if result is None else min(result, duration)
+    return result
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    
+    # JSON can't encode dates, so use the types which all three support
+    workload = SyntheticWorkload(keys=1000, arg_types=('int', 'float', 'str', 'list', 'message'), nesting=2)
+    messages = [message for message, locale in workload.messages(count)]
+    
+    print('%d messages' % count)
+    print('%-8s %12s %14s %14s' % ('codec', 'bytes', 'encode msg/s', 'decode msg/s'))
+    for name, encode, decode in CODECS:
+        data = encode(messages)
+        encode_time = best_of(3, encode, messages)
+        decode_time = best_of(3, decode, data)
+        print('%-8s %12d %14.0f %14.0f' % (name, len(data), count / encode_time, count / decode_time))
+
+if __name__ == '__main__':
+    main()
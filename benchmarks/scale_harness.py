@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+# Python module
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Measure how TranslationService scales with synthetic workloads and fail on regressions.
+#
+#     python benchmarks/scale_harness.py --profile smoke
+#     python benchmarks/scale_harness.py --profile target --no-check
+#     python benchmarks/scale_harness.py --profile smoke --allocations-only
+#
+# Records peak RSS, allocations per translation (tracemalloc) and throughput.
+# The ceilings for each profile are in ceilings.json next to this file; the
+# exit code is 1 when a measurement is worse than its ceiling.
+#
+# Throughput and RSS depend on the machine and its load. With
+# --allocations-only, only the tracemalloc numbers are checked, which are
+# the same on every run; the unit tests use that.
+
+import argparse
+import gc
+import json
+import os
+import resource
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import SyntheticWorkload
+from pdark.i18n import TranslationService
+
+PROFILES = {
+    'smoke': dict(keys=2000, locales=6, fallback_depth=3, nesting=2, messages=2000),
+    'medium': dict(keys=50000, locales=20, fallback_depth=4, nesting=3, messages=20000),
+    'target': dict(keys=500000, locales=60, fallback_depth=5, nesting=5, messages=100000),
+}
+
+CEILINGS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ceilings.json')
+
+# Measurements which don't depend on the speed or load of the machine
+ALLOCATIONS = ('peak_alloc_bytes', 'retained_bytes_per_translate')
+
+def peak_rss_mb():
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+def run(profile):
+    settings = dict(PROFILES[profile])
+    count = settings.pop('messages')
+    result = {'profile': profile}
+    
+    start = time.perf_counter()
+    workload = SyntheticWorkload(**settings)
+    catalogs = workload.catalogs()
+    messages = workload.messages(count)
+    result['generate_s'] = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    ts = TranslationService(default_locale=workload.default_locale)
+    ts.message_provider.merge_catalogs(catalogs)
+    result['register_s'] = time.perf_counter() - start
+    del catalogs
+    gc.collect()
+    
+    start = time.perf_counter()
+    for message, locale in messages:
+        ts.translate(message, locale)
+    result['first_pass_s'] = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    for message, locale in messages:
+        ts.translate(message, locale)
+    result['translations_per_s'] = count / (time.perf_counter() - start)
+    
+    sample = messages[:1000]
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    for message, locale in sample:
+        ts.translate(message, locale)
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    # Most memory needed to render one of the messages and memory kept after rendering
+    result['peak_alloc_bytes'] = peak - before
+    result['retained_bytes_per_translate'] = (after - before) / len(sample)
+    result['peak_rss_mb'] = peak_rss_mb()
+    return result
+
+def check(result, ceilings, allocations_only=False):
+    '''Compare the result with the ceilings. "max_x" is an upper limit for x, "min_x" a lower limit.'''
+    failures = []
+    for name, limit in ceilings.items():
+        kind, _, measured_name = name.partition('_')
+        if allocations_only and measured_name not in ALLOCATIONS:
+            continue
+        
+        measured = result[measured_name]
+        if (kind == 'max' and measured > limit) or (kind == 'min' and measured < limit):
+            failures.append('%s: measured %.1f, limit %.1f' % (measured_name, measured, limit))
+    return failures
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure pdark.i18n with synthetic workloads')
+    parser.add_argument('--profile', choices=sorted(PROFILES), default='smoke')
+    parser.add_argument('--no-check', action='store_true', help='Only report, do not compare with the ceilings')
+    parser.add_argument('--allocations-only', action='store_true', help='Only compare the tracemalloc numbers with the ceilings')
+    args = parser.parse_args(argv)
+    
+    result = run(args.profile)
+    for name, value in result.items():
+        print('%-32s %s' % (name, value if isinstance(value, str) else '%.3f' % value))
+    
+    if args.no_check:
+        return 0
+    
+    with open(CEILINGS) as fh:
+        ceilings = json.load(fh).get(args.profile, {})
+    
+    failures = check(result, ceilings, args.allocations_only)
+    for failure in failures:
+        print('REGRESSION %s' % failure)
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
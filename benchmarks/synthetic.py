@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+# Python module
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Generate synthetic workloads: catalogs, @i18n definitions and message streams.
+#
+# The shape of the workload is configurable: number of keys and locales,
+# depth of the locale fallback chains, argument types and nesting of messages.
+
+import os
+import random
+import sys
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdark.i18n import I18NMessage, i18n
+
+ARG_TYPES = ('int', 'float', 'str', 'list', 'message')
+
+# Patterns which the default formatters need
+SYSTEM_PATTERNS = {
+    'pdark.i18n.list.and': ' and ',
+    'pdark.i18n.list.or': ' or ',
+    'pdark.i18n.list.comma': ', ',
+    'pdark.i18n.list.empty': '',
+    'pdark.i18n.number.int': '%d',
+    'pdark.i18n.number.float': '%.2f',
+}
+
+def template1(a0): pass
+def template2(a0, a1): pass
+def template3(a0, a1, a2): pass
+def template4(a0, a1, a2, a3): pass
+
+TEMPLATES = (template1, template2, template3, template4)
+
+class SyntheticWorkload(object):
+    '''A synthetic set of messages.
+    
+    keys: Number of message keys
+    locales: Number of locales
+    fallback_depth: Length of the fallback chains; 'l0', 'l0_X1', 'l0_X1_X2', ...
+    coverage: Fraction of the keys which locales below the top of a chain translate
+    arg_types: Types of arguments which messages get
+    nesting: Maximum depth of messages which are arguments of other messages
+    functions: How many keys get an @i18n function; the others are created as I18NMessage directly
+    '''
+    def __init__(self, keys=1000, locales=4, fallback_depth=2, coverage=0.2, arg_types=ARG_TYPES, nesting=2, functions=1000, seed=42):
+        self.keys = keys
+        self.fallback_depth = fallback_depth
+        self.coverage = coverage
+        self.arg_types = tuple(arg_types)
+        self.nesting = nesting
+        self.random = random.Random(seed)
+        
+        self.locales = self.create_locales(locales)
+        self.default_locale = self.locales[0]
+        self.key_names = ['synthetic.mod%d.message%d' % (i // 1000, i) for i in range(keys)]
+        self.arities = [1 + i % len(TEMPLATES) for i in range(keys)]
+        self.functions = self.create_functions(min(functions, keys))
+    
+    def create_locales(self, count):
+        result = []
+        for i in range(count):
+            depth = i % self.fallback_depth
+            result.append('l%d' % (i // self.fallback_depth) + ''.join('_X%d' % j for j in range(1, depth + 1)))
+        return result
+    
+    def create_functions(self, count):
+        '''Define @i18n functions for the first count keys in synthetic modules.'''
+        result = []
+        for i in range(count):
+            module_name, _, name = self.key_names[i].rpartition('.')
+            module = sys.modules.get(module_name)
+            if module is None:
+                module = types.ModuleType(module_name)
+                module.__file__ = '<synthetic>'
+                sys.modules[module_name] = module
+            
+            template = TEMPLATES[self.arities[i] - 1]
+            func = types.FunctionType(template.__code__, module.__dict__, name)
+            func.__module__ = module_name
+            result.append(i18n(func))
+        return result
+    
+    def pattern(self, index, locale):
+        arity = self.arities[index]
+        pattern = ['[%s] Message %d' % (locale, index)]
+        for a in range(arity):
+            pattern.append(' with ' if a == 0 else ' and ')
+            pattern.append({'arg': 'a%d' % a})
+        return pattern
+    
+    def catalogs(self):
+        '''Return locale -> key -> pattern.'''
+        result = {}
+        for locale in self.locales:
+            top = not '_' in locale
+            if top:
+                indexes = range(self.keys)
+            else:
+                indexes = range(0, self.keys, max(1, int(round(1 / self.coverage))))
+            
+            catalog = dict((self.key_names[i], self.pattern(i, locale)) for i in indexes)
+            if locale == self.default_locale:
+                catalog.update(SYSTEM_PATTERNS)
+            result[locale] = catalog
+        return result
+    
+    def value(self, arg_type, depth):
+        r = self.random
+        if arg_type == 'int':
+            return r.randrange(1000000)
+        if arg_type == 'float':
+            return r.random() * 1000
+        if arg_type == 'str':
+            return 'value%d' % r.randrange(1000)
+        if arg_type == 'list':
+            return ['item%d' % i for i in range(r.randrange(4))]
+        if depth >= self.nesting:
+            return 'leaf'
+        return self.message(depth + 1)
+    
+    def message(self, depth=0):
+        '''Create a random message; nested messages are arguments down to the configured depth.'''
+        index = self.random.randrange(self.keys)
+        args = [self.value(self.random.choice(self.arg_types), depth) for a in range(self.arities[index])]
+        
+        if index < len(self.functions):
+            return self.functions[index](*args)
+        
+        kwargs = dict(('a%d' % a, arg) for a, arg in enumerate(args))
+        return I18NMessage(self.key_names[index], None, *args, **kwargs)
+    
+    def messages(self, count):
+        '''Return count random (message, locale) pairs.'''
+        return [(self.message(), self.random.choice(self.locales)) for i in range(count)]
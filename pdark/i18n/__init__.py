@@ -10,17 +10,25 @@
 
 # This is the main module
 
+# Keep the imports cheap; this module is imported by every tool which creates messages.
+# inspect, locale and Babel are only loaded when they are really needed.
 from io import StringIO
+from reprlib import recursive_repr
 import collections
-import inspect
-import locale
+import contextvars
 import logging
 import os
-import traceback
+import sys
+import threading
+import time
+import weakref
 
 __all__ = [
     'i18n',
     'I18NMessage',
+    'LazyTranslation',
+    'defer',
+    'MISSING',
     'TranslationService'
 ]
 
@@ -31,20 +39,103 @@ def getLogger(o):
     clz = o.__class__
     return logging.getLogger('%s.%s' % (clz.__module__, clz.__name__))
 
+# Dense integer IDs for message keys. @i18n assigns them when a function is decorated;
+# message providers use them as index into per-locale tables.
+message_ids = {}
+# ID -> key; the keys are interned, so each key string exists only once
+message_keys = []
+message_ids_lock = threading.Lock()
+
+def message_id(key):
+    '''Return the integer ID of a message key. Unknown keys get a new ID.'''
+    result = message_ids.get(key)
+    if result is None:
+        with message_ids_lock:
+            result = message_ids.get(key)
+            if result is None:
+                key = sys.intern(key)
+                result = len(message_keys)
+                message_keys.append(key)
+                message_ids[key] = result
+    
+    return result
+
+class Deferred(object):
+    '''An argument of an I18N message which is computed when the message is rendered.
+    
+    Create them with defer(). The function is called at most once; when it
+    raises an exception, it will be called again the next time. repr() and ==
+    use the value, so they evaluate the argument.
+    
+    Each instance has its own lock, so threads only wait for each other when
+    they evaluate the same argument.'''
+    __slots__ = ('func', 'args', 'value', 'lock')
+    
+    def __init__(self, func, args):
+        self.func, self.args = func, args
+        self.value = None
+        # Held while the function is called; None after the evaluation
+        self.lock = threading.RLock()
+    
+    def get(self):
+        '''Return the value; evaluates the argument when necessary.'''
+        if self.func is not None:
+            lock = self.lock
+            if lock is not None:
+                with lock:
+                    if self.func is not None:
+                        self.value = self.func(*self.args)
+                        # Release everything which was needed to compute the value
+                        self.func = self.args = self.lock = None
+        return self.value
+    
+    @property
+    def evaluated(self):
+        return self.func is None
+    
+    def __eq__(self, other):
+        if isinstance(other, Deferred):
+            other = other.get()
+        return self.get() == other
+    
+    def __hash__(self):
+        return hash(self.get())
+    
+    def __repr__(self):
+        return repr(self.get())
+
+def defer(func, *args):
+    '''Compute the argument of an I18N message only when the message is rendered.
+    
+        log.debug('%s', stats_message(defer(compute_stats, table)))
+    
+    compute_stats(table) is only called when the message is translated.'''
+    return Deferred(func, args)
+
+def resolve_deferred(value):
+    '''Return the value of a Deferred argument or value itself.'''
+    if value.__class__ is Deferred:
+        return value.get()
+    return value
+
 class I18NMessage(object):
     '''Encode the information which message to display and the arguments for the message.
     
     Methods decorated with @i18n will return instanes of this type.'''
+    # ID of the key (see message_id()) when it's already known
+    key_id = None
+    
     def __init__(self, key, locale=None, *args, **kwargs):
         self.key, self.locale, self.args, self.kwargs = key, locale, args, kwargs
     
+    @recursive_repr()
     def __repr__(self):
         if self.locale is None:
             return 'I18NMessage(%s, %r, %r)' % (self.key, self.args, self.kwargs)
         
         return 'I18NMessage(%s, locale=%r, %r, %r)' % (self.key, self.locale, self.args, self.kwargs)
 
-    def __eq__(self):
+    def __eq__(self, other):
         '''Two messages are the same when the key is the same and the arguments are the same.
         
         The locale is irrelevant.'''
@@ -57,10 +148,14 @@ class I18NMessage(object):
         A typical use case is when you need to display a message
         in two languages on the same screen, like language selectors
         which often display "German - Deutsch" or vocabulary learning.'''
-        return I18NMessage(self.key, locale, *self.args, **self.kwargs)
+        result = I18NMessage(self.key, locale, *self.args, **self.kwargs)
+        result.key_id = self.key_id
+        return result
 
 # Module names: file name of the module (with path)
 i18nKnownModules = {}
+# Message key -> the function decorated with @i18n; used to check the arguments in texts
+i18nKnownFunctions = {}
 
 def registerModuleForAutoConfig(func):
     '''Collect all modules which have I18N methods and functions in a single place.
@@ -68,15 +163,32 @@ def registerModuleForAutoConfig(func):
     The list of modules can later be used to discover text files
     which contain messages.
     '''
-    module = inspect.getmodule(func)
+    module = sys.modules[func.__module__]
 
     global i18nKnownModules
     if not module.__name__ in i18nKnownModules:
         log.info('Registering new module %s', module.__name__)
-        i18nKnownModules[module.__name__] = inspect.getfile(func)
+        i18nKnownModules[module.__name__] = func.__code__.co_filename
 
     return module
 
+def callargs_of(func):
+    '''Create a function which maps the arguments of a call of func to their names.
+    
+    The signature of func is only inspected on the first call and then reused.'''
+    signature = None
+    def callargs(*args, **kwargs):
+        nonlocal signature
+        if signature is None:
+            import inspect
+            signature = inspect.signature(func)
+        
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        return bound.arguments
+
+    return callargs
+
 def i18n(func):
     '''Decoration for a function or method which can be used to create I18N messages.
     
@@ -92,14 +204,18 @@ def i18n(func):
     '''
     module = registerModuleForAutoConfig(func)
 
-    key = '%s.%s' % (module.__name__, func.__name__)
+    key_id = message_id('%s.%s' % (module.__name__, func.__name__))
+    key = message_keys[key_id]
+    i18nKnownFunctions[key] = func
+    get_callargs = callargs_of(func)
     def wrapped_func(*args, **kwargs):
         #print 'wrapped_func',key,args,kwargs
-        callargs = inspect.getcallargs(func, *args, **kwargs)
+        callargs = get_callargs(*args, **kwargs)
         
         result = func(*args, **kwargs)
         if result is None:
-            return I18NMessage(key, None, *args, **callargs)
+            result = I18NMessage(key, None, *args, **callargs)
+            result.key_id = key_id
         
         return result
 
@@ -123,6 +239,12 @@ class DetailFormatterFactory(object):
         Factories can create new formatters with every call or return the same
         instance when it's stateless.'''
         raise NotImplementedError()
+    
+    def warm_up(self, locale):
+        '''Load everything which is needed to format values for this locale.
+        
+        Called by TranslationService.warm_up(); the default does nothing.'''
+        pass
 
 class StringFormatter(DetailFormatter):
     def format(self, inst):
@@ -163,26 +285,32 @@ class I18nMessageFormatterFactory(object):
         return I18nMessageFormatter(self.ts, locale)
 
 class ListFormatter(DetailFormatter):
+    # Shared by all instances, so the texts are only translated once per translation
+    empty_message = I18NMessage('pdark.i18n.list.empty')
+    comma_message = I18NMessage('pdark.i18n.list.comma')
+    and_message = I18NMessage('pdark.i18n.list.and')
+    or_message = I18NMessage('pdark.i18n.list.or')
+    
     def __init__(self, ts, locale, **options):
         self.ts = ts
         self.locale = locale
         self.options = options
-        
-        self.empty_message = I18NMessage('pdark.i18n.list.empty')
-        self.comma_message = I18NMessage('pdark.i18n.list.comma')
-        self.and_message = I18NMessage('pdark.i18n.list.and')
-        self.or_message = I18NMessage('pdark.i18n.list.or')
     
     def format(self, inst):
         if len(inst) == 0:
             return self.ts.translate(self.empty_message, self.locale)
         
         def process(item):
+            item = resolve_deferred(item)
             options = {}
             formatter = self.ts.formatter_factory.create_formatter(self.locale, item, options)
             return formatter.format(item)
         
-        as_strings = [process(item) for item in inst]
+        context = current_render_context.get()
+        if context is None or context.budget is None:
+            as_strings = [process(item) for item in inst]
+        else:
+            as_strings = self.process_with_budget(context, process, inst)
         
         if len(inst) == 1:
             return as_strings[0]
@@ -200,6 +328,28 @@ class ListFormatter(DetailFormatter):
         joiner = self.ts.translate(self.get_tail_joiner(), self.locale)
         return joiner.join((head, tail))
     
+    def process_with_budget(self, context, process, inst):
+        # The partial text is joined with commas only, the tail joiner comes later
+        joiner = self.ts.translate(self.comma_message, self.locale)
+        
+        as_strings = []
+        length = 0
+        for item in inst:
+            try:
+                text = process(item)
+            except I18nBudgetException as e:
+                as_strings.append(e.partial)
+                e.partial = joiner.join(as_strings)
+                raise
+            
+            as_strings.append(text)
+            length += len(text) + len(joiner)
+            reason = context.exceeded_budget(length)
+            if reason is not None:
+                raise I18nBudgetException(reason, joiner.join(as_strings))
+        
+        return as_strings
+    
     def get_tail_joiner(self):
         if self.options.get('type') == 'or':
             return self.or_message
@@ -217,15 +367,15 @@ class ListFormatterFactory(DetailFormatterFactory):
         return ListFormatter(self.ts, locale, **options)
 
 class NumberFormatter(DetailFormatter):
+    int_message = I18NMessage('pdark.i18n.number.int')
+    float_message = I18NMessage('pdark.i18n.number.float')
+    
     def __init__(self, ts, locale, plural=None):
         self.ts = ts
         self.locale = locale
         
         self.plural_message_base = None
         self.plural_message_base = plural
-        
-        self.int_message = I18NMessage('pdark.i18n.number.int')
-        self.float_message = I18NMessage('pdark.i18n.number.float')
 
     def format(self, inst):
         message = self.int_message if isinstance(inst, int) else self.float_message
@@ -249,17 +399,10 @@ class NumberFormatter(DetailFormatter):
         return '%s %s' % (spec % inst, text)
     
     def get_plural_message(self, tag):
-        key = self.plural_message_base + '.one'
-        message = I18NMessage(key)
-        try:
-            return self.ts.translate(message, self.locale)
-        except I18nException:
-            if tag == 'other':
-                raise
-            
-            key = self.plural_message_base + '.other'
-            message = I18NMessage(key)
-            return self.ts.translate(message, self.locale)
+        text = self.ts.try_translate(I18NMessage('%s.%s' % (self.plural_message_base, tag)), self.locale)
+        if text is MISSING:
+            text = self.ts.translate(I18NMessage(self.plural_message_base + '.other'), self.locale)
+        return text
 
 class NumberFormatterFactory(DetailFormatterFactory):
     def __init__(self, ts):
@@ -286,6 +429,12 @@ class DefaultFormatterFactory(object):
     def register(self, *delegates):
         self.delegates.extend(delegates)
     
+    def warm_up(self, locale):
+        for delegate in self.delegates:
+            warm_up = getattr(delegate, 'warm_up', None)
+            if warm_up is not None:
+                warm_up(locale)
+    
     def create_formatter(self, locale, inst, options):
         delegate = self.cache.get(type(inst))
         if delegate is not None:
@@ -298,9 +447,65 @@ class DefaultFormatterFactory(object):
         
         raise I18nException('No factory can handle %s %r' % (type(inst), inst,))
 
+class PluralRules(object):
+    '''Map a number to its plural category (zero, one, two, few, many or other) in a locale.
+    
+    This default knows only "one" and "other", which is correct for English.'''
+    def category(self, locale, number):
+        return 'one' if number == 1 else 'other'
+
 class I18nException(Exception):
     pass
 
+class I18nFormatException(I18nException):
+    '''Formatting a message failed.
+    
+    Raised by the innermost message which failed; messages which contain it
+    pass it on unchanged instead of wrapping it again.
+    
+    details is a tuple (key, formatter, args, kwargs, cause). The text is built
+    from it only when it's needed since the reprs can be expensive.'''
+    def __init__(self, text, details=None):
+        super(I18nFormatException, self).__init__(text)
+        self.details = details
+    
+    def __str__(self):
+        if self.details is None:
+            return super(I18nFormatException, self).__str__()
+        
+        return 'Error formatting %s with %r, args=%r, kwargs=%r: %s' % self.details
+    
+    def __reduce__(self):
+        # The details can't always be pickled
+        return (self.__class__, (str(self),))
+
+class I18nBudgetException(I18nFormatException):
+    '''A RenderBudget ran out.
+    
+    reason is 'time', 'length' or 'depth'. partial is the text which was
+    rendered so far; each formatter which passes the exception on puts its
+    own text in front of it.'''
+    def __init__(self, reason, partial=''):
+        super(I18nBudgetException, self).__init__('Render budget exceeded: %s' % (reason,))
+        self.reason = reason
+        self.partial = partial
+    
+    def __reduce__(self):
+        return (self.__class__, (self.reason, self.partial))
+
+class Missing(object):
+    '''Type of MISSING.'''
+    __slots__ = ()
+    
+    def __bool__(self):
+        return False
+    
+    def __repr__(self):
+        return 'MISSING'
+
+# Returned instead of a text or formatter when there is none
+MISSING = Missing()
+
 class MissingTextStrategy(object):
     '''Strategy how to handle missing texts.'''
     pass
@@ -316,7 +521,7 @@ class LogMissingTextStrategy(MissingTextStrategy):
         self.log = getLogger(self)        
     
     def apply(self, i18n_message, locale):
-        self.log.warn('Missing text for %r', i18n_message.key)
+        self.log.warning('Missing text for %r', i18n_message.key)
         return text_message_formatter(repr(i18n_message))
 
 class FailOnMissingTextsStrategy(MissingTextStrategy):
@@ -329,16 +534,49 @@ class FailOnMissingTextsStrategy(MissingTextStrategy):
     def apply(self, i18n_message, locale):
         raise I18nException('Missing text for %r' % i18n_message.key)
 
+class FindMissingTextStrategy(MissingTextStrategy):
+    '''Return MISSING; see MessageProvider.find_message().'''
+    def apply(self, i18n_message, locale):
+        return MISSING
+
+FIND_MISSING_TEXT_STRATEGY = FindMissingTextStrategy()
+
+# The provider whose find_message() calls its lookup_message() right now
+finding_provider = contextvars.ContextVar('pdark.i18n.finding_provider', default=None)
+
 class MessageProvider(object):
     '''Get the MessageFormatter instance which knows how to build the text
     for an I18NMessage.
     
     Create a new instance of this type if you have a new source for
     texts.'''
+    
+    # Changes when locales() may return something else; see AcceptLanguageNegotiator.for_provider()
+    locales_version = 0
+    # Parser for the default patterns of add_key_fallback(); providers which parse texts set it
+    parser = None
+    
     def __init__(self, missing_text_strategy=None):
         self.log = getLogger(self)
 
-        self.missing_text_strategy = self.create_missing_text_strategy(missing_text_strategy)
+        self._missing_text_strategy = self.create_missing_text_strategy(missing_text_strategy)
+        
+        # Version of the texts; changed by patches. Workers which loaded the same
+        # catalogs and applied the same patches have the same version.
+        self.version = 0
+        self.change_listeners = []
+        # key -> (fallback keys, default formatter or None); see add_key_fallback()
+        self.key_fallbacks = {}
+    
+    def add_change_listener(self, listener):
+        '''Call listener(version, changes) after texts were changed by a patch.
+        
+        changes is a set of (locale, key). Use this to drop cached texts.'''
+        self.change_listeners.append(listener)
+    
+    def notify_change_listeners(self, changes):
+        for listener in self.change_listeners:
+            listener(self.version, changes)
     
     def create_missing_text_strategy(self, missing_text_strategy):
         if missing_text_strategy is None:
@@ -346,9 +584,103 @@ class MessageProvider(object):
         
         return missing_text_strategy
     
+    @property
+    def missing_text_strategy(self):
+        '''The strategy for missing texts; returns MISSING while find_message() calls lookup_message().'''
+        if finding_provider.get() is self:
+            return FIND_MISSING_TEXT_STRATEGY
+        return self._missing_text_strategy
+    
+    @missing_text_strategy.setter
+    def missing_text_strategy(self, missing_text_strategy):
+        self._missing_text_strategy = missing_text_strategy
+    
+    def add_key_fallback(self, key, fallback_keys=(), default=None):
+        '''When there is no text for the key in any fallback locale, use the text
+        of the first of the fallback_keys which has one or else the pattern default.
+        
+        The fallback keys are searched with the locale fallbacks but their own key
+        fallbacks aren't used; list the whole chain here instead.'''
+        if default is not None and self.parser is None:
+            raise I18nException("%r has no parser for the default text of %r" % (self, key))
+        self.key_fallbacks[key] = (tuple(fallback_keys), None if default is None else self.parser.parse(default))
+    
+    def implements_resolve(self):
+        '''Return False for providers which only implement lookup_message() like
+        before resolve() and find_message() existed.'''
+        return type(self).resolve is not MessageProvider.resolve
+    
     def lookup_message(self, i18n_message, locale):
-        '''Return an instance of MessageFormatter.'''
-        return self.missing_text_strategy.apply(i18n_message, locale)
+        '''Return an instance of MessageFormatter.
+        
+        Missing texts are handed to the missing text strategy.'''
+        formatter = self.find_message(i18n_message, locale)
+        if formatter is MISSING:
+            return self.missing_text_strategy.apply(i18n_message, locale)
+        
+        return formatter
+    
+    def find_message(self, i18n_message, locale):
+        '''Return the MessageFormatter or MISSING when there is no text, not even
+        through the key fallbacks.
+        
+        Unlike lookup_message(), this never uses the missing text strategy, so a
+        missing text doesn't cause an exception. Providers which only override
+        lookup_message() are asked with a missing text strategy which returns
+        MISSING.'''
+        if not self.implements_resolve():
+            if type(self).lookup_message is MessageProvider.lookup_message:
+                return MISSING
+            
+            token = finding_provider.set(self)
+            try:
+                return self.lookup_message(i18n_message, locale)
+            finally:
+                finding_provider.reset(token)
+        
+        formatter = self.resolve(i18n_message.key, locale)
+        if formatter is None:
+            formatter = self.resolve_key_fallbacks(i18n_message.key, locale)
+            if formatter is None:
+                return MISSING
+        
+        return formatter
+    
+    def resolve(self, key, locale):
+        '''Return the formatter for the key, searching all fallback locales.
+        
+        Returns None if there is no text for the key. The default asks
+        find_message().'''
+        formatter = self.find_message(I18NMessage(key), locale)
+        return None if formatter is MISSING else formatter
+    
+    def resolve_key_fallbacks(self, key, locale):
+        '''Return the formatter from the key fallbacks or None.'''
+        chain = self.key_fallbacks.get(key)
+        if chain is None:
+            return None
+        
+        fallback_keys, default = chain
+        for fallback_key in fallback_keys:
+            formatter = self.resolve(fallback_key, locale)
+            if formatter is not None:
+                return formatter
+        
+        return default
+    
+    def known_keys(self):
+        '''Return all the keys for which this provider has texts.'''
+        return ()
+    
+    def locales(self):
+        '''Return all the locales for which this provider has texts.'''
+        return ()
+    
+    def warm_up(self, locale, keys):
+        '''Prepare the texts for the keys in this locale.
+        
+        Returns the keys which couldn't be found.'''
+        return []
 
 class SimpleMessageProvider(MessageProvider):
     '''Very simple implementation of a message provider which allows to
@@ -363,6 +695,26 @@ class SimpleMessageProvider(MessageProvider):
         
         self.pattern_cache = collections.defaultdict(dict)
         self.locale_fallback_strategy =  self.create_locale_fallback_strategy(locale_fallback_strategy)
+        
+        # locale -> tuple of fallback locales
+        self.fallback_cache = {}
+        # locale -> list of the formatters found by searching all the fallback locales,
+        # indexed by message_id(key). None when the key wasn't looked up, yet.
+        self.lookup_tables = {}
+        # locale -> message_id(key) -> formatter found through the key fallbacks.
+        # They are kept apart since overlays use the lookup tables through resolve_id().
+        self.fallback_tables = {}
+        # locale -> key -> pattern which will be parsed when it's needed
+        self.unparsed = collections.defaultdict(dict)
+        # locale -> keys whose pattern in unparsed is still JSON text; see PackedCatalog
+        self.json_keys = {}
+        # Held while a pattern from unparsed is parsed, so the pattern and its
+        # entry in json_keys are seen together
+        self.parse_lock = threading.Lock()
+        # When True, the texts can't be changed anymore
+        self.frozen = False
+        # fallback key -> keys which use it; their cached lookups depend on its texts
+        self.key_fallback_users = collections.defaultdict(set)
 
     def create_locale_fallback_strategy(self, locale_fallback_strategy):
         if locale_fallback_strategy is None:
@@ -370,21 +722,224 @@ class SimpleMessageProvider(MessageProvider):
         
         return locale_fallback_strategy
 
+    def freeze(self):
+        '''Forbid all further changes of the texts.
+        
+        Frozen providers can be shared, for example as the base of OverlayMessageProviders.'''
+        self.frozen = True
+    
+    def check_not_frozen(self):
+        if self.frozen:
+            raise I18nException('The texts of %r are frozen' % (self,))
+    
     def register_message(self, key, locale, pattern):
+        self.check_not_frozen()
+        self.add_locale(locale)
         keys = self.pattern_cache[locale]
-        # TODO lazy parsing since we don't need all the messages at once and we probably never need all of them
+        key = message_keys[message_id(key)]
         keys[key] = self.parser.parse(pattern)
+        self.unparsed[locale].pop(key, None)
+        self.forget_lookups(key)
+    
+    def add_key_fallback(self, key, fallback_keys=(), default=None):
+        self.check_not_frozen()
+        super(SimpleMessageProvider, self).add_key_fallback(key, fallback_keys, default)
+        for fallback_key in fallback_keys:
+            self.key_fallback_users[fallback_key].add(key)
+        self.forget_lookups(key)
+    
+    def register_patterns(self, locale, patterns):
+        '''Add many messages (a dict key -> pattern) for a locale.
+        
+        The patterns are parsed when they are needed for the first time
+        since we don't need all the messages at once and we probably
+        never need all of them.'''
+        self.merge_catalogs({locale: patterns})
+    
+    def merge_catalogs(self, catalogs):
+        '''Add the messages of many locales (locale -> key -> pattern) in a single step.
+        
+        Like register_patterns(), the patterns are parsed on first use. Instead
+        of a dict, the patterns of a locale can be a pdark.i18n.catalog.PackedCatalog.'''
+        self.check_not_frozen()
+        for locale, patterns in catalogs.items():
+            self.add_locale(locale)
+            keys = self.pattern_cache[locale]
+            if keys:
+                for key in patterns:
+                    keys.pop(key, None)
+            
+            json_keys = self.json_keys.get(locale)
+            if json_keys:
+                json_keys.difference_update(patterns)
+            
+            # Use the same string object for the key in all locales; message_id() interns its keys, too
+            self.unparsed[locale].update(zip(map(sys.intern, patterns.keys()), patterns.values()))
+            
+            packed_json_keys = getattr(patterns, 'json_keys', None)
+            if packed_json_keys:
+                self.json_keys.setdefault(locale, set()).update(packed_json_keys)
+        
+        self.lookup_tables.clear()
+        self.fallback_tables.clear()
+    
+    def add_locale(self, locale):
+        if locale not in self.pattern_cache:
+            self.locales_version += 1
+    
+    def has_message(self, key, locale):
+        '''Check whether there is a text for the key in exactly this locale.'''
+        return key in self.pattern_cache.get(locale, ()) or key in self.unparsed.get(locale, ())
+    
+    def apply_patch(self, patch):
+        '''Apply a CatalogPatch (see pdark.i18n.catalog).
+        
+        Only the patterns in the patch are parsed and only the cached lookups
+        which could see the changed texts are dropped. The patch is checked
+        completely before anything is changed.'''
+        self.check_not_frozen()
+        if patch.base_version is not None and patch.base_version != self.version:
+            raise I18nException('Patch %r needs version %r but texts have version %r' % (patch.version, patch.base_version, self.version))
+        
+        operations = []
+        for operation, locale, key, pattern in patch.operations:
+            exists = self.has_message(key, locale)
+            if operation == 'add' and exists:
+                raise I18nException('Patch %r: Text for %r already exists in locale %r' % (patch.version, key, locale))
+            if operation in ('change', 'remove') and not exists:
+                raise I18nException('Patch %r: No text for %r in locale %r' % (patch.version, key, locale))
+            
+            formatter = None if operation == 'remove' else self.parser.parse(pattern)
+            operations.append((locale, key, formatter))
+        
+        changes = set()
+        for locale, key, formatter in operations:
+            self.add_locale(locale)
+            self.unparsed[locale].pop(key, None)
+            if formatter is None:
+                self.remove_pattern(locale, key)
+            else:
+                self.pattern_cache[locale][key] = formatter
+            changes.add((locale, key))
+        
+        for locale, table in self.lookup_tables.items():
+            fallback_locales = self.fallback_locales(locale)
+            for changed_locale, key in changes:
+                if changed_locale in fallback_locales:
+                    for key_id in self.dependent_ids(key):
+                        if key_id < len(table):
+                            table[key_id] = None
+                        self.fallback_tables.get(locale, {}).pop(key_id, None)
+        
+        self.version = patch.version
+        self.log.info('Applied patch %r with %d changes', patch.version, len(changes))
+        self.notify_change_listeners(changes)
+    
+    def remove_pattern(self, locale, key):
+        '''Remove the text for the key in the locale; used by apply_patch().'''
+        self.pattern_cache[locale].pop(key, None)
+    
+    def forget_lookups(self, key):
+        '''Forget cached lookups of the key in all locales.'''
+        key_ids = self.dependent_ids(key)
+        for table in self.lookup_tables.values():
+            for key_id in key_ids:
+                if key_id < len(table):
+                    table[key_id] = None
+        for table in self.fallback_tables.values():
+            for key_id in key_ids:
+                table.pop(key_id, None)
+    
+    def dependent_ids(self, key):
+        '''Return the IDs of the key and of the keys which use it as fallback key.'''
+        result = [message_id(key)]
+        users = self.key_fallback_users.get(key)
+        if users:
+            result.extend(message_id(user) for user in users)
+        return result
+    
+    def cached_keys(self, locale):
+        '''Return the keys for which the result of the lookup in the locale is cached.'''
+        table = self.lookup_tables.get(locale, ())
+        result = set(message_keys[key_id] for key_id, formatter in enumerate(table) if formatter is not None)
+        result.update(message_keys[key_id] for key_id in self.fallback_tables.get(locale, ()))
+        return result
+    
+    def fallback_locales(self, locale):
+        result = self.fallback_cache.get(locale)
+        if result is None:
+            result = tuple(self.locale_fallback_strategy.apply(locale))
+            self.fallback_cache[locale] = result
+        
+        return result
 
     def lookup_message(self, i18n_message, locale):
-        fallback_locales = self.locale_fallback_strategy.apply(locale)
-        key = i18n_message.key
+        key_id = i18n_message.key_id
+        if key_id is None:
+            key_id = message_id(i18n_message.key)
+        
+        # Fast path: A single index operation
+        table = self.lookup_tables.get(locale)
+        if table is not None and key_id < len(table):
+            formatter = table[key_id]
+            if formatter is not None:
+                return formatter
+        
+        fallback_table = self.fallback_tables.get(locale)
+        if fallback_table is not None:
+            formatter = fallback_table.get(key_id)
+            if formatter is not None:
+                return formatter
+        
+        formatter = self.resolve_id(key_id, locale)
+        if formatter is None:
+            formatter = self.resolve_key_fallbacks(message_keys[key_id], locale)
+            if formatter is None:
+                return self.missing_text_strategy.apply(i18n_message, locale)
+            
+            self.fallback_tables.setdefault(locale, {})[key_id] = formatter
+        
+        return formatter
+    
+    def resolve(self, key, locale):
+        return self.resolve_id(message_id(key), locale)
+    
+    def resolve_id(self, key_id, locale):
+        table = self.lookup_tables.get(locale)
+        if table is None:
+            table = self.lookup_tables.setdefault(locale, [])
+        
+        if key_id < len(table):
+            formatter = table[key_id]
+            if formatter is not None:
+                return formatter
+        
+        key = message_keys[key_id]
+        fallback_locales = self.fallback_locales(locale)
         self.log.debug('Looking for %r with locales %r', key, fallback_locales)
         for lc in fallback_locales:
             formatter = self.lookup_single_locale(key, lc)
             if formatter is not None:
+                if key_id >= len(table):
+                    table.extend([None] * (len(message_keys) - len(table)))
+                table[key_id] = formatter
                 return formatter
-
-        return self.missing_text_strategy.apply(i18n_message, locale)
+        
+        return None
+    
+    def locales(self):
+        return set(self.pattern_cache) | set(self.unparsed)
+    
+    def known_keys(self):
+        result = set()
+        for keys in self.pattern_cache.values():
+            result.update(keys)
+        for keys in self.unparsed.values():
+            result.update(keys)
+        return result
+    
+    def warm_up(self, locale, keys):
+        return [key for key in keys if self.resolve(key, locale) is None]
 
     def lookup_single_locale(self, key, locale):
         #self.log.debug('lookup_single_locale: Trying %s', locale)
@@ -393,26 +948,376 @@ class SimpleMessageProvider(MessageProvider):
             return None
         
         formatter = keys.get(key, None)
+        if formatter is None:
+            formatter = self.parse_unparsed(keys, key, locale)
+        
         if formatter is not None:
             self.log.debug('lookup_single_locale: Found key %r for %r', key, locale)
         
         return formatter
+    
+    def parse_unparsed(self, keys, key, locale):
+        unparsed = self.unparsed.get(locale)
+        if not unparsed or key not in unparsed:
+            return None
+        
+        with self.parse_lock:
+            # Another thread may have parsed it in the meantime
+            formatter = keys.get(key)
+            if formatter is not None:
+                return formatter
+            
+            pattern = unparsed.get(key)
+            if pattern is None:
+                return None
+            
+            json_keys = self.json_keys.get(locale)
+            is_json = json_keys and key in json_keys
+            if is_json:
+                import json
+                pattern = json.loads(pattern)
+            formatter = self.parser.parse(pattern)
+            keys[key] = formatter
+            unparsed.pop(key, None)
+            if is_json:
+                json_keys.discard(key)
+        
+        return formatter
+
+class OverlayMessageProvider(MessageProvider):
+    '''The texts of a tenant on top of a frozen SimpleMessageProvider.
+    
+    The overlay only keeps the texts which it overrides; all the other keys are
+    looked up in the shared tables of the base. For each locale in the fallback
+    chain, a text of the overlay wins over the text of the base in the same locale.
+    
+    Use it with a TranslationService of its own and call the same setup functions
+    (like pdark.i18n.babel.setup) as for the service of the base.'''
+    def __init__(self, base, missing_text_strategy=None):
+        if not base.frozen:
+            raise I18nException('The base of an overlay must be frozen')
+        if missing_text_strategy is None:
+            missing_text_strategy = base.missing_text_strategy
+        
+        super(OverlayMessageProvider, self).__init__(missing_text_strategy)
+        
+        self.base = base
+        self.default_locale = base.default_locale
+        self.parser = base.parser
+        # The texts of the tenant
+        self.texts = SimpleMessageProvider(base.default_locale, base.parser, missing_text_strategy, base.locale_fallback_strategy)
+        # message_id() of the keys which the tenant overrides in any locale
+        self.overridden = set()
+        # locale -> message_id(key) -> formatter for the overridden keys
+        self.lookup_tables = {}
+        # Key fallbacks of the tenant on top of those of the base
+        self.key_fallbacks = collections.ChainMap({}, base.key_fallbacks)
+    
+    def register_message(self, key, locale, pattern):
+        self.texts.register_message(key, locale, pattern)
+        self.overridden.add(message_id(key))
+        self.lookup_tables.clear()
+    
+    def register_patterns(self, locale, patterns):
+        self.merge_catalogs({locale: patterns})
+    
+    def merge_catalogs(self, catalogs):
+        self.texts.merge_catalogs(catalogs)
+        for patterns in catalogs.values():
+            self.overridden.update(message_id(key) for key in patterns)
+        self.lookup_tables.clear()
+    
+    def has_message(self, key, locale):
+        return self.texts.has_message(key, locale) or self.base.has_message(key, locale)
+    
+    def fallback_locales(self, locale):
+        return self.base.fallback_locales(locale)
+    
+    def lookup_message(self, i18n_message, locale):
+        key_id = i18n_message.key_id
+        if key_id is None:
+            key_id = message_id(i18n_message.key)
+        
+        formatter = self.resolve_id(key_id, locale)
+        if formatter is None:
+            formatter = self.resolve_key_fallbacks(message_keys[key_id], locale)
+            if formatter is None:
+                return self.missing_text_strategy.apply(i18n_message, locale)
+        
+        return formatter
+    
+    def resolve(self, key, locale):
+        return self.resolve_id(message_id(key), locale)
+    
+    def resolve_id(self, key_id, locale):
+        if not key_id in self.overridden:
+            return self.base.resolve_id(key_id, locale)
+        
+        table = self.lookup_tables.get(locale)
+        if table is None:
+            table = self.lookup_tables.setdefault(locale, {})
+        
+        formatter = table.get(key_id)
+        if formatter is not None:
+            return formatter
+        
+        key = message_keys[key_id]
+        for lc in self.fallback_locales(locale):
+            formatter = self.texts.lookup_single_locale(key, lc)
+            if formatter is None:
+                formatter = self.base.lookup_single_locale(key, lc)
+            if formatter is not None:
+                table[key_id] = formatter
+                return formatter
+        
+        return None
+    
+    def known_keys(self):
+        return self.base.known_keys() | self.texts.known_keys()
+    
+    def locales(self):
+        return self.base.locales() | self.texts.locales()
+    
+    @property
+    def locales_version(self):
+        return self.base.locales_version + self.texts.locales_version
+    
+    def warm_up(self, locale, keys):
+        return [key for key in keys if self.resolve(key, locale) is None]
+
+# Estimated size of a dict like {'arg': 'name'} in a pattern
+ARGUMENT_SIZE = 280
+
+def estimate_size(pattern):
+    '''Estimate how many bytes a pattern from a catalog needs.'''
+    size = sys.getsizeof(pattern)
+    if isinstance(pattern, (list, tuple)):
+        for part in pattern:
+            size += sys.getsizeof(part) if isinstance(part, str) else ARGUMENT_SIZE
+    return size
+
+class MessagePartition(object):
+    '''The texts of one namespace in one locale for BoundedMessageProvider.'''
+    def __init__(self, patterns):
+        self.formatters = {}
+        self.unparsed = patterns
+        self.size = sys.getsizeof(patterns) + sum(estimate_size(pattern) for pattern in patterns.values())
+    
+    def keys(self):
+        return set(self.formatters) | set(self.unparsed)
+
+# Returned for all the partitions without texts; it's never changed
+EMPTY_PARTITION = MessagePartition({})
+
+class BoundedMessageProvider(MessageProvider):
+    '''A message provider which keeps only the recently used texts in memory.
+    
+    The texts are split into partitions per locale and namespace. The namespace
+    of a key is the longest module name in namespaces which is a prefix of the key
+    (by default the modules with I18N functions, see i18nKnownModules) or else
+    the key without its last part.
+    
+    source(locale, namespace) returns a dict key -> pattern with the texts of a
+    partition; additional keys are ignored. Partitions are loaded on first use.
+    When the estimated size of all the partitions is above budget (in bytes),
+    the least recently used partitions are dropped; they are loaded again when
+    they are needed. Partitions without texts are remembered but don't count
+    for the budget.'''
+    
+    # Estimated size of a parsed MessageFormatter and of each of its fragments;
+    # most fragments are shared with other patterns (see MessageParser)
+    FORMATTER_SIZE = 140
+    FRAGMENT_SIZE = 12
+    
+    def __init__(self, default_locale, parser, source, budget, locales=None, namespaces=None, missing_text_strategy=None, locale_fallback_strategy=None):
+        super(BoundedMessageProvider, self).__init__(missing_text_strategy)
+        
+        self.default_locale = default_locale
+        self.parser = parser
+        self.source = source
+        self.budget = budget
+        self.available_locales = set(locales or ())
+        self.namespaces = i18nKnownModules if namespaces is None else namespaces
+        self.locale_fallback_strategy = self.create_locale_fallback_strategy(locale_fallback_strategy)
+        
+        # locale -> tuple of fallback locales
+        self.fallback_cache = {}
+        # message_id(key) -> namespace
+        self.namespace_cache = {}
+        # (locale, namespace) -> MessagePartition; the least recently used first
+        self.partitions = collections.OrderedDict()
+        # (locale, namespace) of the partitions without texts, which are common in
+        # the fallback chains; they are kept apart and don't count for the budget
+        self.empty_partitions = set()
+        self.lock = threading.RLock()
+        
+        self.resident_size = 0
+        self.loads = 0
+        self.evictions = 0
+    
+    def create_locale_fallback_strategy(self, locale_fallback_strategy):
+        if locale_fallback_strategy is None:
+            return LocaleFallbackStrategy(self.default_locale)
+        
+        return locale_fallback_strategy
+    
+    def fallback_locales(self, locale):
+        result = self.fallback_cache.get(locale)
+        if result is None:
+            result = tuple(self.locale_fallback_strategy.apply(locale))
+            self.fallback_cache[locale] = result
+        
+        return result
+    
+    def namespace_of(self, key):
+        key_id = message_id(key)
+        result = self.namespace_cache.get(key_id)
+        if result is None:
+            result = key.rpartition('.')[0]
+            prefix = result
+            while prefix:
+                if prefix in self.namespaces:
+                    result = prefix
+                    break
+                prefix = prefix.rpartition('.')[0]
+            self.namespace_cache[key_id] = result
+        
+        return result
+    
+    def partition(self, locale, namespace):
+        '''Return the partition and mark it as recently used; loads it when necessary.'''
+        partition_key = (locale, namespace)
+        with self.lock:
+            partition = self.partitions.get(partition_key)
+            if partition is not None:
+                self.partitions.move_to_end(partition_key)
+                return partition
+            if partition_key in self.empty_partitions:
+                return EMPTY_PARTITION
+        
+        patterns = self.source(locale, namespace) or {}
+        prefix = namespace + '.' if namespace else ''
+        namespace_of = self.namespace_of
+        patterns = dict((key, pattern) for key, pattern in patterns.items() if key.startswith(prefix) and namespace_of(key) == namespace)
+        if not patterns:
+            with self.lock:
+                self.loads += 1
+                self.empty_partitions.add(partition_key)
+            self.log.debug('No texts for %r in %r', namespace, locale)
+            return EMPTY_PARTITION
+        
+        partition = MessagePartition(patterns)
+        
+        with self.lock:
+            self.loads += 1
+            old = self.partitions.pop(partition_key, None)
+            if old is not None:
+                self.resident_size -= old.size
+            self.partitions[partition_key] = partition
+            self.resident_size += partition.size
+            self.evict()
+        
+        self.log.debug('Loaded %d texts for %r in %r', len(patterns), namespace, locale)
+        return partition
+    
+    def evict(self):
+        '''Drop the least recently used partitions until the size is within the budget.
+        
+        The partition which was used last is always kept.'''
+        while self.resident_size > self.budget and len(self.partitions) > 1:
+            partition_key, partition = self.partitions.popitem(last=False)
+            self.resident_size -= partition.size
+            self.evictions += 1
+            self.log.debug('Evicted %r', partition_key)
+    
+    def lookup_single_locale(self, key, locale):
+        partition = self.partition(locale, self.namespace_of(key))
+        formatter = partition.formatters.get(key)
+        if formatter is not None:
+            return formatter
+        
+        pattern = partition.unparsed.get(key)
+        if pattern is None:
+            return None
+        
+        formatter = self.parser.parse(pattern)
+        with self.lock:
+            if partition.unparsed.pop(key, None) is not None:
+                partition.formatters[key] = formatter
+                size = self.FORMATTER_SIZE + self.FRAGMENT_SIZE * len(formatter.fragments) - estimate_size(pattern)
+                partition.size += size
+                if self.partitions.get((locale, self.namespace_of(key))) is partition:
+                    self.resident_size += size
+                    self.evict()
+        
+        return formatter
+    
+    def resolve(self, key, locale):
+        for lc in self.fallback_locales(locale):
+            formatter = self.lookup_single_locale(key, lc)
+            if formatter is not None:
+                return formatter
+        
+        return None
+    
+    def has_message(self, key, locale):
+        partition = self.partition(locale, self.namespace_of(key))
+        return key in partition.formatters or key in partition.unparsed
+    
+    def known_keys(self):
+        '''Only the keys of the partitions in memory are known.'''
+        result = set()
+        with self.lock:
+            for partition in self.partitions.values():
+                result.update(partition.keys())
+        return result
+    
+    def locales(self):
+        return set(self.available_locales)
+    
+    def warm_up(self, locale, keys):
+        return [key for key in keys if self.resolve(key, locale) is None]
+    
+    def stats(self):
+        '''Return the counters as a dict.'''
+        with self.lock:
+            return {
+                'partitions': len(self.partitions),
+                'empty_partitions': len(self.empty_partitions),
+                'resident_size': self.resident_size,
+                'budget': self.budget,
+                'loads': self.loads,
+                'evictions': self.evictions,
+            }
 
 class TranslationService(object):
     '''This service is the core of the whole system.
     
     It connects all the other parts, namely the message provider and the
     formatter factory.'''
-    def __init__(self, default_locale=None, formatter_factory=None, message_provider=None):
+    # How deep messages can be nested in arguments of other messages
+    DEFAULT_MAX_DEPTH = 50
+    
+    def __init__(self, default_locale=None, formatter_factory=None, message_provider=None, max_depth=None, budget=None):
         self.log = getLogger(self)
         
+        self.max_depth = self.DEFAULT_MAX_DEPTH if max_depth is None else max_depth
+        # RenderBudget for each call of translate() or None for no limits
+        self.budget = budget
         self.default_locale = self.determine_default_locale(default_locale)
         self.formatter_factory = self.create_formatter_factory(formatter_factory)
         self.message_provider = self.create_message_provider(message_provider)
+        # pdark.i18n.babel.setup() replaces this with the rules of all locales
+        self.plural_rules = PluralRules()
+        
+        # Set when warm_up() is done; readiness probes can wait for it
+        self.ready = threading.Event()
+        # formatter -> refs of its arguments or None; see plain_refs()
+        self.plain_refs_cache = weakref.WeakKeyDictionary()
     
     def determine_default_locale(self, default_locale):
         if default_locale is None:
-            return locale.getdefaultlocale()[0]
+            return locale_from_environment()
         
         return default_locale
     
@@ -431,29 +1336,615 @@ class TranslationService(object):
     
     def translate(self, i18n_message, locale=None):
         '''Translate a I18N message: Get the message itself from the message provider
-        and format it using the arguments.'''
+        and format it using the arguments.
+        
+        Without a locale, the locale of the message is used, then the locale
+        bound to current_locale (for example by the middleware in pdark.i18n.web)
+        and then the default locale.
+        
+        Messages in the arguments are translated in the same RenderContext.
+        
+        When the budget of the service runs out, the degraded text is returned
+        (see RenderBudget).'''
+        if locale is None:
+            locale = self.message_locale(i18n_message)
+        
+        context = current_render_context.get()
+        if context is not None and context.ts is self:
+            return context.render(i18n_message, locale)
+        
+        return self.translate_in_context(i18n_message, locale, self.create_render_context())
+    
+    def translate_in_context(self, i18n_message, locale, context):
+        '''Translate the message with a new RenderContext like translate() does.'''
+        token = current_render_context.set(context)
         try:
-            if locale is None:
-                locale = i18n_message.locale
-            
+            return context.render(i18n_message, locale)
+        except I18nBudgetException as e:
+            return context.degraded_text(i18n_message, e)
+        except Exception as e:
+            raise I18nException('Error translating %s, locale=%r: %s' % (safe_repr(i18n_message), locale, e)) from e
+        finally:
+            current_render_context.reset(token)
+    
+    def try_translate(self, i18n_message, locale=None):
+        '''Like translate() but return MISSING when there is no text for the message.
+        
+        The missing text strategy isn't used for this message (but for messages
+        in the arguments), so a missing text is cheap.'''
+        if locale is None:
+            locale = self.message_locale(i18n_message)
+        
+        if self.message_provider.find_message(i18n_message, locale) is MISSING:
+            return MISSING
+        
+        return self.translate(i18n_message, locale)
+    
+    def message_locale(self, i18n_message):
+        '''The locale for a message when translate() gets none.'''
+        locale = i18n_message.locale
+        if locale is None:
+            locale = current_locale.get()
             if locale is None:
                 locale = self.default_locale
+        
+        return locale
+    
+    def create_render_context(self):
+        return RenderContext(self, self.max_depth, self.budget)
+
+    def warm_up(self, locales, keys=None, sample_args=None, max_workers=None):
+        '''Do all the work which the first translation in each locale would do.
+        
+        This includes building the fallback chains, preparing the texts for the keys
+        (all known keys when keys is None) and loading data for the formatters (like Babel's locale data).
+        
+        sample_args is a list of typical argument values (numbers, lists, dates, ...). They
+        will be formatted once in every locale to set up the formatters for their types.
+        
+        With max_workers, the locales are processed in a thread pool.
+        
+        Sets the event ready when it's done. Returns a WarmUpReport.'''
+        report = WarmUpReport()
+        start = time.perf_counter()
+        
+        if keys is None:
+            with report.phase('keys'):
+                keys = self.message_provider.known_keys()
+        keys = list(keys)
+        
+        def warm_up_locale(locale):
+            self.warm_up_locale(report, locale, keys, sample_args or ())
+        
+        if max_workers is None:
+            for locale in locales:
+                warm_up_locale(locale)
+        else:
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers) as pool:
+                for future in [pool.submit(warm_up_locale, locale) for locale in locales]:
+                    future.result()
+        
+        report.total = time.perf_counter() - start
+        self.log.info('%s', report)
+        self.ready.set()
+        return report
+    
+    def warm_up_locale(self, report, locale, keys, sample_args):
+        with report.phase('fallback'):
+            fallback_locales = getattr(self.message_provider, 'fallback_locales', None)
+            if fallback_locales is not None:
+                fallback_locales(locale)
+        
+        with report.phase('formatters'):
+            warm_up = getattr(self.formatter_factory, 'warm_up', None)
+            if warm_up is not None:
+                warm_up(locale)
+        
+        with report.phase('messages'):
+            missing = self.message_provider.warm_up(locale, keys)
+        
+        with report.phase('samples'):
+            for value in sample_args:
+                formatter = self.formatter_factory.create_formatter(locale, value, {})
+                formatter.format(value)
+        
+        report.add_locale(locale, len(keys), missing)
+    
+    def translate_to_locales(self, i18n_message, locales, max_workers=None):
+        '''Translate the message into many locales at once; returns a dict locale -> text.
+        
+        Locales share the output when the message and all the messages in its
+        arguments get the same texts from the message provider and the texts don't
+        depend on the locale otherwise (see share_groups()). When only some of the
+        messages in the arguments are like that, their texts are shared. Deferred
+        arguments are evaluated only once.
+        
+        The other locales are translated one by one or, with max_workers, in
+        a thread pool. The pool only helps when the formatters don't hold the
+        GIL, for example when they wait for I/O or Python runs without GIL.'''
+        locales = list(locales)
+        
+        # (message in the arguments, locales which share its text); see share_groups().
+        # With a budget, each translation must render all of its messages.
+        shared = []
+        # Usually, the types of the arguments decide whether locales can share
+        # the output, so check the first locale before all of them
+        if len(locales) > 1 and (self.is_plain(i18n_message, locales[0]) or self.message_values(i18n_message)):
+            groups = self.share_groups(i18n_message, locales, shared=shared if self.budget is None else None)
+        else:
+            groups = [[locale] for locale in locales]
+        
+        translate = self.translate
+        if shared:
+            # The RenderContexts of all the locales start with the texts of the shared messages
+            memo = {}
+            for message, group in shared:
+                text = self.translate_in_context(message, group[0], self.shared_render_context(memo))
+                for locale in group[1:]:
+                    memo[(id(message), locale)] = (message, text)
+            translate = lambda i18n_message, locale: self.translate_in_context(i18n_message, locale, self.shared_render_context(memo))
+        
+        texts = {}
+        separate = []
+        for group in groups:
+            if len(group) == 1:
+                separate.append(group[0])
+            else:
+                text = translate(i18n_message, group[0])
+                texts.update((locale, text) for locale in group)
+        
+        if max_workers is None or len(separate) < 2:
+            for locale in separate:
+                texts[locale] = translate(i18n_message, locale)
+        else:
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers) as pool:
+                texts.update(zip(separate, pool.map(lambda locale: translate(i18n_message, locale), separate)))
+        
+        return dict((locale, texts[locale]) for locale in locales)
+    
+    def shared_render_context(self, memo):
+        context = self.create_render_context()
+        context.memo = memo
+        return context
+    
+    def share_groups(self, i18n_message, locales, depth=0, shared=None):
+        '''Split the locales into lists of locales which have the same text for the message.
+        
+        That's the case when they get the same texts for the message and all the
+        messages in its arguments and the texts only contain text and plain
+        arguments which are strings or messages. Plurals, options and other types
+        of values depend on the locale; those locales get a list of their own.
+        
+        With a list as shared, the messages in the arguments of those are
+        checked, too. (message, locales) is appended for the messages in the
+        arguments which several locales share while the message itself isn't
+        shared.'''
+        # id(formatter) -> (formatter, locales)
+        by_formatter = collections.OrderedDict()
+        for locale in locales:
+            formatter = self.message_provider.find_message(i18n_message, locale)
+            entry = by_formatter.get(id(formatter))
+            if entry is None:
+                by_formatter[id(formatter)] = (formatter, [locale])
+            else:
+                entry[1].append(locale)
+        
+        result = []
+        for formatter, group in by_formatter.values():
+            values = self.plain_values(i18n_message, formatter) if len(group) > 1 and depth < self.max_depth else None
+            if values is None:
+                # The message is rendered for each locale but the messages in its arguments can be shared
+                if shared is not None and len(group) > 1 and depth < self.max_depth:
+                    for value in self.message_values(i18n_message):
+                        self.add_shared(shared, value, self.share_groups(value, group, depth + 1, shared))
+                result.extend([locale] for locale in group)
+                continue
             
-            formatter = self.message_provider.lookup_message(i18n_message, locale)
-            if formatter is None:
-                raise I18nException('Missing formatter for %r, locale=%r' % (i18n_message, locale))
+            groups = [group]
+            value_groups = []
+            for value in values:
+                refined = []
+                value_group = []
+                for subgroup in groups:
+                    if len(subgroup) > 1:
+                        subgroups = self.share_groups(value, subgroup, depth + 1, shared)
+                        refined.extend(subgroups)
+                        value_group.extend(subgroups)
+                    else:
+                        refined.append(subgroup)
+                groups = refined
+                value_groups.append((value, value_group))
             
-            args = i18n_message.args
-            kwargs = i18n_message.kwargs
-
+            # Sharing the text of a message in the arguments only helps when
+            # its locales don't share the whole text
+            if shared is not None and len(groups) > 1:
+                # locale -> index of its list in groups when some locales still share the text
+                text_group = None
+                for value, value_group in value_groups:
+                    value_group = [subgroup for subgroup in value_group if len(subgroup) > 1]
+                    if value_group and len(groups) < len(group):
+                        if text_group is None:
+                            text_group = dict((locale, i) for i, subgroup in enumerate(groups) for locale in subgroup)
+                        value_group = [subgroup for subgroup in value_group if len(set(text_group[locale] for locale in subgroup)) > 1]
+                    self.add_shared(shared, value, value_group)
+            result.extend(groups)
+        
+        return result
+    
+    def add_shared(self, shared, i18n_message, groups):
+        shared.extend((i18n_message, group) for group in groups if len(group) > 1)
+    
+    def message_values(self, i18n_message):
+        '''Return the messages in the arguments of the message.'''
+        result = []
+        seen = set()
+        for values in (i18n_message.args, i18n_message.kwargs.values()):
+            for value in values:
+                if isinstance(value, I18NMessage) and id(value) not in seen:
+                    seen.add(id(value))
+                    result.append(value)
+        return result
+    
+    def is_plain(self, i18n_message, locale, depth=0):
+        '''Check that the text of the message and all the messages in its arguments
+        don't depend on the locale in other ways than the message provider.'''
+        if depth >= self.max_depth:
+            return False
+        
+        values = self.plain_values(i18n_message, self.message_provider.find_message(i18n_message, locale))
+        if values is None:
+            return False
+        
+        for value in values:
+            if not self.is_plain(value, locale, depth + 1):
+                return False
+        
+        return True
+    
+    def plain_values(self, i18n_message, formatter):
+        '''Return the messages in the arguments which the formatter uses.
+        
+        Returns None when the text depends on the locale: when the formatter
+        contains more than text and arguments without options or when the
+        values of the arguments are neither strings nor messages.'''
+        refs = self.plain_refs(formatter)
+        if refs is None:
+            return None
+        
+        result = []
+        args, kwargs = i18n_message.args, i18n_message.kwargs
+        for ref in refs:
             try:
-                result = formatter.format(locale, args, kwargs)
-            except Exception as e:
-                raise I18nException('Error formatting with %r, args=%r, kwargs=%r: %s' % (formatter, args, kwargs, e)) from e
-            return result
+                value = ref.get(args, kwargs)
+            except (IndexError, KeyError):
+                # translate() will report it
+                return None
+            
+            if isinstance(value, I18NMessage):
+                result.append(value)
+            elif not isinstance(value, str):
+                return None
+        
+        return result
+    
+    def plain_refs(self, formatter):
+        '''Return the refs of the arguments when the formatter only contains text
+        and arguments without options, else None.'''
+        fragments = getattr(formatter, 'fragments', None)
+        if fragments is None:
+            return None
+        
+        result = self.plain_refs_cache.get(formatter, MISSING)
+        if result is MISSING:
+            result = []
+            for fragment in fragments:
+                t = type(fragment)
+                if t is ArgumentFragment and not fragment.options:
+                    result.append(fragment.ref)
+                elif t is not TextFragment:
+                    result = None
+                    break
             
+            if result is not None:
+                result = tuple(result)
+            self.plain_refs_cache[formatter] = result
+        
+        return result
+    
+    def lazy(self, i18n_message, locale=None):
+        '''Wrap the message in a proxy which is translated when it's converted to a string.'''
+        return LazyTranslation(self, i18n_message, locale)
+
+# The RenderContext of the translation which is running right now
+current_render_context = contextvars.ContextVar('pdark.i18n.render_context', default=None)
+# The locale for translations which don't specify one, like the locale of the current HTTP request
+current_locale = contextvars.ContextVar('pdark.i18n.locale', default=None)
+
+def rendering_service(ts):
+    '''Return the service of the running translation or ts outside of translations.
+    
+    Parsed texts can be shared by several services (see OverlayMessageProvider),
+    so fragments must not format their arguments with the service which parsed them.'''
+    context = current_render_context.get()
+    if context is None:
+        return ts
+    return context.ts
+
+def safe_repr(i18n_message):
+    try:
+        return repr(i18n_message)
+    except RecursionError:
+        return 'I18NMessage(%s, ...)' % (i18n_message.key,)
+
+class RenderBudget(object):
+    '''Limits for a single render: wall time in seconds, length of the output
+    and how deep messages can be nested. None means no limit.
+    
+    The limits are checked cooperatively for MessageFormatters (after each
+    fragment), by ListFormatter (after each item) and RenderContext (for each
+    nested message), so a slow detail formatter is only noticed when it returns.
+    Compiled formatters (see pdark.i18n.compiled) only check the depth.
+    
+    When a limit is reached, translate() returns the degraded text instead:
+    with TRUNCATE the text rendered so far (cut at max_length) plus the
+    ellipsis, with KEY the key of the message. exceeded counts the
+    events by reason ('time', 'length' or 'depth').'''
+    
+    TRUNCATE = 'truncate'
+    KEY = 'key'
+    
+    def __init__(self, max_time=None, max_length=None, max_depth=None, degrade=TRUNCATE, ellipsis='\u2026'):
+        if degrade not in (self.TRUNCATE, self.KEY):
+            raise I18nException('Unknown way to degrade: %r' % (degrade,))
+        
+        self.log = getLogger(self)
+        
+        self.max_time = max_time
+        self.max_length = max_length
+        self.max_depth = max_depth
+        self.degrade = degrade
+        self.ellipsis = ellipsis
+        
+        # reason -> number of degraded renders
+        self.exceeded = collections.Counter()
+        self.lock = threading.Lock()
+    
+    def degraded_text(self, i18n_message, e):
+        with self.lock:
+            self.exceeded[e.reason] += 1
+        self.log.debug('Render budget exceeded (%s) for %s', e.reason, i18n_message.key)
+        
+        if self.degrade == self.KEY:
+            return i18n_message.key
+        
+        partial = e.partial
+        if self.max_length is not None and len(partial) > self.max_length:
+            partial = partial[:self.max_length]
+        return partial + self.ellipsis
+
+class RenderContext(object):
+    '''State of one call of TranslationService.translate() which is shared by all
+    the messages nested in the arguments.
+    
+    When the same message object appears several times in the tree, it's only
+    rendered once per locale. Messages which contain themselves and trees
+    deeper than max_depth cause an I18nException.
+    
+    With a RenderBudget, the formatters call exceeded_budget() and raise
+    I18nBudgetException when a limit is reached.'''
+    def __init__(self, ts, max_depth, budget=None):
+        self.ts = ts
+        self.max_depth = max_depth
+        # (id(message), locale) -> (message, text); the message is kept so the id stays unique
+        self.memo = {}
+        # ids of the messages which are being rendered right now
+        self.active = set()
+        
+        self.budget = budget
+        self.deadline = None
+        if budget is not None and budget.max_time is not None:
+            self.deadline = time.monotonic() + budget.max_time
+    
+    def render(self, i18n_message, locale):
+        memo_key = (id(i18n_message), locale)
+        entry = self.memo.get(memo_key)
+        if entry is not None:
+            return entry[1]
+        
+        message_id = memo_key[0]
+        if message_id in self.active:
+            raise I18nFormatException('Message %s contains itself' % (i18n_message.key,))
+        
+        if len(self.active) >= self.max_depth:
+            raise I18nFormatException('Messages are nested deeper than %d at %s' % (self.max_depth, i18n_message.key))
+        
+        budget = self.budget
+        if budget is not None and budget.max_depth is not None and len(self.active) >= budget.max_depth:
+            raise I18nBudgetException('depth')
+        
+        self.active.add(message_id)
+        try:
+            text = self.render_uncached(i18n_message, locale)
+        finally:
+            self.active.discard(message_id)
+        
+        self.memo[memo_key] = (i18n_message, text)
+        return text
+    
+    def render_uncached(self, i18n_message, locale):
+        formatter = self.ts.message_provider.lookup_message(i18n_message, locale)
+        if formatter is None:
+            raise I18nException('Missing formatter for %r, locale=%r' % (i18n_message.key, locale))
+        
+        args = i18n_message.args
+        kwargs = i18n_message.kwargs
+        try:
+            if self.budget is not None and isinstance(formatter, MessageFormatter):
+                return self.format_fragments(formatter.fragments, locale, args, kwargs)
+            return formatter.format(locale, args, kwargs)
+        except I18nFormatException:
+            raise
         except Exception as e:
-            raise I18nException('Error translating %r, locale=%r: %s' % (i18n_message, locale, e)) from e
+            raise I18nFormatException('Error formatting %s' % (i18n_message.key,), (i18n_message.key, formatter, args, kwargs, e)) from e
+    
+    def exceeded_budget(self, length):
+        '''Return the reason why the budget is used up after rendering length characters or None.'''
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            return 'time'
+        
+        max_length = self.budget.max_length
+        if max_length is not None and length > max_length:
+            return 'length'
+        
+        return None
+    
+    def format_fragments(self, fragments, locale, args, kwargs):
+        '''MessageFormatter.format() which checks the budget after each fragment.'''
+        buffer = StringIO()
+        
+        for fragment in fragments:
+            try:
+                fragment.append_to(buffer, locale, args, kwargs)
+            except I18nBudgetException as e:
+                e.partial = buffer.getvalue() + e.partial
+                raise
+            
+            reason = self.exceeded_budget(buffer.tell())
+            if reason is not None:
+                raise I18nBudgetException(reason, buffer.getvalue())
+        
+        return buffer.getvalue()
+    
+    def degraded_text(self, i18n_message, e):
+        return self.budget.degraded_text(i18n_message, e)
+
+class WarmUpReport(object):
+    '''How much time TranslationService.warm_up() spent in each phase.
+    
+    With a thread pool, the phase times are summed over all threads.'''
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.phases = collections.OrderedDict()
+        self.locales = []
+        self.keys = 0
+        self.missing = {}
+        self.total = 0.0
+    
+    def phase(self, name):
+        return WarmUpPhase(self, name)
+    
+    def add_time(self, name, duration):
+        with self.lock:
+            self.phases[name] = self.phases.get(name, 0.0) + duration
+    
+    def add_locale(self, locale, keys, missing):
+        with self.lock:
+            self.locales.append(locale)
+            self.keys += keys
+            if missing:
+                self.missing[locale] = missing
+    
+    def __str__(self):
+        phases = ', '.join('%s=%.1fms' % (name, duration * 1000) for name, duration in self.phases.items())
+        missing = sum(len(keys) for keys in self.missing.values())
+        return 'Warm up of %d locales, %d keys (%d missing) took %.1fms: %s' % (
+            len(self.locales), self.keys, missing, self.total * 1000, phases)
+
+class WarmUpPhase(object):
+    def __init__(self, report, name):
+        self.report, self.name = report, name
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *args):
+        self.report.add_time(self.name, time.perf_counter() - self.start)
+
+class LazyTranslation(object):
+    '''Proxy for an I18N message which is only translated when it's turned into a string.
+    
+    Use this when an API wants a string but might never display it, for example
+    as an argument for a log message. The result is cached per locale.'''
+    def __init__(self, ts, i18n_message, locale=None):
+        self.ts = ts
+        self.i18n_message = i18n_message
+        self.locale = locale
+        self.cache = {}
+    
+    def in_locale(self, locale):
+        '''Return the text for the locale, translating it on first use.
+        
+        Without a locale, the locale is determined like translate() does, so
+        the proxy follows current_locale.'''
+        if locale is None:
+            locale = self.ts.message_locale(self.i18n_message)
+        
+        text = self.cache.get(locale)
+        if text is None:
+            text = self.ts.translate(self.i18n_message, locale)
+            self.cache[locale] = text
+        
+        return text
+    
+    def __str__(self):
+        return self.in_locale(self.locale)
+    
+    def __format__(self, spec):
+        return format(str(self), spec)
+    
+    def __repr__(self):
+        return 'LazyTranslation(%r)' % (self.i18n_message,)
+
+def locale_from_environment(environ=os.environ):
+    '''Determine the locale of the user from the environment variables.
+    
+    Unlike locale.getdefaultlocale(), which looked at LC_CTYPE, this uses
+    LC_MESSAGES since it's about the language of texts. Well-formed names
+    like 'de_CH.UTF-8@euro' are only stripped to 'de_CH'; the expensive
+    normalization of the locale module is only used for other names like
+    'german'. Without environment variables (Windows), the locale of the
+    user is asked from the system like getdefaultlocale() did.'''
+    for name in ('LC_ALL', 'LC_MESSAGES', 'LANG', 'LANGUAGE'):
+        value = environ.get(name)
+        if not value:
+            continue
+        
+        if name == 'LANGUAGE':
+            value = value.split(':')[0]
+        
+        return normalize_environment_locale(value)
+    
+    # No environment variables, for example on Windows
+    import _locale
+    if not hasattr(_locale, '_getdefaultlocale'):
+        return None
+    
+    code = _locale._getdefaultlocale()[0]
+    if code is not None and code.startswith('0x'):
+        import locale
+        code = locale.windows_locale.get(int(code, 0))
+    return code
+
+def normalize_environment_locale(value):
+    '''Turn the value of an environment variable like LANG into a locale or None for C/POSIX.'''
+    name = value.split('.')[0].split('@')[0]
+    if name in ('C', 'POSIX'):
+        return None
+    
+    parts = name.split('_')
+    language = parts[0]
+    if 2 <= len(language) <= 3 and language.isalpha() and language.islower() and \
+            (len(parts) == 1 or (len(parts) == 2 and parts[1].isalpha() and parts[1].isupper())):
+        return name
+    
+    import locale
+    try:
+        return locale._parse_localename(locale.normalize(value))[0] or name
+    except ValueError:
+        return name
 
 class LocaleFallbackStrategy(object):
     '''Determine the order in which locales will be searched.
@@ -479,10 +1970,146 @@ class LocaleFallbackStrategy(object):
 
             locale = locale[:pos]        
 
-class Fragment(object): pass
+def normalize_locale(locale):
+    '''Convert the various spellings of a locale into the form used by the message providers.
+    
+    'en-us', 'EN_US' and 'en_US' all become 'en_US', 'zh-hant-tw' becomes 'zh_Hant_TW'.
+    The result is interned, so comparing and hashing it is cheap.'''
+    parts = locale.strip().replace('-', '_').split('_')
+    result = [parts[0].lower()]
+    for part in parts[1:]:
+        if len(part) == 4:
+            # Script like Hant or Latn
+            result.append(part.title())
+        else:
+            result.append(part.upper())
+    
+    return sys.intern('_'.join(result))
+
+class AcceptLanguageNegotiator(object):
+    '''Find the best available locale for an HTTP Accept-Language header.
+    
+    For each language in the header (highest quality first), the locale
+    itself and then the locale without details is tried: 'de-CH' will
+    match 'de_CH' and then 'de'. If that fails, any available locale with
+    the same language is used, so 'de' still matches 'de_DE'.
+    
+    The results are cached per header string. The cache is bounded; when
+    it's full, the oldest entry is dropped.'''
+    def __init__(self, available_locales, default_locale=None, cache_size=1000):
+        self.log = getLogger(self)
+        
+        self.default_locale = default_locale
+        self.cache_size = cache_size
+        self.lock = threading.Lock()
+        self.set_available_locales(available_locales)
+        # Set by for_provider()
+        self.message_provider = None
+        self.locales_version = None
+    
+    @classmethod
+    def for_provider(cls, message_provider, **kwargs):
+        '''Negotiate against the locales for which a message provider has texts.
+        
+        The locales are read again when texts for new locales are added.'''
+        kwargs.setdefault('default_locale', message_provider.default_locale)
+        negotiator = cls(message_provider.locales(), **kwargs)
+        negotiator.message_provider = message_provider
+        negotiator.locales_version = message_provider.locales_version
+        return negotiator
+    
+    def set_available_locales(self, available_locales):
+        '''Change the available locales. This clears the cache.'''
+        self.available = {}
+        self.by_language = {}
+        for locale in sorted(available_locales):
+            normalized = normalize_locale(locale)
+            self.available[normalized] = locale
+            self.by_language.setdefault(normalized.split('_')[0], locale)
+        
+        # The locale which is just the language is the best match for the language
+        for normalized, locale in self.available.items():
+            if not '_' in normalized:
+                self.by_language[normalized] = locale
+        
+        self.cache = {}
+    
+    def negotiate(self, header):
+        '''Return the best available locale for the header or the default locale.'''
+        message_provider = self.message_provider
+        if message_provider is not None and message_provider.locales_version != self.locales_version:
+            self.locales_version = message_provider.locales_version
+            self.set_available_locales(message_provider.locales())
+        
+        result = self.cache.get(header)
+        if result is not None or header in self.cache:
+            return result
+        
+        result = self.negotiate_uncached(header)
+        with self.lock:
+            if len(self.cache) >= self.cache_size:
+                del self.cache[next(iter(self.cache))]
+            self.cache[header] = result
+        
+        return result
+    
+    def negotiate_uncached(self, header):
+        for tag in self.parse(header):
+            if tag == '*':
+                return self.default_locale
+            
+            locale = self.match(normalize_locale(tag))
+            if locale is not None:
+                return locale
+        
+        return self.default_locale
+    
+    def match(self, normalized):
+        while True:
+            locale = self.available.get(normalized)
+            if locale is not None:
+                return locale
+            
+            pos = normalized.rfind('_')
+            if pos < 0:
+                break
+            normalized = normalized[:pos]
+        
+        return self.by_language.get(normalized)
+    
+    def parse(self, header):
+        '''Return the language tags of the header, best first. Tags with quality 0 are omitted.'''
+        weighted = []
+        for index, item in enumerate((header or '').split(',')):
+            parts = item.split(';')
+            tag = parts[0].strip()
+            if not tag:
+                continue
+            
+            quality = 1.0
+            for param in parts[1:]:
+                name, _, value = param.partition('=')
+                if name.strip() == 'q':
+                    try:
+                        quality = float(value)
+                    except ValueError:
+                        self.log.debug('Invalid quality in %r', item)
+                        quality = 0.0
+            
+            if quality > 0:
+                weighted.append((-quality, index, tag))
+        
+        weighted.sort()
+        return [tag for quality, index, tag in weighted]
+
+class Fragment(object):
+    # Fragments are immutable and shared; see MessageParser
+    __slots__ = ('__weakref__',)
 
 class TextFragment(Fragment):
     '''A plain text fragment of a message.'''
+    __slots__ = ('text',)
+    
     def __init__(self, text):
         self.text = text
     
@@ -494,13 +2121,15 @@ class TextFragment(Fragment):
 
 class ArgumentFragment(Fragment):
     '''A fragment which references a parameter of the I18N message.'''
+    __slots__ = ('ts', 'ref', 'options')
+    
     def __init__(self, ts, ref, options):
         self.ts, self.ref, self.options = ts, ref, options
 
     def append_to(self, buffer, locale, args, kwargs):
         value = self.ref.get(args, kwargs)
         #print('ref=%r value=%r' % (self.ref, value))
-        formatter = self.ts.formatter_factory.create_formatter(locale, value, self.options)
+        formatter = rendering_service(self.ts).formatter_factory.create_formatter(locale, value, self.options)
         #print('formatter=%r' % formatter)
         text = formatter.format(value)
         buffer.write(text)
@@ -513,11 +2142,16 @@ class ArgumentFragment(Fragment):
 
 class IndexRef(object):
     '''Access a parameter by index (0, 1, ... n)'''
+    __slots__ = ('index',)
+    
     def __init__(self, index):
         self.index = index
     
     def get(self, args, kwargs):
-        return args[self.index]
+        value = args[self.index]
+        if value.__class__ is Deferred:
+            return value.get()
+        return value
     
     def __repr__(self):
         return '[%d]' % self.index
@@ -536,17 +2170,24 @@ class NameRef(object):
     
     - it's not that much slower
     '''
+    __slots__ = ('name',)
+    
     def __init__(self, name):
         self.name = name
     
     def get(self, args, kwargs):
-        return kwargs[self.name]
+        value = kwargs[self.name]
+        if value.__class__ is Deferred:
+            return value.get()
+        return value
     
     def __repr__(self):
         return '[%r]' % self.name
 
 class MessageFormatter(object):
     '''Efficiently collect all fragments into a single string.'''
+    __slots__ = ('fragments', '__weakref__')
+    
     def __init__(self, fragments):
         self.fragments = tuple(fragments)
     
@@ -563,16 +2204,74 @@ class MessageFormatter(object):
 
 def text_message_formatter(text):
     '''Convenience function to turn a string into a message.'''
-    return MessageFormatter(TextFragment(text))
+    return MessageFormatter((TextFragment(text),))
 
 class MessageParser(object):
     '''Parse a pattern into a MessageFormatter.
     
-    See the method parse() for examples.'''
+    See the method parse() for examples.
+    
+    Formatters, fragments and refs are immutable. The parser shares identical
+    ones between all the patterns which it parses, in all locales (hash-consing).
+    There are only a few different refs and arguments and the texts which
+    repeat are short, so only those are kept in the tables forever. The table
+    of the formatters doesn't keep them alive.'''
+    
+    # Longer texts are rarely the same and are not shared
+    MAX_SHARED_TEXT = 40
     
     def __init__(self, ts):
         self.ts = ts
         
+        # text -> TextFragment
+        self.text_fragments = {}
+        # ref or (ref, options) -> ArgumentFragment
+        self.argument_fragments = {}
+        # tuple of fragments -> MessageFormatter
+        self.formatters = weakref.WeakValueDictionary()
+        # name or index -> ref
+        self.refs = {}
+    
+    def text_fragment(self, text):
+        result = self.text_fragments.get(text)
+        if result is None:
+            result = TextFragment(text)
+            if len(text) <= self.MAX_SHARED_TEXT:
+                result = self.text_fragments.setdefault(text, result)
+        return result
+    
+    def ref(self, arg):
+        result = self.refs.get(arg)
+        if result is None:
+            result = IndexRef(arg) if isinstance(arg, int) else NameRef(arg)
+            result = self.refs.setdefault(arg, result)
+        return result
+    
+    def argument_fragment(self, ref, options):
+        if options:
+            try:
+                # 1, 1.0 and True are equal but can give different texts
+                key = (ref, tuple((name, type(value), value) for name, value in sorted(options.items())))
+                hash(key)
+            except TypeError:
+                # Options which can't be compared or hashed are not shared
+                return ArgumentFragment(self.ts, ref, options)
+        else:
+            key = ref
+        
+        result = self.argument_fragments.get(key)
+        if result is None:
+            result = self.argument_fragments.setdefault(key, ArgumentFragment(self.ts, ref, options))
+        return result
+    
+    def formatter(self, fragments):
+        key = tuple(fragments)
+        result = self.formatters.get(key)
+        if result is None:
+            result = MessageFormatter(key)
+            self.formatters[key] = result
+        return result
+    
     def parse(self, message):
         '''Parse a message.
         
@@ -604,7 +2303,7 @@ class MessageParser(object):
         > ['Today is ', {'arg': 'date', 'style': 'long'}]
         '''
         if isinstance(message, str):
-            return MessageFormatter([TextFragment(message)])
+            return self.formatter((self.text_fragment(message),))
         
         fragments = []
         
@@ -613,23 +2312,18 @@ class MessageParser(object):
         except Exception as e:
             raise I18nException('Error parsing %r' % (message,)) from e
         
-        return MessageFormatter(fragments)
+        return self.formatter(fragments)
     
     def parse0(self, fragments, message):
         for part in message:
             if isinstance(part, str):
-                fragments.append(TextFragment(part))
+                fragments.append(self.text_fragment(part))
             elif isinstance(part, dict):
                 arg = part['arg']
                 
                 options = dict(part)
                 del options['arg']
                 
-                if isinstance(arg, int):
-                    ref = IndexRef(arg)
-                else:
-                    ref = NameRef(arg)
-                
-                fragments.append(ArgumentFragment(self.ts, ref, options))
+                fragments.append(self.argument_fragment(self.ref(arg), options))
             else:
                 raise I18nException('Unsupported part: %r' % part)
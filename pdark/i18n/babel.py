@@ -9,13 +9,20 @@
 # 
 # THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
-# Code to register formatters for date&time values using the excellent Babel library
+# Code to register formatters for date&time values, durations and relative
+# times using the excellent Babel library
+#
+# Babel is big. It's only imported when the first value is formatted, so
+# calling setup() costs nothing for programs which never format a date.
 
 import datetime
-from babel.dates import format_date
+from pdark.i18n import I18nException, PluralRules
 
 class BabelDateFormatter(object):
     def __init__(self, style, pattern, locale):
+        from babel.dates import format_date
+        
+        self.format_date = format_date
         self.locale = locale
         self.format_ = style if pattern is None else pattern
     
@@ -23,7 +30,7 @@ class BabelDateFormatter(object):
         return 'BabelDateFormatter(%r, %r)' % (self.format_, self.locale)
     
     def format(self, inst):
-        return format_date(inst, format=self.format_, locale=self.locale)
+        return self.format_date(inst, format=self.format_, locale=self.locale)
 
 class DateFormatterFactory(object):
     def __init__(self, ts):
@@ -35,6 +42,205 @@ class DateFormatterFactory(object):
     
     def create_formatter(self, locale, style='medium', pattern=None):
         return BabelDateFormatter(style, pattern, locale)
+    
+    def warm_up(self, locale):
+        '''Load Babel and its data for the locale.'''
+        from babel.dates import get_date_format
+        
+        for style in self.predefined_patterns:
+            get_date_format(style, locale)
+
+class RelativeTime(object):
+    '''A moment relative to now, for example RelativeTime(created - now).
+    
+    Negative deltas are in the past ("3 minutes ago"), the others in the
+    future ("in 3 minutes").'''
+    __slots__ = ('delta',)
+    
+    def __init__(self, delta):
+        self.delta = delta
+    
+    def __repr__(self):
+        return 'RelativeTime(%r)' % (self.delta,)
+
+class DurationTable(object):
+    '''The texts for durations in one locale and style, loaded once from the
+    unit patterns of the CLDR.
+    
+    rows has one (seconds per unit, texts, patterns) per unit from year down
+    to the granularity. texts are the finished texts for the values below
+    SMALL_VALUES, so most values need no plural rule at all. patterns map the
+    plural categories to the patterns for the other values.
+    
+    direction is None for durations ("3 hours"), 'future' ("in 3 hours") or
+    'past' ("3 hours ago").'''
+    
+    SMALL_VALUES = 100
+    
+    def __init__(self, locale, style, granularity, direction):
+        from babel import Locale
+        from babel.dates import TIMEDELTA_UNITS
+        
+        locale = Locale.parse(locale)
+        self.plural_form = locale.plural_form
+        categories = set(self.plural_form.tags) | set(('other',))
+        
+        self.rows = []
+        for unit, seconds_per_unit in TIMEDELTA_UNITS:
+            candidates = self.candidates(locale, unit, style, direction)
+            patterns = dict((category, self.pattern(candidates, category)) for category in categories)
+            texts = tuple(patterns[self.plural_form(value)].replace('{0}', str(value)) for value in range(self.SMALL_VALUES))
+            self.rows.append((seconds_per_unit, texts, patterns))
+            
+            if unit == granularity:
+                break
+        else:
+            raise I18nException('Unknown granularity: %r' % (granularity,))
+        
+        self.granularity_seconds = self.rows[-1][0]
+    
+    def candidates(self, locale, unit, style, direction):
+        '''The dicts of patterns for a unit in the order in which babel.dates.format_timedelta() tries them.
+        
+        Some short relative patterns only exist for the past (the CLDR aliases
+        the others); then the long ones are used while Babel fails.'''
+        result = []
+        if direction is not None:
+            date_fields = locale._data['date_fields']
+            relative = date_fields.get('%s-%s' % (unit, style))
+            if relative is None or direction not in relative:
+                relative = date_fields[unit]
+            result.append(relative[direction])
+        
+        unit_patterns = locale._data['unit_patterns'].get('duration-' + unit, {})
+        result.append(unit_patterns.get(style))
+        # CLDR aliases long and narrow to short
+        if style != 'short':
+            result.append(unit_patterns.get('short'))
+        
+        return [patterns for patterns in result if patterns is not None]
+    
+    def pattern(self, candidates, category):
+        for patterns in candidates:
+            pattern = patterns.get(category) or patterns.get('other')
+            if pattern:
+                return pattern
+        return ''
+    
+    def format(self, seconds, threshold):
+        '''Format a positive number of seconds; the same rules as babel.dates.format_timedelta().'''
+        for seconds_per_unit, texts, patterns in self.rows:
+            value = seconds / seconds_per_unit
+            if value >= threshold:
+                break
+        
+        if seconds_per_unit == self.granularity_seconds and 0 < value < 1:
+            value = 1
+        value = int(round(value))
+        
+        if value < self.SMALL_VALUES:
+            return texts[value]
+        return patterns[self.plural_form(value)].replace('{0}', str(value))
+
+class BabelTimedeltaFormatter(object):
+    def __init__(self, table, threshold):
+        self.table = table
+        self.threshold = threshold
+    
+    def format(self, inst):
+        return self.table.format(abs(inst.days * 86400 + inst.seconds), self.threshold)
+
+class BabelRelativeTimeFormatter(object):
+    def __init__(self, future, past, threshold):
+        self.future = future
+        self.past = past
+        self.threshold = threshold
+    
+    def format(self, inst):
+        delta = inst.delta
+        seconds = delta.days * 86400 + delta.seconds
+        if seconds < 0:
+            return self.past.format(-seconds, self.threshold)
+        return self.future.format(seconds, self.threshold)
+
+class TimedeltaFormatterFactory(object):
+    '''Format datetime.timedelta as durations like "3 hours".
+    
+    The options are the same as for babel.dates.format_timedelta(): style
+    (long, short or narrow), granularity (the smallest unit) and threshold
+    (when to switch to the next bigger unit). The patterns of each locale
+    and style are loaded once into a DurationTable.'''
+    
+    styles = ('long', 'short', 'narrow')
+    
+    def __init__(self, ts):
+        self.ts = ts
+        # (locale, style, granularity, direction) -> DurationTable
+        self.tables = {}
+        # (locale, style, granularity, threshold) -> formatter
+        self.formatters = {}
+    
+    def can_handle(self, inst):
+        return isinstance(inst, datetime.timedelta)
+    
+    def create_formatter(self, locale, style='long', granularity='second', threshold=0.85):
+        key = (locale, style, granularity, threshold)
+        formatter = self.formatters.get(key)
+        if formatter is None:
+            formatter = self.formatters[key] = self.new_formatter(locale, style, granularity, threshold)
+        return formatter
+    
+    def new_formatter(self, locale, style, granularity, threshold):
+        return BabelTimedeltaFormatter(self.table(locale, style, granularity, None), threshold)
+    
+    def table(self, locale, style, granularity, direction):
+        key = (locale, style, granularity, direction)
+        table = self.tables.get(key)
+        if table is None:
+            if style not in self.styles:
+                raise I18nException('Unknown style for durations: %r' % (style,))
+            table = self.tables[key] = DurationTable(locale, style, granularity, direction)
+        return table
+    
+    def warm_up(self, locale):
+        '''Load the tables for all styles with the default granularity.'''
+        for style in self.styles:
+            self.create_formatter(locale, style)
+
+class RelativeTimeFormatterFactory(TimedeltaFormatterFactory):
+    '''Format RelativeTime as "in 3 hours" or "3 hours ago"; the options are
+    the same as for TimedeltaFormatterFactory.'''
+    def can_handle(self, inst):
+        return isinstance(inst, RelativeTime)
+    
+    def new_formatter(self, locale, style, granularity, threshold):
+        future = self.table(locale, style, granularity, 'future')
+        past = self.table(locale, style, granularity, 'past')
+        return BabelRelativeTimeFormatter(future, past, threshold)
+
+class BabelPluralRules(PluralRules):
+    '''The plural rules of the CLDR for all the locales which Babel knows.
+    
+    Other locales use the default rules.'''
+    def __init__(self):
+        # locale -> function(number) -> category
+        self.rules = {}
+    
+    def category(self, locale, number):
+        rule = self.rules.get(locale)
+        if rule is None:
+            rule = self.rules[locale] = self.load_rule(locale)
+        return rule(number)
+    
+    def load_rule(self, locale):
+        from babel import Locale, UnknownLocaleError
+        
+        try:
+            return Locale.parse(locale).plural_form
+        except (ValueError, UnknownLocaleError):
+            default = super(BabelPluralRules, self).category
+            return lambda number: default(locale, number)
 
 def setup(ts):
-    ts.formatter_factory.register(DateFormatterFactory(ts))
+    ts.formatter_factory.register(DateFormatterFactory(ts), TimedeltaFormatterFactory(ts), RelativeTimeFormatterFactory(ts))
+    ts.plural_rules = BabelPluralRules()
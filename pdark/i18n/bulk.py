@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+# Python module
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Render large numbers of I18N messages in a process pool, for example for exports.
+#
+#     renderer = BulkRenderer(CatalogSetup('en', catalogs, pdark.i18n.babel.setup))
+#     with renderer:
+#         for text in renderer.render(messages, 'de'):
+#             writer.writerow([text])
+#
+# Each worker process creates its TranslationService once when it starts.
+# The messages are sent in chunks, encoded with pdark.i18n.wire; the texts come
+# back in the original order. Only max_in_flight chunks are in the pool at any
+# time, so messages can come from a generator which is much bigger than memory.
+
+import collections
+import itertools
+import os
+from pdark.i18n import I18nException, TranslationService, getLogger
+from pdark.i18n.wire import decode_messages, encode_messages
+
+class CatalogSetup(object):
+    '''Create a TranslationService with the catalogs locale -> key -> pattern.
+    
+    setup is an optional function like pdark.i18n.babel.setup which is called
+    with the new service. Everything must be picklable.'''
+    def __init__(self, default_locale, catalogs, setup=None):
+        self.default_locale = default_locale
+        self.catalogs = catalogs
+        self.setup = setup
+    
+    def __call__(self):
+        ts = TranslationService(default_locale=self.default_locale)
+        ts.message_provider.merge_catalogs(self.catalogs)
+        if self.setup is not None:
+            self.setup(ts)
+        return ts
+
+# The service of a worker process
+worker_service = None
+
+def init_worker(create_service):
+    global worker_service
+    worker_service = create_service()
+
+def render_chunk(chunk, locale):
+    '''Render a chunk of messages in a worker.'''
+    messages = decode_messages(chunk) if isinstance(chunk, bytes) else chunk
+    translate = worker_service.translate
+    return [translate(message, locale) for message in messages]
+
+class BulkRenderer(object):
+    '''Render many messages in a pool of worker processes.
+    
+    create_service is a picklable function without arguments which returns the
+    TranslationService for a worker, for example a CatalogSetup. With max_workers=1,
+    the messages are rendered in this process.'''
+    def __init__(self, create_service, max_workers=None, chunk_size=1000, max_in_flight=None):
+        self.log = getLogger(self)
+        
+        self.create_service = create_service
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self.max_in_flight = max_in_flight
+        
+        self.executor = None
+        self.ts = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *args):
+        self.close()
+    
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+    
+    def start(self):
+        if self.max_workers == 1:
+            if self.ts is None:
+                self.ts = self.create_service()
+        elif self.executor is None:
+            from concurrent.futures import ProcessPoolExecutor
+            self.executor = ProcessPoolExecutor(self.max_workers, initializer=init_worker, initargs=(self.create_service,))
+    
+    def chunks(self, messages):
+        iterator = iter(messages)
+        while True:
+            chunk = list(itertools.islice(iterator, self.chunk_size))
+            if not chunk:
+                return
+            yield chunk
+    
+    def encode(self, chunk):
+        try:
+            return encode_messages(chunk)
+        except I18nException as e:
+            # The wire format doesn't know all types; let the pool pickle the chunk
+            self.log.debug('Sending chunk with pickle: %s', e)
+            return chunk
+    
+    def render(self, messages, locale):
+        '''Render the messages into the locale. Returns an iterator over the texts in the same order.'''
+        self.start()
+        
+        if self.executor is None:
+            translate = self.ts.translate
+            for message in messages:
+                yield translate(message, locale)
+            return
+        
+        max_in_flight = self.max_in_flight
+        if max_in_flight is None:
+            max_in_flight = 2 * (self.max_workers or os.cpu_count() or 1)
+        
+        pending = collections.deque()
+        for chunk in self.chunks(messages):
+            pending.append(self.executor.submit(render_chunk, self.encode(chunk), locale))
+            if len(pending) >= max_in_flight:
+                yield from pending.popleft().result()
+        
+        while pending:
+            yield from pending.popleft().result()
@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+# Python module
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Load message catalogs from JSON files.
+#
+# A catalog contains the texts for one locale. The file name is the locale,
+# the content is a JSON object which maps keys to patterns (see MessageParser.parse()):
+#
+#     de_CH.json:
+#     {
+#         "app.hello": ["Grüezi, ", {"arg": "name"}],
+#         "app.color": "Farbe"
+#     }
+#
+# Each locale is independent, so CatalogLoader reads the files in a process
+# pool (threads when Python runs without GIL) and merges the results into the
+# message provider in a single step.
+#
+# The workers send back the patterns, not the parsed formatters: Unpickling
+# formatters costs more than parsing them again. The message provider parses
+# each pattern when it's needed for the first time. Receiving a catalog must
+# be much cheaper than reading it, or the main process limits the speedup, so
+# the workers pack the patterns into flat lists of strings (PackedCatalog);
+# structured patterns stay JSON text until they are parsed.
+#
+# Later changes are distributed as patches:
+#
+#     {
+#         "version": 5,
+#         "base_version": 4,
+#         "locales": {
+#             "de_CH": {
+#                 "add": {"app.bye": "Ade"},
+#                 "change": {"app.color": "Farb"},
+#                 "remove": ["app.old"]
+#             }
+#         }
+#     }
+#
+# SimpleMessageProvider.apply_patch() only parses the patterns in the patch.
+#
+# CatalogSource loads parts of the catalogs on demand for a BoundedMessageProvider.
+
+import collections
+import itertools
+import json
+import os
+import sys
+from pdark.i18n import I18nException, MessageParser, getLogger
+
+def read_catalog(path):
+    '''Read a JSON catalog file and return a dict key -> pattern.'''
+    with open(path, encoding='utf-8') as fh:
+        catalog = json.load(fh)
+    
+    if not isinstance(catalog, dict):
+        raise I18nException('Expected a JSON object in %s' % (path,))
+    
+    return catalog
+
+def check_catalog(locale, path, parser_class=MessageParser):
+    '''Read one catalog file and, with a parser_class, make sure all patterns can be parsed.
+    
+    Returns the locale and the patterns.'''
+    catalog = read_catalog(path)
+    if parser_class is None:
+        return locale, catalog
+    
+    parser = parser_class(None)
+    for key, pattern in catalog.items():
+        try:
+            parser.parse(pattern)
+        except Exception as e:
+            raise I18nException('Error in %s, key %r: %s' % (path, key, e)) from e
+    
+    return locale, catalog
+
+def pack_catalog(locale, path, parser_class=None):
+    '''check_catalog() for the worker processes; returns the patterns as PackedCatalog.'''
+    locale, catalog = check_catalog(locale, path, parser_class)
+    return locale, PackedCatalog(catalog)
+
+class PackedCatalog(object):
+    '''The patterns of a catalog as flat lists of strings.
+    
+    Unpickling a few long lists of strings is several times faster than
+    unpickling a dict with nested lists and dicts. Structured patterns are
+    kept as JSON text; SimpleMessageProvider.merge_catalogs() remembers their
+    json_keys and decodes them when they are parsed.'''
+    __slots__ = ('text_keys', 'texts', 'json_keys', 'json_texts')
+    
+    def __init__(self, catalog):
+        self.text_keys, self.texts, self.json_keys, self.json_texts = [], [], [], []
+        for key, pattern in catalog.items():
+            if isinstance(pattern, str):
+                self.text_keys.append(key)
+                self.texts.append(pattern)
+            else:
+                self.json_keys.append(key)
+                self.json_texts.append(json.dumps(pattern, ensure_ascii=False))
+    
+    def __len__(self):
+        return len(self.text_keys) + len(self.json_keys)
+    
+    def __iter__(self):
+        return itertools.chain(self.text_keys, self.json_keys)
+    
+    def keys(self):
+        return iter(self)
+    
+    def values(self):
+        return itertools.chain(self.texts, self.json_texts)
+    
+    def items(self):
+        return zip(self.keys(), self.values())
+
+def gil_enabled():
+    is_gil_enabled = getattr(sys, '_is_gil_enabled', None)
+    return is_gil_enabled is None or is_gil_enabled()
+
+class CatalogLoader(object):
+    '''Load catalog files in parallel into a SimpleMessageProvider.
+    
+    With validate, all patterns are parsed once with parser_class while loading
+    to find errors early. This doubles the work since the message provider
+    parses them again; without it, errors show up on first use or in
+    TranslationService.warm_up().'''
+    def __init__(self, message_provider, max_workers=None, parser_class=MessageParser, validate=False):
+        self.log = getLogger(self)
+        
+        self.message_provider = message_provider
+        self.max_workers = max_workers
+        self.parser_class = parser_class
+        self.validate = validate
+    
+    def find_catalogs(self, directory):
+        '''Return locale -> path for all JSON files in the directory.'''
+        result = {}
+        for name in sorted(os.listdir(directory)):
+            locale, ext = os.path.splitext(name)
+            if ext == '.json':
+                result[locale] = os.path.join(directory, name)
+        return result
+    
+    def load_directory(self, directory):
+        return self.load_files(self.find_catalogs(directory))
+    
+    def load_files(self, files):
+        '''Load the catalogs locale -> path into the message provider.
+        
+        Returns the number of messages per locale.'''
+        catalogs = self.read_files(files)
+        self.message_provider.merge_catalogs(catalogs)
+        
+        result = dict((locale, len(patterns)) for locale, patterns in catalogs.items())
+        self.log.info('Loaded %d messages in %d locales', sum(result.values()), len(result))
+        return result
+    
+    def read_files(self, files):
+        '''Read and check the catalogs locale -> path; returns locale -> patterns
+        (a dict key -> pattern or a PackedCatalog).'''
+        locales = list(files)
+        paths = [files[locale] for locale in locales]
+        parser_classes = [self.parser_class if self.validate else None] * len(locales)
+        
+        if self.max_workers == 1 or len(locales) < 2:
+            return dict(map(check_catalog, locales, paths, parser_classes))
+        
+        if gil_enabled():
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(self.max_workers) as executor:
+                return dict(executor.map(pack_catalog, locales, paths, parser_classes))
+        
+        # Threads share the dicts; there is nothing to pack
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(self.max_workers) as executor:
+            return dict(executor.map(check_catalog, locales, paths, parser_classes))
+
+class CatalogSource(object):
+    '''Read the texts of a namespace from the catalogs in a directory.
+    
+    This is the source for a BoundedMessageProvider. Each call reads the
+    whole catalog of the locale but only the texts of the namespace are kept.'''
+    def __init__(self, directory):
+        self.directory = directory
+    
+    def locales(self):
+        return list(CatalogLoader(None).find_catalogs(self.directory))
+    
+    def __call__(self, locale, namespace):
+        path = os.path.join(self.directory, locale + '.json')
+        if not os.path.exists(path):
+            return {}
+        
+        catalog = read_catalog(path)
+        if not namespace:
+            return catalog
+        
+        prefix = namespace + '.'
+        return dict((key, pattern) for key, pattern in catalog.items() if key.startswith(prefix))
+
+class CatalogPatch(object):
+    '''Changes which turn the texts of version base_version into version.
+    
+    When base_version is None, the patch can be applied to any version.'''
+    def __init__(self, version, base_version=None):
+        self.version = version
+        self.base_version = base_version
+        # List of (operation, locale, key, pattern)
+        self.operations = []
+    
+    def add(self, locale, key, pattern):
+        self.operations.append(('add', locale, key, pattern))
+        return self
+    
+    def change(self, locale, key, pattern):
+        self.operations.append(('change', locale, key, pattern))
+        return self
+    
+    def remove(self, locale, key):
+        self.operations.append(('remove', locale, key, None))
+        return self
+    
+    @classmethod
+    def from_dict(cls, data):
+        '''Create a patch from the JSON format (see top of the module).'''
+        patch = cls(data['version'], data.get('base_version'))
+        for locale, changes in data.get('locales', {}).items():
+            for key, pattern in changes.get('add', {}).items():
+                patch.add(locale, key, pattern)
+            for key, pattern in changes.get('change', {}).items():
+                patch.change(locale, key, pattern)
+            for key in changes.get('remove', ()):
+                patch.remove(locale, key)
+        return patch
+    
+    def to_dict(self):
+        locales = collections.OrderedDict()
+        for operation, locale, key, pattern in self.operations:
+            changes = locales.setdefault(locale, {})
+            if operation == 'remove':
+                changes.setdefault('remove', []).append(key)
+            else:
+                changes.setdefault(operation, {})[key] = pattern
+        
+        return {'version': self.version, 'base_version': self.base_version, 'locales': locales}
+    
+    def __repr__(self):
+        return 'CatalogPatch(%r, base_version=%r, %d operations)' % (self.version, self.base_version, len(self.operations))
+
+def read_patch(path):
+    '''Read a CatalogPatch from a JSON file.'''
+    with open(path, encoding='utf-8') as fh:
+        return CatalogPatch.from_dict(json.load(fh))
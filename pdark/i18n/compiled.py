@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+# Python module
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# Load the texts which pdark.i18n.compiler generated.
+#
+#     ts.message_provider = CompiledMessageProvider('en', MessageParser(ts), 'myapp.texts')
+#
+# The generated modules only import this module, so the compiler (and the
+# parsers which it needs) isn't loaded when the application starts.
+
+import importlib
+from functools import partial
+from pdark.i18n import I18nException, SimpleMessageProvider, rendering_service, resolve_deferred
+
+# Version of the generated code; modules of other versions must be compiled again
+FORMAT = 2
+
+NO_OPTIONS = {}
+
+def format_value(ts, locale, value, options):
+    '''Format an argument like ArgumentFragment does.'''
+    value = resolve_deferred(value)
+    return rendering_service(ts).formatter_factory.create_formatter(locale, value, options).format(value)
+
+def plural_category(ts, locale, value):
+    return rendering_service(ts).plural_rules.category(locale, value)
+
+class CompiledFormatter(object):
+    '''The formatter for a compiled text.
+    
+    format is the generated function with the service bound to it, so calling
+    it needs no extra step and works outside of translations, too.'''
+    __slots__ = ('key', 'func', 'format')
+    
+    def __init__(self, key, func, ts):
+        self.key, self.func = key, func
+        self.format = partial(func, ts)
+    
+    def __repr__(self):
+        return 'CompiledFormatter(%s, %s)' % (self.key, self.func.__module__)
+
+class CompiledMessageProvider(SimpleMessageProvider):
+    '''Texts from a package which was generated by CatalogCompiler.
+    
+    The module of a locale is imported when a text of the locale is needed for
+    the first time. Texts which are registered later (with the parser) win over
+    the compiled ones in the same locale; texts which a patch removes stay
+    removed.'''
+    def __init__(self, default_locale, parser, package, missing_text_strategy=None, locale_fallback_strategy=None):
+        super(CompiledMessageProvider, self).__init__(default_locale, parser, missing_text_strategy, locale_fallback_strategy)
+        
+        if isinstance(package, str):
+            package = importlib.import_module(package)
+        self.check_format(package)
+        
+        self.package = package
+        # locale -> name of the module
+        self.modules = package.LOCALES
+        # locale -> key -> function for the modules which were imported
+        self.compiled = {}
+        # locale -> keys of compiled texts which were removed by apply_patch()
+        self.removed = {}
+    
+    def check_format(self, module):
+        if getattr(module, 'FORMAT', None) != FORMAT:
+            raise I18nException('%s was compiled by another version of pdark.i18n.compiler; compile the catalogs again' % module.__name__)
+    
+    def compiled_messages(self, locale):
+        '''Return key -> function for the locale.'''
+        result = self.compiled.get(locale)
+        if result is None:
+            name = self.modules.get(locale)
+            if name is None:
+                result = {}
+            else:
+                module = importlib.import_module('%s.%s' % (self.package.__name__, name))
+                self.check_format(module)
+                result = module.MESSAGES
+                self.log.debug('Imported %d texts for %r from %s', len(result), locale, module.__name__)
+            
+            self.compiled[locale] = result
+        return result
+    
+    def compiled_message(self, key, locale):
+        '''Return the function for the key or None.'''
+        removed = self.removed.get(locale)
+        if removed and key in removed:
+            return None
+        return self.compiled_messages(locale).get(key)
+    
+    def lookup_single_locale(self, key, locale):
+        formatter = super(CompiledMessageProvider, self).lookup_single_locale(key, locale)
+        if formatter is not None:
+            return formatter
+        
+        func = self.compiled_message(key, locale)
+        if func is None:
+            return None
+        
+        formatter = CompiledFormatter(key, func, self.parser.ts)
+        self.pattern_cache[locale][key] = formatter
+        return formatter
+    
+    def remove_pattern(self, locale, key):
+        super(CompiledMessageProvider, self).remove_pattern(locale, key)
+        self.removed.setdefault(locale, set()).add(key)
+    
+    def has_message(self, key, locale):
+        return super(CompiledMessageProvider, self).has_message(key, locale) or self.compiled_message(key, locale) is not None
+    
+    def locales(self):
+        return super(CompiledMessageProvider, self).locales() | set(self.modules)
+    
+    def known_keys(self):
+        result = super(CompiledMessageProvider, self).known_keys()
+        for locale in self.modules:
+            result.update(self.compiled_messages(locale))
+        return result
@@ -0,0 +1,336 @@
+# -*- coding: utf-8 -*-
+# Python module
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Compile catalogs into Python modules.
+#
+#     python -m pdark.i18n.compiler CATALOG_DIR OUTPUT_DIR [--icu] [--import MODULE]
+#
+# Each locale becomes a module with one function per text and a table
+# key -> function; OUTPUT_DIR becomes a package which lists the locales. Loading
+# the texts is then a normal import which Python caches as .pyc, so nothing is
+# parsed when the application starts:
+#
+#     ts.message_provider = CompiledMessageProvider('en', MessageParser(ts), 'myapp.texts')
+#
+# CompiledMessageProvider lives in pdark.i18n.compiled, which is all that the
+# generated modules import.
+#
+# The compiler checks that the texts only use arguments which the @i18n
+# functions have. Import the modules with the functions (--import) to enable
+# the check; texts of unknown functions aren't checked.
+#
+# Identical texts share a function. Files which didn't change aren't written
+# again, so their .pyc files stay valid.
+
+import ast
+import importlib
+import inspect
+import os
+import re
+import sys
+from pdark.i18n import ArgumentFragment, I18nException, IndexRef, MessageParser, NameRef, TextFragment, getLogger, i18nKnownFunctions
+from pdark.i18n.catalog import CatalogLoader, read_catalog
+# CompiledMessageProvider is imported for code which still gets it from here
+from pdark.i18n.compiled import FORMAT, CompiledMessageProvider
+from pdark.i18n.icu import IcuMessageParser, PluralFragment, SelectFragment
+
+def module_name(locale):
+    '''Name of the generated module for a locale.'''
+    return 'locale_' + re.sub(r'\W', '_', locale)
+
+def fragment_refs(fragments):
+    '''Return all the refs which the fragments use, including the nested ones.'''
+    result = []
+    for fragment in fragments:
+        if isinstance(fragment, ArgumentFragment):
+            result.append(fragment.ref)
+        elif isinstance(fragment, PluralFragment):
+            result.append(fragment.ref)
+            for branch in list(fragment.exact.values()) + list(fragment.branches.values()):
+                result.extend(fragment_refs(branch))
+        elif isinstance(fragment, SelectFragment):
+            result.append(fragment.ref)
+            for branch in fragment.branches.values():
+                result.extend(fragment_refs(branch))
+    return result
+
+class ModuleWriter(object):
+    '''Collect the source of the module for one locale.'''
+    def __init__(self, locale, source=None):
+        self.locale = locale
+        self.source = source
+        # body -> name of the function
+        self.functions = {}
+        # repr(options) -> name of the constant
+        self.options = {}
+        # (key, name of the function)
+        self.messages = []
+        # Number of local variables in the current function
+        self.variables = 0
+    
+    def add(self, key, fragments):
+        body = self.function_body(fragments)
+        name = self.functions.get(body)
+        if name is None:
+            name = 'm%d' % len(self.functions)
+            self.functions[body] = name
+        self.messages.append((key, name))
+    
+    def function_body(self, fragments):
+        self.variables = 0
+        if all(type(fragment) is TextFragment or type(fragment) is ArgumentFragment for fragment in fragments):
+            expressions = [self.expression(fragment) for fragment in fragments]
+            return '    return %s\n' % (' + '.join(expressions) or "''")
+        
+        lines = ['    out = []', '    append = out.append']
+        self.statements(lines, fragments, 1)
+        lines.append("    return ''.join(out)")
+        return '\n'.join(lines) + '\n'
+    
+    def expression(self, fragment):
+        if type(fragment) is TextFragment:
+            return repr(fragment.text)
+        return 'format_value(ts, locale, %s, %s)' % (self.ref(fragment.ref), self.options_constant(fragment.options))
+    
+    def ref(self, ref):
+        if isinstance(ref, IndexRef):
+            return 'args[%d]' % ref.index
+        if isinstance(ref, NameRef):
+            return 'kwargs[%r]' % ref.name
+        raise I18nException('Unsupported ref %r' % (ref,))
+    
+    def options_constant(self, options):
+        if not options:
+            return 'NO_OPTIONS'
+        
+        text = repr(options)
+        name = self.options.get(text)
+        if name is None:
+            try:
+                same = ast.literal_eval(text) == options
+            except (ValueError, SyntaxError):
+                same = False
+            if not same:
+                raise I18nException("Options %s can't be compiled" % text)
+            
+            name = 'O%d' % len(self.options)
+            self.options[text] = name
+        return name
+    
+    def variable(self, prefix):
+        self.variables += 1
+        return '%s%d' % (prefix, self.variables)
+    
+    def statements(self, lines, fragments, depth):
+        indent = '    ' * depth
+        if not fragments:
+            lines.append(indent + 'pass')
+        
+        for fragment in fragments:
+            t = type(fragment)
+            if t is TextFragment or t is ArgumentFragment:
+                lines.append('%sappend(%s)' % (indent, self.expression(fragment)))
+            elif t is PluralFragment:
+                self.plural(lines, fragment, depth)
+            elif t is SelectFragment:
+                value = self.variable('v')
+                lines.append('%s%s = resolve_deferred(%s)' % (indent, value, self.ref(fragment.ref)))
+                cases = [('%s == %r' % (value, key), branch) for key, branch in fragment.branches.items() if key != 'other']
+                self.choose(lines, cases, fragment.other, depth)
+            else:
+                raise I18nException("Fragment %r can't be compiled" % (fragment,))
+    
+    def plural(self, lines, fragment, depth):
+        indent = '    ' * depth
+        value = self.variable('v')
+        lines.append('%s%s = resolve_deferred(%s)' % (indent, value, self.ref(fragment.ref)))
+        
+        cases = [('%s == %r' % (value, number), branch) for number, branch in fragment.exact.items()]
+        categories = [(category, branch) for category, branch in fragment.branches.items() if category != 'other']
+        if not categories:
+            self.choose(lines, cases, fragment.other, depth)
+            return
+        
+        # The category is only needed when no exact value matches
+        if cases:
+            self.choose(lines, cases, None, depth)
+            depth += 1
+            indent = '    ' * depth
+        
+        category = self.variable('c')
+        lines.append('%s%s = plural_category(ts, locale, %s)' % (indent, category, value))
+        cases = [('%s == %r' % (category, name), branch) for name, branch in categories]
+        self.choose(lines, cases, fragment.other, depth)
+    
+    def choose(self, lines, cases, other, depth):
+        '''Write an if/elif chain for the cases; the else branch is other.
+        
+        When other is None, the caller writes the body of the else branch.'''
+        indent = '    ' * depth
+        for i, (condition, fragments) in enumerate(cases):
+            lines.append('%s%s %s:' % (indent, 'elif' if i else 'if', condition))
+            self.statements(lines, fragments, depth + 1)
+        
+        if not cases:
+            self.statements(lines, other, depth)
+            return
+        
+        lines.append(indent + 'else:')
+        if other is not None:
+            self.statements(lines, other, depth + 1)
+    
+    def getvalue(self):
+        source = '' if self.source is None else ' from %s' % self.source
+        parts = [
+            '# Generated by pdark.i18n.compiler%s. Don\'t edit.\n\n' % source,
+            'from pdark.i18n.compiled import NO_OPTIONS, format_value, plural_category, resolve_deferred\n\n',
+            'FORMAT = %d\n' % FORMAT,
+            'LOCALE = %r\n' % self.locale,
+        ]
+        for text, name in self.options.items():
+            parts.append('%s = %s\n' % (name, text))
+        
+        for body, name in self.functions.items():
+            parts.append('\ndef %s(ts, locale, args, kwargs):\n%s' % (name, body))
+        
+        parts.append('\nMESSAGES = {\n')
+        for key, name in self.messages:
+            parts.append('    %r: %s,\n' % (key, name))
+        parts.append('}\n')
+        
+        return ''.join(parts)
+
+class CatalogCompiler(object):
+    '''Compile catalogs (locale -> key -> pattern) into a package.
+    
+    parser: Parser for the patterns; MessageParser by default
+    functions: key -> @i18n function to check the arguments; the default are
+    all the functions which were decorated so far'''
+    def __init__(self, parser=None, functions=None):
+        self.log = getLogger(self)
+        
+        self.parser = MessageParser(None) if parser is None else parser
+        self.functions = i18nKnownFunctions if functions is None else functions
+    
+    def compile_module(self, locale, catalog, source=None):
+        '''Return the source of the module for the catalog of one locale.
+        
+        All the errors are collected and raised as a single I18nException.'''
+        writer = ModuleWriter(locale, source)
+        errors = []
+        for key in sorted(catalog):
+            try:
+                fragments = self.parser.parse(catalog[key]).fragments
+                self.check_refs(key, fragments)
+                writer.add(key, fragments)
+            except Exception as e:
+                errors.append('%s: %s' % (key, e))
+        
+        if errors:
+            raise I18nException('Errors in the texts for locale %r:\n%s' % (locale, '\n'.join(errors)))
+        
+        return writer.getvalue()
+    
+    def check_refs(self, key, fragments):
+        '''Check that the arguments exist in the signature of the @i18n function.'''
+        func = self.functions.get(key)
+        if func is None:
+            return
+        
+        parameters = list(inspect.signature(func).parameters.values())
+        names = set(parameter.name for parameter in parameters)
+        positional = [parameter for parameter in parameters if parameter.kind in (parameter.POSITIONAL_ONLY, parameter.POSITIONAL_OR_KEYWORD)]
+        var_positional = any(parameter.kind == parameter.VAR_POSITIONAL for parameter in parameters)
+        
+        for ref in fragment_refs(fragments):
+            if isinstance(ref, NameRef) and ref.name not in names:
+                raise I18nException('%s() has no parameter %r' % (func.__name__, ref.name))
+            if isinstance(ref, IndexRef) and ref.index >= len(positional) and not var_positional:
+                raise I18nException('%s() has only %d positional parameters, not %d' % (func.__name__, len(positional), ref.index + 1))
+    
+    def compile_catalogs(self, catalogs, directory, sources=None):
+        '''Write the package for the catalogs into the directory.
+        
+        sources: locale -> file name for the comment in the generated code.
+        Returns the number of texts per locale.'''
+        modules = {}
+        for locale in sorted(catalogs):
+            name = module_name(locale)
+            if name in modules.values():
+                raise I18nException('Locale %r needs the same module name as another locale: %s' % (locale, name))
+            modules[locale] = name
+        
+        # Check all the texts before anything is written
+        files = {}
+        for locale, name in modules.items():
+            files[name + '.py'] = self.compile_module(locale, catalogs[locale], sources and sources.get(locale))
+        
+        init = ['# Generated by pdark.i18n.compiler. Don\'t edit.\n\nFORMAT = %d\n\n' % FORMAT, '# locale -> module with the texts\nLOCALES = {\n']
+        for locale, name in modules.items():
+            init.append('    %r: %r,\n' % (locale, name))
+        init.append('}\n')
+        files['__init__.py'] = ''.join(init)
+        
+        os.makedirs(directory, exist_ok=True)
+        written = 0
+        for name, content in files.items():
+            if self.write_file(os.path.join(directory, name), content):
+                written += 1
+        
+        self.log.info('Compiled %d locales into %s, %d files changed', len(modules), directory, written)
+        return dict((locale, len(catalog)) for locale, catalog in catalogs.items())
+    
+    def compile_directory(self, catalog_directory, directory):
+        '''Compile the JSON catalogs in catalog_directory (see pdark.i18n.catalog).'''
+        files = CatalogLoader(None).find_catalogs(catalog_directory)
+        catalogs = dict((locale, read_catalog(path)) for locale, path in files.items())
+        sources = dict((locale, os.path.basename(path)) for locale, path in files.items())
+        return self.compile_catalogs(catalogs, directory, sources)
+    
+    def write_file(self, path, content):
+        '''Write the file unless it already has this content; returns True when it was written.'''
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as fh:
+                if fh.read() == content:
+                    return False
+        
+        with open(path, 'w', encoding='utf-8') as fh:
+            fh.write(content)
+        return True
+
+def main(argv=None, out=sys.stdout):
+    import argparse
+    
+    parser = argparse.ArgumentParser(prog='python -m pdark.i18n.compiler', description='Compile JSON catalogs into Python modules.')
+    parser.add_argument('catalogs', help='Directory with the JSON catalogs')
+    parser.add_argument('output', help='Directory of the generated package')
+    parser.add_argument('--icu', action='store_true', help='The texts use the ICU MessageFormat syntax')
+    parser.add_argument('--import', dest='modules', metavar='MODULE', action='append', default=[], help='Import the module to check the arguments of its @i18n functions')
+    args = parser.parse_args(argv)
+    if not os.path.isdir(args.catalogs):
+        parser.error('Not a directory: %s' % args.catalogs)
+    
+    for module in args.modules:
+        importlib.import_module(module)
+    
+    compiler = CatalogCompiler(IcuMessageParser(None) if args.icu else None)
+    try:
+        counts = compiler.compile_directory(args.catalogs, args.output)
+    except I18nException as e:
+        out.write('%s\n' % e)
+        return 1
+    
+    for locale in sorted(counts):
+        out.write('%-10s %6d texts\n' % (locale, counts[locale]))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+# Python module
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Parser for patterns in the ICU MessageFormat string syntax
+#
+#     'Hello, {name}'
+#     'Today is {day, date, long}'
+#     'You have {count, plural, =0 {no messages} one {# message} other {# messages}}'
+#     '{gender, select, female {She} male {He} other {They}} liked it'
+#
+# This is much more compact in catalogs than the lists of MessageParser.
+# The parser scans the pattern once and produces the same fragments;
+# plural and select get their own fragments which pick the branch with a dict.
+#
+# Use setup(ts) to parse all the strings in the catalogs of a service with this
+# parser. Lists are still parsed like MessageParser does.
+
+import re
+from pdark.i18n import Fragment, I18nException, MessageParser, rendering_service
+
+PLURAL_CATEGORIES = frozenset(('zero', 'one', 'two', 'few', 'many', 'other'))
+
+# Characters which can start something else than plain text. The start of an
+# argument is matched completely, so simple arguments need a single search.
+SPECIAL = re.compile(r"\{\s*([^\s,{}'#]+)\s*([,}])|[{}'#]")
+TYPE = re.compile(r'\s*(\w+)\s*([,}])')
+SELECTOR = re.compile(r'\s*(?:(\})|(=?[^\s{}]+)\s*\{)')
+
+def number_options(style):
+    if style is not None:
+        raise I18nException('Unsupported number style %r' % style)
+    return {}
+
+DATE_STYLES = frozenset(('short', 'medium', 'long', 'full'))
+
+def date_options(style):
+    if style is None:
+        return {}
+    if style in DATE_STYLES:
+        return {'style': style}
+    return {'pattern': style}
+
+def list_options(style):
+    if style is None:
+        return {}
+    return {'type': style}
+
+class PluralFragment(Fragment):
+    '''Pick a branch by the plural category of a number argument.
+    
+    Exact matches (=0, =1, ...) win over the categories of the locale.'''
+    __slots__ = ('ts', 'ref', 'exact', 'branches', 'other')
+    
+    def __init__(self, ts, ref, exact, branches):
+        self.ts, self.ref, self.exact, self.branches = ts, ref, exact, branches
+        self.other = branches['other']
+    
+    def append_to(self, buffer, locale, args, kwargs):
+        value = self.ref.get(args, kwargs)
+        fragments = self.exact.get(value)
+        if fragments is None:
+            fragments = self.branches.get(rendering_service(self.ts).plural_rules.category(locale, value), self.other)
+        
+        for fragment in fragments:
+            fragment.append_to(buffer, locale, args, kwargs)
+    
+    def __repr__(self):
+        branches = dict(('=%r' % value, list(fragments)) for value, fragments in self.exact.items())
+        branches.update((category, list(fragments)) for category, fragments in self.branches.items())
+        return 'plural(%r, %r)' % (self.ref, branches)
+
+class SelectFragment(Fragment):
+    '''Pick a branch by the value of a string argument.'''
+    __slots__ = ('ref', 'branches', 'other')
+    
+    def __init__(self, ref, branches):
+        self.ref, self.branches = ref, branches
+        self.other = branches['other']
+    
+    def append_to(self, buffer, locale, args, kwargs):
+        value = self.ref.get(args, kwargs)
+        for fragment in self.branches.get(value, self.other):
+            fragment.append_to(buffer, locale, args, kwargs)
+    
+    def __repr__(self):
+        return 'select(%r, %r)' % (self.ref, dict((key, list(fragments)) for key, fragments in self.branches.items()))
+
+class IcuMessageParser(MessageParser):
+    '''Parse strings in the ICU MessageFormat syntax.
+    
+    Supported are simple arguments ({name}, {0}), the types number, date
+    (with a style or a pattern) and list (with "and" or "or"), plural with
+    exact matches and "#" and select. Apostrophes quote special characters
+    like in ICU: "'{'" is a literal brace and "''" is an apostrophe.
+    
+    Lists and tuples are parsed by MessageParser.'''
+    
+    # type -> function(style) which returns the options for the detail formatter
+    argument_types = {
+        'number': number_options,
+        'date': date_options,
+        'list': list_options,
+    }
+    
+    def parse(self, message):
+        if not isinstance(message, str):
+            return super(IcuMessageParser, self).parse(message)
+        
+        if SPECIAL.search(message) is None:
+            return self.formatter((self.text_fragment(message),))
+        
+        try:
+            fragments, pos = self.parse_message(message, 0, False, None)
+        except Exception as e:
+            raise I18nException('Error parsing %r: %s' % (message, e)) from e
+        
+        return self.formatter(fragments)
+    
+    def parse_message(self, text, pos, nested, plural_ref):
+        '''Parse text until the end or, when nested, until the closing brace.
+        
+        plural_ref is the argument of the innermost plural; it's used for "#".'''
+        fragments = []
+        # Text which is collected for the next TextFragment
+        buffer = []
+        
+        while True:
+            match = SPECIAL.search(text, pos)
+            if match is None:
+                if nested:
+                    raise I18nException('Missing } at end of text')
+                if pos < len(text):
+                    buffer.append(text[pos:])
+                if buffer:
+                    fragments.append(self.text_fragment(''.join(buffer)))
+                return fragments, len(text)
+            
+            start = match.start()
+            if start > pos:
+                buffer.append(text[pos:start])
+            
+            name = match.group(1)
+            c = text[start]
+            if name is None and c == "'":
+                pos = self.parse_quote(text, start, buffer, plural_ref is not None)
+                continue
+            if name is None and c == '#' and plural_ref is None:
+                buffer.append(c)
+                pos = start + 1
+                continue
+            
+            if buffer:
+                fragments.append(self.text_fragment(''.join(buffer)))
+                buffer = []
+            
+            if name is not None:
+                ref = self.ref(int(name) if name.isdigit() else name)
+                if match.group(2) == '}':
+                    fragments.append(self.argument_fragment(ref, {}))
+                    pos = match.end()
+                else:
+                    fragment, pos = self.parse_argument(text, match.end(), ref, plural_ref)
+                    fragments.append(fragment)
+            elif c == '#':
+                fragments.append(self.argument_fragment(plural_ref, {}))
+                pos = start + 1
+            elif c == '}':
+                if not nested:
+                    raise I18nException('Unexpected } at %d' % start)
+                return fragments, start + 1
+            else:
+                raise I18nException('Expected argument name at %d' % (start + 1))
+    
+    def parse_quote(self, text, start, buffer, in_plural):
+        pos = start + 1
+        c = text[pos:pos + 1]
+        if c == "'":
+            buffer.append(c)
+            return pos + 1
+        
+        if not (c == '{' or c == '}' or (c == '#' and in_plural)):
+            # Apostrophe which doesn't quote anything
+            buffer.append("'")
+            return pos
+        
+        while True:
+            end = text.find("'", pos)
+            if end == -1:
+                # Like ICU, quote until the end of the text
+                buffer.append(text[pos:])
+                return len(text)
+            
+            buffer.append(text[pos:end])
+            if text[end + 1:end + 2] != "'":
+                return end + 1
+            
+            buffer.append("'")
+            pos = end + 2
+    
+    def parse_argument(self, text, pos, ref, plural_ref):
+        '''Parse the type and style of an argument after the comma.'''
+        match = TYPE.match(text, pos)
+        if match is None:
+            raise I18nException('Expected argument type at %d' % pos)
+        
+        type_, separator = match.groups()
+        pos = match.end()
+        
+        if type_ == 'plural' or type_ == 'select':
+            if separator == '}':
+                raise I18nException('Missing branches for %s at %d' % (type_, pos))
+            return self.parse_branches(text, pos, ref, type_ == 'plural', plural_ref)
+        
+        create_options = self.argument_types.get(type_)
+        if create_options is None:
+            raise I18nException('Unknown argument type %r at %d' % (type_, match.start(1)))
+        
+        style = None
+        if separator == ',':
+            end = text.find('}', pos)
+            if end == -1:
+                raise I18nException('Missing } at end of text')
+            style = text[pos:end].strip()
+            pos = end + 1
+        
+        return self.argument_fragment(ref, create_options(style)), pos
+    
+    def parse_branches(self, text, pos, ref, plural, plural_ref):
+        exact = {}
+        branches = {}
+        inner_ref = ref if plural else plural_ref
+        
+        while True:
+            match = SELECTOR.match(text, pos)
+            if match is None:
+                raise I18nException('Expected selector at %d' % pos)
+            if match.group(1) is not None:
+                pos = match.end()
+                break
+            
+            selector = match.group(2)
+            fragments, pos = self.parse_message(text, match.end(), True, inner_ref)
+            fragments = tuple(fragments)
+            
+            if plural and selector.startswith('='):
+                number = self.parse_number(selector[1:], match.start(2))
+                target, selector = exact, number
+            else:
+                if plural and selector not in PLURAL_CATEGORIES:
+                    raise I18nException('Unknown plural category %r at %d' % (selector, match.start(2)))
+                target = branches
+            
+            if selector in target:
+                raise I18nException('Duplicate selector %r at %d' % (selector, match.start(2)))
+            target[selector] = fragments
+        
+        if 'other' not in branches:
+            raise I18nException('Missing "other" branch before %d' % pos)
+        
+        if plural:
+            return PluralFragment(self.ts, ref, exact, branches), pos
+        return SelectFragment(ref, branches), pos
+    
+    def parse_number(self, text, pos):
+        try:
+            return int(text)
+        except ValueError:
+            pass
+        try:
+            return float(text)
+        except ValueError:
+            raise I18nException('Invalid number %r at %d' % (text, pos))
+
+def setup(ts):
+    '''Parse the patterns of the service's message provider with IcuMessageParser.
+    
+    Call this before registering messages; patterns which were already parsed
+    are not changed.'''
+    ts.message_provider.parser = IcuMessageParser(ts)
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+# Python module
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Render trees of messages again and again, for example for a live dashboard.
+#
+#     renderer = IncrementalRenderer(ts)
+#     while True:
+#         text = renderer.render(dashboard(...))
+#
+# Each message in the tree gets a structural fingerprint: its key plus the
+# fingerprints of its arguments. The renderer keeps the texts of the previous
+# render by fingerprint, so when the new tree only differs in some leaf
+# arguments, only the messages on the path from those leaves to the root are
+# rendered again; the other sub-messages reuse their text.
+#
+# Only values of immutable types (strings, numbers, dates, tuples and lists of
+# them, ...) get a fingerprint. Messages with other arguments, like Deferred or
+# arbitrary objects, are always rendered. Use one renderer per tree since only
+# the texts of the last render are kept.
+
+import datetime
+import decimal
+from pdark.i18n import I18NMessage, I18nBudgetException, I18nException, RenderContext, current_render_context, getLogger, safe_repr
+
+class IncrementalRenderContext(RenderContext):
+    '''A RenderContext which looks up the texts of messages by their fingerprint first.'''
+    def __init__(self, renderer):
+        super(IncrementalRenderContext, self).__init__(renderer.ts, renderer.ts.max_depth, renderer.ts.budget)
+        self.renderer = renderer
+        # id(message) -> (message, fingerprint) for this render
+        self.fingerprints = {}
+    
+    def render(self, i18n_message, locale):
+        fingerprint = self.fingerprint(i18n_message)
+        if fingerprint is None:
+            return super(IncrementalRenderContext, self).render(i18n_message, locale)
+        
+        return self.renderer.cached_text(self, i18n_message, (fingerprint, locale))
+    
+    def render_message(self, i18n_message, locale):
+        return super(IncrementalRenderContext, self).render(i18n_message, locale)
+    
+    def fingerprint(self, i18n_message):
+        '''Return (key, number of args, args..., names and values of the kwargs...)
+        with the fingerprints of the values or None.'''
+        entry = self.fingerprints.get(id(i18n_message))
+        if entry is not None:
+            return entry[1]
+        
+        # Messages which contain themselves get no fingerprint
+        self.fingerprints[id(i18n_message)] = (i18n_message, None)
+        
+        value_fingerprint = self.renderer.value_fingerprint
+        args = i18n_message.args
+        parts = [i18n_message.key, len(args)]
+        for value in args:
+            if type(value) is not str:
+                value = value_fingerprint(self, value)
+                if value is None:
+                    return None
+            parts.append(value)
+        
+        for name, value in i18n_message.kwargs.items():
+            if type(value) is not str:
+                value = value_fingerprint(self, value)
+                if value is None:
+                    return None
+            parts.append(name)
+            parts.append(value)
+        
+        result = tuple(parts)
+        self.fingerprints[id(i18n_message)] = (i18n_message, result)
+        return result
+
+class IncrementalRenderer(object):
+    '''Render trees of messages and reuse the texts of unchanged sub-messages
+    from the previous render.
+    
+    hits and misses count the messages which were looked up by fingerprint.'''
+    
+    # Types whose values can't change; the fingerprint is (type, value)
+    immutable_types = {bool, int, bytes, type(None), datetime.date, datetime.timedelta, datetime.timezone}
+    # Equal values of these types can have different texts, like 1.0 and 1.00
+    # or 0.0 and -0.0; the fingerprint is (type, repr(value))
+    repr_types = {float, complex, decimal.Decimal}
+    # The same instant in other time zones can be another date; the fingerprint
+    # is (type, value, tzinfo)
+    zoned_types = {datetime.datetime, datetime.time}
+    
+    def __init__(self, ts):
+        self.log = getLogger(self)
+        
+        self.ts = ts
+        # (fingerprint, locale) -> text of the previous and the current render
+        self.previous = {}
+        self.current = {}
+        # Version of the texts of the previous render
+        self.version = None
+        
+        self.hits = 0
+        self.misses = 0
+    
+    def render(self, i18n_message, locale=None):
+        '''Translate the message like TranslationService.translate().'''
+        if locale is None:
+            locale = self.ts.message_locale(i18n_message)
+        
+        version = self.ts.message_provider.version
+        if version != self.version:
+            self.previous = {}
+            self.version = version
+        
+        context = IncrementalRenderContext(self)
+        self.current = {}
+        token = current_render_context.set(context)
+        try:
+            text = context.render(i18n_message, locale)
+        except I18nBudgetException as e:
+            # Keep the texts of the previous render; they weren't all looked up
+            self.current = {}
+            return context.degraded_text(i18n_message, e)
+        except Exception as e:
+            raise I18nException('Error translating %s, locale=%r: %s' % (safe_repr(i18n_message), locale, e)) from e
+        finally:
+            current_render_context.reset(token)
+        
+        self.previous = self.current
+        self.current = {}
+        return text
+    
+    def clear(self):
+        '''Forget all texts, for example after register_message().'''
+        self.previous = {}
+    
+    def cached_text(self, context, i18n_message, key):
+        text = self.current.get(key)
+        if text is None:
+            text = self.previous.get(key)
+            if text is None:
+                self.misses += 1
+                text = context.render_message(i18n_message, key[1])
+            else:
+                self.hits += 1
+            self.current[key] = text
+        
+        return text
+    
+    def value_fingerprint(self, context, value):
+        '''Return a hashable value which is equal for arguments which give the same text or None.'''
+        t = type(value)
+        if t is str:
+            return value
+        if t in self.immutable_types:
+            return (t, value)
+        if t in self.repr_types:
+            return (t, repr(value))
+        if t in self.zoned_types:
+            return (t, value, value.tzinfo)
+        if isinstance(value, I18NMessage):
+            fingerprint = context.fingerprint(value)
+            return None if fingerprint is None else (I18NMessage, fingerprint)
+        if t is list or t is tuple:
+            result = [t]
+            for item in value:
+                if type(item) is not str:
+                    item = self.value_fingerprint(context, item)
+                    if item is None:
+                        return None
+                result.append(item)
+            return tuple(result)
+        
+        return None
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+# Python module
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Translate I18N messages in log records, but only for records which are actually emitted.
+#
+# Log calls pass the message as argument:
+#
+#     log.debug('Rejected order: %s', order_rejected(order))
+#
+# or as the message itself:
+#
+#     log.warning(order_rejected(order))
+#
+# Logging doesn't create a record when the level is disabled, so attaching
+# the filter or formatter below to a handler means that only messages
+# which reach the handler are ever translated.
+
+import logging
+from pdark.i18n import I18NMessage, I18nException, LazyTranslation, getLogger, safe_repr
+
+def translate_record_args(ts, msg, args, locale):
+    '''Return msg and args of a log record with all I18N messages translated.'''
+    return convert_record_args(lambda value: translate_value(ts, value, locale), msg, args)
+
+def untranslated_record_args(msg, args):
+    '''Return msg and args of a log record with the reprs of all I18N messages.'''
+    return convert_record_args(untranslated_value, msg, args)
+
+def convert_record_args(convert, msg, args):
+    if isinstance(msg, I18NMessage):
+        msg = convert(msg)
+        if args:
+            # The translated text is not a format pattern
+            msg = msg.replace('%', '%%')
+
+    if isinstance(args, tuple):
+        args = tuple(convert(arg) for arg in args)
+    elif isinstance(args, dict):
+        args = dict((key, convert(arg)) for key, arg in args.items())
+
+    return msg, args
+
+def translate_value(ts, value, locale):
+    if isinstance(value, I18NMessage):
+        return ts.translate(value, locale)
+    if isinstance(value, LazyTranslation):
+        return value.in_locale(locale)
+    return value
+
+def untranslated_value(value):
+    if isinstance(value, I18NMessage):
+        return safe_repr(value)
+    if isinstance(value, LazyTranslation):
+        return safe_repr(value.i18n_message)
+    return value
+
+class I18nLogFilter(logging.Filter):
+    '''Translate I18N messages in log records into the log locale.
+    
+    Add this filter to a handler, not to a logger: Filters on handlers only
+    see records which the handler is going to emit.
+    
+    The record is changed in place, so all handlers after this one will
+    see the translated text.
+    
+    Filters run in the call of the application (log.info(...)), so a message
+    which can't be translated is logged with its repr and the error is
+    logged separately instead of being raised.'''
+    def __init__(self, ts, locale=None, name=''):
+        super(I18nLogFilter, self).__init__(name)
+        self.log = getLogger(self)
+        self.ts = ts
+        self.locale = locale
+    
+    def filter(self, record):
+        if not super(I18nLogFilter, self).filter(record):
+            return False
+        
+        try:
+            record.msg, record.args = translate_record_args(self.ts, record.msg, record.args, self.locale)
+        except I18nException as e:
+            record.msg, record.args = untranslated_record_args(record.msg, record.args)
+            self.log.warning('Error translating log message %r: %s', record.msg, e, exc_info=True)
+        return True
+
+class I18nLogFormatter(logging.Formatter):
+    '''Formatter which translates I18N messages into the log locale.
+    
+    Unlike I18nLogFilter, the record is left unchanged, so each handler
+    can log in a different locale.'''
+    def __init__(self, ts, locale=None, fmt=None, datefmt=None, style='%'):
+        super(I18nLogFormatter, self).__init__(fmt, datefmt, style)
+        self.ts = ts
+        self.locale = locale
+    
+    def format(self, record):
+        msg, args = record.msg, record.args
+        record.msg, record.args = translate_record_args(self.ts, msg, args, self.locale)
+        try:
+            return super(I18nLogFormatter, self).format(record)
+        finally:
+            record.msg, record.args = msg, args
@@ -0,0 +1,422 @@
+# -*- coding: utf-8 -*-
+# Python module
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Report where I18N messages are defined and used and which texts are missing.
+#
+#     python -m pdark.i18n.report SOURCE_DIR [--catalogs DIR] [--default-locale en]
+#
+# The source is scanned with ast, so nothing is imported. A function is a
+# message definition when it's decorated with @i18n; its key is the module
+# name plus the function name, like @i18n builds it. Usages are calls of those
+# functions (directly, through imports and re-exports or as attribute of an
+# imported module) and I18NMessage('key', ...) with a literal key. Calls of
+# methods (self.message()) can't be found this way.
+#
+# Files are parsed in a process pool. The results are kept in a cache file
+# keyed by the hash of each file, so the next run only parses files which changed.
+# By default, the cache file is in the user's cache directory ($XDG_CACHE_HOME or
+# ~/.cache), one per source directory.
+#
+# The catalogs (see pdark.i18n.catalog) are compared per locale, including the
+# fallback locales, to find missing and obsolete texts.
+
+import ast
+import collections
+import hashlib
+import json
+import os
+import sys
+from pdark.i18n import LocaleFallbackStrategy, getLogger
+from pdark.i18n.catalog import CatalogLoader, gil_enabled, read_catalog
+
+CACHE_VERSION = 1
+CACHE_DIR = 'pdark-i18n'
+# Keys of the texts which pdark.i18n itself uses
+SYSTEM_PREFIX = 'pdark.i18n.'
+
+def default_cache_file(source):
+    '''Path of the cache file for a source directory in the user's cache directory.'''
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    digest = hashlib.sha1(os.path.abspath(source).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_home, CACHE_DIR, 'report-%s.json' % digest)
+
+def module_name(path):
+    '''Turn the path of a source file relative to the source root into a module name.'''
+    parts = os.path.splitext(path)[0].split(os.sep)
+    if parts[-1] == '__init__':
+        parts.pop()
+    return '.'.join(parts)
+
+def file_hash(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+class ModuleScanner(object):
+    '''Collect the message definitions, calls and imports of one module.'''
+    def __init__(self, module, is_package):
+        self.module = module
+        self.package = module if is_package else module.rpartition('.')[0]
+        
+        # local name -> qualified name
+        self.names = {}
+        # [key, line]
+        self.definitions = []
+        # [qualified name, line] of all calls which might create messages
+        self.usages = []
+        # [key, line] of I18NMessage('key', ...)
+        self.keys = []
+    
+    def scan(self, tree):
+        # Names can be used before they are imported, so calls are resolved after a single walk
+        functions = []
+        calls = []
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Call):
+                calls.append(node)
+            elif isinstance(node, ast.Import):
+                for alias in node.names:
+                    if alias.asname is None:
+                        top = alias.name.partition('.')[0]
+                        self.names[top] = top
+                    else:
+                        self.names[alias.asname] = alias.name
+            elif isinstance(node, ast.ImportFrom):
+                base = self.resolve_relative(node.module, node.level)
+                for alias in node.names:
+                    if alias.name != '*':
+                        self.names[alias.asname or alias.name] = '%s.%s' % (base, alias.name) if base else alias.name
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                if node.col_offset == 0:
+                    self.names.setdefault(node.name, '%s.%s' % (self.module, node.name))
+                if node.decorator_list and not isinstance(node, ast.ClassDef):
+                    functions.append(node)
+        
+        for node in functions:
+            if any(self.is_i18n_decorator(decorator) for decorator in node.decorator_list):
+                self.definitions.append(['%s.%s' % (self.module, node.name), node.lineno])
+        
+        for node in calls:
+            self.add_call(node)
+        
+        return self
+    
+    def resolve_relative(self, module, level):
+        if level == 0:
+            return module
+        
+        base = self.package.split('.') if self.package else []
+        if level > 1:
+            base = base[:1 - level]
+        if module:
+            base.append(module)
+        return '.'.join(base)
+    
+    def qualified_name(self, node):
+        '''Return the qualified name for Name and Attribute nodes or None.'''
+        if isinstance(node, ast.Name):
+            return self.names.get(node.id)
+        if isinstance(node, ast.Attribute):
+            base = self.qualified_name(node.value)
+            if base is not None:
+                return '%s.%s' % (base, node.attr)
+        return None
+    
+    def is_i18n_decorator(self, node):
+        if isinstance(node, ast.Name) and node.id == 'i18n':
+            return True
+        return self.qualified_name(node) == 'pdark.i18n.i18n'
+    
+    def add_call(self, node):
+        name = self.qualified_name(node.func)
+        if name is None:
+            return
+        
+        if name == 'pdark.i18n.I18NMessage':
+            if node.args and isinstance(node.args[0], ast.Constant) and isinstance(node.args[0].value, str):
+                self.keys.append([node.args[0].value, node.lineno])
+        else:
+            self.usages.append([name, node.lineno])
+    
+    def result(self):
+        # Only imports can be re-exports; local names are already definitions
+        exports = dict((name, target) for name, target in self.names.items() if target != '%s.%s' % (self.module, name))
+        return {'definitions': self.definitions, 'usages': self.usages, 'keys': self.keys, 'exports': exports}
+
+def scan_source(data, path):
+    '''Scan the source of the file path (relative to the source root).'''
+    try:
+        tree = ast.parse(data, path)
+    except (SyntaxError, ValueError) as e:
+        return {'error': str(e)}
+    
+    scanner = ModuleScanner(module_name(path), os.path.basename(path) == '__init__.py')
+    return scanner.scan(tree).result()
+
+def scan_file(root, path, known_hash):
+    '''Scan one file in a worker. The result is None when the hash is still known_hash.'''
+    full_path = os.path.join(root, path)
+    with open(full_path, 'rb') as fh:
+        data = fh.read()
+    st = os.stat(full_path)
+    
+    digest = file_hash(data)
+    result = None if digest == known_hash else scan_source(data, path)
+    return path, st.st_mtime_ns, st.st_size, digest, result
+
+class SourceIndex(object):
+    '''Definitions and usages of the messages in a source tree.'''
+    def __init__(self, files):
+        # path -> scan result
+        self.files = files
+        
+        # key -> [(path, line)]
+        self.definitions = collections.defaultdict(list)
+        # key -> [(path, line)]
+        self.usages = collections.defaultdict(list)
+        # path -> error
+        self.errors = {}
+        
+        exports = {}
+        for path, result in files.items():
+            if 'error' in result:
+                self.errors[path] = result['error']
+                continue
+            
+            for key, line in result['definitions']:
+                self.definitions[key].append((path, line))
+            
+            module = module_name(path)
+            for name, target in result['exports'].items():
+                exports['%s.%s' % (module, name)] = target
+        
+        for path, result in files.items():
+            for name, line in result.get('usages', ()):
+                key = self.resolve(name, exports)
+                if key is not None:
+                    self.usages[key].append((path, line))
+            for key, line in result.get('keys', ()):
+                self.usages[key].append((path, line))
+    
+    def resolve(self, name, exports):
+        '''Follow re-exports until name is a key; returns None for other functions.'''
+        for i in range(10):
+            if name in self.definitions:
+                return name
+            target = exports.get(name)
+            if target is None:
+                break
+            name = target
+        return None
+
+class SourceScanner(object):
+    '''Scan all Python files below a directory, in parallel and with a cache.'''
+    def __init__(self, cache_file=None, max_workers=None):
+        self.log = getLogger(self)
+        
+        self.cache_file = cache_file
+        self.max_workers = max_workers
+        
+        # Statistics of the last scan
+        self.parsed = 0
+        self.cached = 0
+    
+    def find_files(self, root):
+        for directory, dirs, files in os.walk(root):
+            dirs[:] = sorted(name for name in dirs if not name.startswith('.') and name != '__pycache__')
+            for name in sorted(files):
+                if name.endswith('.py'):
+                    yield os.path.relpath(os.path.join(directory, name), root)
+    
+    def load_cache(self):
+        if self.cache_file is None or not os.path.exists(self.cache_file):
+            return {}
+        
+        try:
+            with open(self.cache_file, encoding='utf-8') as fh:
+                cache = json.load(fh)
+        except ValueError as e:
+            self.log.warning('Ignoring broken cache %s: %s', self.cache_file, e)
+            return {}
+        
+        if cache.get('version') != CACHE_VERSION:
+            return {}
+        return cache['files']
+    
+    def save_cache(self, files):
+        if self.cache_file is None:
+            return
+        
+        # json.dumps() is much faster than json.dump() since it encodes everything in C
+        data = json.dumps({'version': CACHE_VERSION, 'files': files}, separators=(',', ':'))
+        directory = os.path.dirname(self.cache_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = self.cache_file + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as fh:
+            fh.write(data)
+        os.replace(tmp, self.cache_file)
+    
+    def scan(self, root):
+        '''Return a SourceIndex for all Python files below root.'''
+        cache = self.load_cache()
+        entries = {}
+        todo = []
+        
+        for path in self.find_files(root):
+            entry = cache.get(path)
+            if entry is not None:
+                st = os.stat(os.path.join(root, path))
+                if entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+                    entries[path] = entry
+                    continue
+            todo.append(path)
+        
+        self.cached = len(entries)
+        self.parsed = 0
+        for path, mtime, size, digest, result in self.scan_files(root, todo, cache):
+            if result is None:
+                result = cache[path][3]
+                self.cached += 1
+            else:
+                self.parsed += 1
+            entries[path] = [mtime, size, digest, result]
+        
+        if self.parsed or len(entries) != len(cache) or len(entries) != self.cached:
+            self.save_cache(entries)
+        self.log.info('Scanned %d files, %d from the cache', len(entries), self.cached)
+        return SourceIndex(dict((path, entry[3]) for path, entry in entries.items()))
+    
+    def scan_files(self, root, paths, cache):
+        roots = [root] * len(paths)
+        hashes = [cache[path][2] if path in cache else None for path in paths]
+        
+        if self.max_workers == 1 or len(paths) < 100:
+            return list(map(scan_file, roots, paths, hashes))
+        
+        with self.create_executor() as executor:
+            return list(executor.map(scan_file, roots, paths, hashes, chunksize=64))
+    
+    def create_executor(self):
+        if gil_enabled():
+            from concurrent.futures import ProcessPoolExecutor
+            return ProcessPoolExecutor(self.max_workers)
+        
+        from concurrent.futures import ThreadPoolExecutor
+        return ThreadPoolExecutor(self.max_workers)
+
+class CoverageReport(object):
+    '''Compare the messages in the source with the catalogs locale -> key -> pattern.'''
+    def __init__(self, index, catalogs, default_locale):
+        self.index = index
+        self.catalogs = catalogs
+        self.fallback_strategy = LocaleFallbackStrategy(default_locale)
+        
+        self.defined = set(index.definitions)
+        self.used = set(index.usages)
+        self.unused = self.defined - self.used
+        
+        all_texts = set()
+        for keys in catalogs.values():
+            all_texts.update(keys)
+        # Literal keys which are neither defined nor translated anywhere
+        self.unknown = self.used - self.defined - all_texts
+        
+        # locale -> keys without a text in the locale and its fallbacks
+        self.missing = {}
+        # locale -> keys in the catalog which no code defines
+        self.obsolete = {}
+        for locale in catalogs:
+            available = set()
+            for lc in self.fallback_strategy.apply(locale):
+                available.update(catalogs.get(lc, ()))
+            
+            self.missing[locale] = self.defined - available
+            self.obsolete[locale] = set(key for key in catalogs[locale] if not key.startswith(SYSTEM_PREFIX)) - self.defined - self.used
+    
+    def to_dict(self):
+        return {
+            'defined': sorted(self.defined),
+            'unused': sorted(self.unused),
+            'unknown': sorted(self.unknown),
+            'missing': dict((locale, sorted(keys)) for locale, keys in self.missing.items()),
+            'obsolete': dict((locale, sorted(keys)) for locale, keys in self.obsolete.items()),
+            'usages': dict((key, ['%s:%d' % place for place in places]) for key, places in sorted(self.index.usages.items())),
+            'errors': self.index.errors,
+        }
+    
+    def write(self, out, verbose=False):
+        index = self.index
+        usages = sum(len(places) for places in index.usages.values())
+        out.write('Messages: %d defined, %d used in %d places, %d never used\n' % (len(self.defined), len(self.used), usages, len(self.unused)))
+        self.write_keys(out, 'Never used', self.unused, verbose)
+        self.write_keys(out, 'Unknown keys', self.unknown, True)
+        
+        for locale in sorted(self.catalogs):
+            out.write('Locale %s: %d texts, %d missing, %d obsolete\n' % (locale, len(self.catalogs[locale]), len(self.missing[locale]), len(self.obsolete[locale])))
+            self.write_keys(out, 'Missing', self.missing[locale], verbose)
+            self.write_keys(out, 'Obsolete', self.obsolete[locale], verbose)
+        
+        for path, error in sorted(index.errors.items()):
+            out.write('Error in %s: %s\n' % (path, error))
+    
+    def write_keys(self, out, title, keys, verbose):
+        if not verbose or not keys:
+            return
+        
+        out.write('    %s:\n' % title)
+        for key in sorted(keys):
+            places = self.index.definitions.get(key) or self.index.usages.get(key) or ()
+            where = ' (%s:%d)' % places[0] if places else ''
+            out.write('        %s%s\n' % (key, where))
+
+def main(argv=None, out=sys.stdout):
+    import argparse
+    
+    parser = argparse.ArgumentParser(prog='python -m pdark.i18n.report', description='Report where I18N messages are used and which texts are missing.')
+    parser.add_argument('source', help='Root directory of the Python source')
+    parser.add_argument('--catalogs', help='Directory with the JSON catalogs')
+    parser.add_argument('--default-locale', default='en', help='Last fallback locale (default: %(default)s)')
+    parser.add_argument('--cache', help='Cache file (default: one per source directory in $XDG_CACHE_HOME/%s); empty to disable' % CACHE_DIR)
+    parser.add_argument('--workers', type=int, help='Number of worker processes')
+    parser.add_argument('--usage', metavar='KEY', action='append', default=[], help='Print where a message is used')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    parser.add_argument('-v', '--verbose', action='store_true', help='List all the keys')
+    args = parser.parse_args(argv)
+    for directory in (args.source, args.catalogs):
+        if directory is not None and not os.path.isdir(directory):
+            parser.error('Not a directory: %s' % directory)
+    
+    cache_file = default_cache_file(args.source) if args.cache is None else args.cache or None
+    scanner = SourceScanner(cache_file=cache_file, max_workers=args.workers)
+    index = scanner.scan(args.source)
+    
+    catalogs = {}
+    if args.catalogs:
+        files = CatalogLoader(None).find_catalogs(args.catalogs)
+        catalogs = dict((locale, read_catalog(path)) for locale, path in files.items())
+    
+    report = CoverageReport(index, catalogs, args.default_locale)
+    if args.json:
+        json.dump(report.to_dict(), out, indent=2, sort_keys=True)
+        out.write('\n')
+    else:
+        report.write(out, args.verbose)
+    
+    for key in args.usage:
+        out.write('%s:\n' % key)
+        for path, line in index.definitions.get(key, ()):
+            out.write('    defined in %s:%d\n' % (path, line))
+        for path, line in index.usages.get(key, ()):
+            out.write('    used in %s:%d\n' % (path, line))
+    
+    return 1 if index.errors else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -35,3 +35,79 @@ def setupLogging():
 
     root.info('Logging is ready')
     #print('Logging is ready')
+
+# create function -> frozen TranslationService
+shared_services = {}
+
+def shared_service(create):
+    '''Return the service which create() returns, with frozen texts.
+    
+    create() is only called once, so tests don't have to register the same
+    messages in every setUp(). Use overlay_service() for tests which need
+    texts of their own.'''
+    ts = shared_services.get(create)
+    if ts is None:
+        ts = create()
+        ts.message_provider.freeze()
+        shared_services[create] = ts
+    return ts
+
+def overlay_service(base, *setups):
+    '''Create a cheap service with an OverlayMessageProvider over the texts of base.
+    
+    setups are functions like pdark.i18n.babel.setup which are called with the new service.'''
+    from pdark.i18n import OverlayMessageProvider, TranslationService
+    
+    ts = TranslationService(default_locale=base.default_locale, message_provider=OverlayMessageProvider(base.message_provider))
+    for setup in setups:
+        setup(ts)
+    return ts
+
+def wsgi_request(app, path='/', headers=None):
+    '''Call a WSGI application in this process. Returns (status, headers, body).
+    
+    headers is a dict like {'Accept-Language': 'de'}.'''
+    from wsgiref.util import setup_testing_defaults
+    
+    environ = {'PATH_INFO': path}
+    for name, value in (headers or {}).items():
+        environ['HTTP_' + name.upper().replace('-', '_')] = value
+    setup_testing_defaults(environ)
+    
+    response = []
+    def start_response(status, response_headers, exc_info=None):
+        response[:] = [status, response_headers]
+    
+    result = app(environ, start_response)
+    try:
+        body = b''.join(result)
+    finally:
+        close = getattr(result, 'close', None)
+        if close is not None:
+            close()
+    
+    return response[0], dict(response[1]), body
+
+def asgi_request(app, path='/', headers=None):
+    '''Call an ASGI application in this process. Returns (status, headers, body).'''
+    import asyncio
+    
+    scope = {
+        'type': 'http',
+        'method': 'GET',
+        'path': path,
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in (headers or {}).items()],
+    }
+    messages = []
+    
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+    
+    async def send(message):
+        messages.append(message)
+    
+    asyncio.run(app(scope, receive, send))
+    
+    start = messages[0]
+    body = b''.join(message.get('body', b'') for message in messages[1:])
+    return start['status'], dict((name.decode('latin-1'), value.decode('latin-1')) for name, value in start['headers']), body
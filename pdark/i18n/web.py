@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+# Python module
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# WSGI and ASGI middleware which negotiate the locale once per request.
+#
+# The locale is bound to pdark.i18n.current_locale while the application runs,
+# so TranslationService.translate() and LazyTranslation use it without being
+# told. It's also in the WSGI environ / ASGI scope as 'pdark.i18n.locale'.
+#
+# Handlers can return payloads which contain I18NMessages instead of
+# translating them one by one. The middleware renders the whole payload to JSON
+# in a single pass: all the messages share one RenderContext, so messages which
+# appear several times are only translated once.
+#
+#     def app(environ, start_response):
+#         return JsonPayload({'title': page_title(), 'errors': [required('name')]})
+#     
+#     app = I18nWsgiMiddleware(app, ts)
+#
+#     async def app(scope, receive, send):
+#         await send_payload(send, {'title': page_title()})
+#     
+#     app = I18nAsgiMiddleware(app, ts)
+
+import json
+from pdark.i18n import AcceptLanguageNegotiator, Deferred, I18NMessage, I18nBudgetException, I18nException, LazyTranslation, current_locale, current_render_context, getLogger, safe_repr
+
+ENVIRON_KEY = 'pdark.i18n.locale'
+# Type of the ASGI message which send_payload() sends
+PAYLOAD_MESSAGE = 'pdark.i18n.payload'
+
+class JsonPayload(object):
+    '''Data for a JSON response which can contain I18NMessages.'''
+    def __init__(self, data, status='200 OK', headers=None):
+        self.data = data
+        self.status = status
+        self.headers = [] if headers is None else list(headers)
+
+async def send_payload(send, data, status=200, headers=None):
+    '''Send data as the response of an ASGI application behind I18nAsgiMiddleware.'''
+    await send({'type': PAYLOAD_MESSAGE, 'data': data, 'status': status, 'headers': [] if headers is None else list(headers)})
+
+class PayloadRenderer(object):
+    '''Render payloads with I18NMessages to JSON.'''
+    def __init__(self, ts):
+        self.ts = ts
+    
+    def render(self, data, locale):
+        '''Return data as UTF-8 encoded JSON with all messages translated into locale.'''
+        context = self.ts.create_render_context()
+        
+        def default(value):
+            if isinstance(value, I18NMessage):
+                try:
+                    return context.render(value, value.locale or locale)
+                except I18nBudgetException as e:
+                    return context.degraded_text(value, e)
+                except Exception as e:
+                    raise I18nException('Error translating %s, locale=%r: %s' % (safe_repr(value), locale, e)) from e
+            if isinstance(value, LazyTranslation):
+                return str(value)
+            if isinstance(value, Deferred):
+                return value.get()
+            raise TypeError('Object of type %s is not JSON serializable' % type(value).__name__)
+        
+        token = current_render_context.set(context)
+        try:
+            return json.dumps(data, default=default, ensure_ascii=False).encode('utf-8')
+        finally:
+            current_render_context.reset(token)
+
+class I18nMiddleware(object):
+    '''Code which the WSGI and the ASGI middleware share.'''
+    def __init__(self, app, ts, negotiator=None):
+        self.log = getLogger(self)
+        
+        self.app = app
+        self.ts = ts
+        self.negotiator = self.create_negotiator(negotiator)
+        self.renderer = PayloadRenderer(ts)
+    
+    def create_negotiator(self, negotiator):
+        if negotiator is None:
+            return AcceptLanguageNegotiator.for_provider(self.ts.message_provider, default_locale=self.ts.default_locale)
+        
+        return negotiator
+    
+    def negotiate(self, header):
+        locale = self.negotiator.negotiate(header) if header else None
+        if locale is None:
+            return self.ts.default_locale
+        return locale
+    
+    def render(self, data, locale):
+        '''Return body and the headers for it.'''
+        body = self.renderer.render(data, locale)
+        return body, [('Content-Type', 'application/json; charset=utf-8'), ('Content-Length', str(len(body))), ('Content-Language', locale.replace('_', '-'))]
+
+class I18nWsgiMiddleware(I18nMiddleware):
+    '''Bind the locale of the request and render JsonPayloads.
+    
+    Applications return a JsonPayload instead of calling start_response();
+    other responses are passed on unchanged. The locale stays bound while
+    the server iterates over the response.'''
+    def __call__(self, environ, start_response):
+        locale = self.negotiate(environ.get('HTTP_ACCEPT_LANGUAGE'))
+        environ[ENVIRON_KEY] = locale
+        
+        token = current_locale.set(locale)
+        try:
+            result = self.app(environ, start_response)
+            if isinstance(result, JsonPayload):
+                body, headers = self.render(result.data, locale)
+                start_response(result.status, headers + result.headers)
+                return [body]
+        finally:
+            current_locale.reset(token)
+        
+        return BoundIterable(result, locale)
+
+class BoundIterable(object):
+    '''Bind the locale while the WSGI server reads the response.'''
+    def __init__(self, result, locale):
+        self.result = result
+        self.locale = locale
+    
+    def __iter__(self):
+        iterator = iter(self.result)
+        while True:
+            token = current_locale.set(self.locale)
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                current_locale.reset(token)
+            yield chunk
+    
+    def close(self):
+        close = getattr(self.result, 'close', None)
+        if close is not None:
+            close()
+
+class I18nAsgiMiddleware(I18nMiddleware):
+    '''Bind the locale of the HTTP request and render payloads sent with send_payload().'''
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        
+        header = None
+        for name, value in scope.get('headers', ()):
+            if name == b'accept-language':
+                header = value.decode('latin-1')
+                break
+        
+        locale = self.negotiate(header)
+        scope = dict(scope)
+        scope[ENVIRON_KEY] = locale
+        
+        async def send_rendered(message):
+            if message['type'] != PAYLOAD_MESSAGE:
+                await send(message)
+                return
+            
+            body, headers = self.render(message['data'], locale)
+            headers = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+            await send({'type': 'http.response.start', 'status': message['status'], 'headers': headers + message['headers']})
+            await send({'type': 'http.response.body', 'body': body})
+        
+        token = current_locale.set(locale)
+        try:
+            await self.app(scope, receive, send_rendered)
+        finally:
+            current_locale.reset(token)
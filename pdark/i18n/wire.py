@@ -0,0 +1,330 @@
+# -*- coding: utf-8 -*-
+# Python module
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Compact binary format to send I18N messages to another process.
+#
+# With late translation, back end workers create I18N messages and the UI tier
+# renders them. Pickle repeats the full key and the arguments (once in args and
+# again in kwargs) in every message. This format
+#
+# - writes each key and argument name once per batch and refers to it by index
+#
+# - writes values of kwargs which are also in args as reference to the position in args
+#
+# - supports None, bool, int, float, str, bytes, list, tuple, dict, date, datetime,
+#   timedelta and nested I18N messages, and round-trips them exactly; deferred
+#   arguments are evaluated and sent as their value
+#
+# - decodes from bytes, bytearray or memoryview without copying the buffer
+#
+# Layout: MAGIC, string table, number of messages, messages. Every value
+# starts with a one byte tag.
+
+import datetime
+import struct
+from pdark.i18n import Deferred, I18NMessage, I18nException, message_id, message_keys
+
+MAGIC = b'I18W\x01'
+
+TAG_NONE = 0x4e       # N
+TAG_TRUE = 0x54       # T
+TAG_FALSE = 0x46      # F
+TAG_SMALL_INT = 0x63  # c: 0..254 in one byte
+TAG_INT = 0x69        # i: signed 64 bit
+TAG_BIG_INT = 0x49    # I: length + signed little endian bytes
+TAG_FLOAT = 0x64      # d
+TAG_STR = 0x73        # s: length + UTF-8
+TAG_BYTES = 0x62      # b
+TAG_LIST = 0x6c       # l
+TAG_TUPLE = 0x74      # t
+TAG_DICT = 0x6d       # m
+TAG_DATE = 0x44       # D: ordinal
+TAG_DATETIME = 0x41   # A: ISO format
+TAG_TIMEDELTA = 0x45  # E: days, seconds, microseconds
+TAG_MESSAGE = 0x4d    # M
+TAG_ARG_REF = 0x52    # R: kwargs value which is args[i]
+TAG_ARGS_TAIL = 0x56  # V: kwargs value which is tuple(args[i:]), like *args
+
+INT64 = struct.Struct('<q')
+UINT32 = struct.Struct('<I')
+FLOAT = struct.Struct('<d')
+
+def encode_length(out, n):
+    if n < 255:
+        out.append(bytes((n,)))
+    else:
+        out.append(b'\xff' + UINT32.pack(n))
+
+class Encoder(object):
+    '''Encode a batch of I18N messages.'''
+    def __init__(self):
+        self.strings = {}
+        self.out = []
+    
+    def string_index(self, text):
+        result = self.strings.get(text)
+        if result is None:
+            result = len(self.strings)
+            self.strings[text] = result
+        return result
+    
+    def encode(self, messages):
+        body = self.out
+        encode_length(body, len(messages))
+        for message in messages:
+            self.encode_value(message)
+        
+        header = [MAGIC]
+        encode_length(header, len(self.strings))
+        for text in self.strings:
+            data = text.encode('utf-8')
+            encode_length(header, len(data))
+            header.append(data)
+        
+        return b''.join(header + body)
+    
+    def encode_value(self, value):
+        out = self.out
+        t = type(value)
+        if value is None:
+            out.append(b'N')
+        elif t is bool:
+            out.append(b'T' if value else b'F')
+        elif t is int:
+            if 0 <= value < 255:
+                out.append(bytes((TAG_SMALL_INT, value)))
+            elif -2**63 <= value < 2**63:
+                out.append(b'i' + INT64.pack(value))
+            else:
+                data = value.to_bytes((value.bit_length() + 8) // 8, 'little', signed=True)
+                out.append(b'I')
+                encode_length(out, len(data))
+                out.append(data)
+        elif t is float:
+            out.append(b'd' + FLOAT.pack(value))
+        elif t is str:
+            data = value.encode('utf-8')
+            out.append(b's')
+            encode_length(out, len(data))
+            out.append(data)
+        elif t is bytes:
+            out.append(b'b')
+            encode_length(out, len(value))
+            out.append(value)
+        elif t is list or t is tuple:
+            out.append(b'l' if t is list else b't')
+            encode_length(out, len(value))
+            for item in value:
+                self.encode_value(item)
+        elif t is dict:
+            out.append(b'm')
+            encode_length(out, len(value))
+            for key, item in value.items():
+                self.encode_value(key)
+                self.encode_value(item)
+        elif t is datetime.date:
+            out.append(b'D')
+            encode_length(out, value.toordinal())
+        elif t is datetime.datetime:
+            if value.tzinfo is not None and not isinstance(value.tzinfo, datetime.timezone):
+                raise I18nException('Only fixed offset time zones are supported: %r' % (value,))
+            data = value.isoformat().encode('ascii')
+            out.append(b'A')
+            encode_length(out, len(data))
+            out.append(data)
+        elif t is datetime.timedelta:
+            out.append(b'E' + INT64.pack(value.days) + INT64.pack(value.seconds) + INT64.pack(value.microseconds))
+        elif isinstance(value, I18NMessage):
+            self.encode_message(value)
+        elif t is Deferred:
+            # The receiver can't compute it
+            self.encode_value(value.get())
+        else:
+            raise I18nException('Unsupported type %s: %r' % (t.__name__, value))
+    
+    def encode_message(self, message):
+        out = self.out
+        out.append(b'M')
+        encode_length(out, self.string_index(message.key))
+        self.encode_value(message.locale)
+        
+        args = message.args
+        encode_length(out, len(args))
+        for arg in args:
+            self.encode_value(arg)
+        
+        encode_length(out, len(message.kwargs))
+        for name, value in message.kwargs.items():
+            encode_length(out, self.string_index(name))
+            self.encode_kwarg(args, value)
+    
+    def encode_kwarg(self, args, value):
+        out = self.out
+        for index, arg in enumerate(args):
+            if arg is value:
+                out.append(b'R')
+                encode_length(out, index)
+                return
+        
+        if type(value) is tuple and 0 < len(value) <= len(args):
+            start = len(args) - len(value)
+            if all(item is args[start + i] for i, item in enumerate(value)):
+                out.append(b'V')
+                encode_length(out, start)
+                return
+        
+        self.encode_value(value)
+
+class Decoder(object):
+    '''Decode a batch of I18N messages from a buffer.'''
+    def __init__(self, data):
+        self.data = memoryview(data)
+        self.pos = 0
+        self.strings = []
+        # index in strings -> (key, ID) for the strings which are used as keys
+        self.keys = {}
+        
+        self.tags = {
+            TAG_NONE: lambda: None,
+            TAG_TRUE: lambda: True,
+            TAG_FALSE: lambda: False,
+            TAG_SMALL_INT: self.decode_small_int,
+            TAG_INT: self.decode_int,
+            TAG_BIG_INT: self.decode_big_int,
+            TAG_FLOAT: self.decode_float,
+            TAG_STR: self.decode_str,
+            TAG_BYTES: self.decode_bytes,
+            TAG_LIST: self.decode_list,
+            TAG_TUPLE: lambda: tuple(self.decode_list()),
+            TAG_DICT: self.decode_dict,
+            TAG_DATE: lambda: datetime.date.fromordinal(self.decode_length()),
+            TAG_DATETIME: lambda: datetime.datetime.fromisoformat(str(self.decode_slice(), 'ascii')),
+            TAG_TIMEDELTA: self.decode_timedelta,
+            TAG_MESSAGE: self.decode_message,
+        }
+    
+    def decode(self):
+        if self.data[:len(MAGIC)] != MAGIC:
+            raise I18nException('Not an encoded batch of I18N messages')
+        self.pos = len(MAGIC)
+        
+        for i in range(self.decode_length()):
+            self.strings.append(str(self.decode_slice(), 'utf-8'))
+        
+        return [self.decode_value() for i in range(self.decode_length())]
+    
+    def decode_length(self):
+        data, pos = self.data, self.pos
+        n = data[pos]
+        if n < 255:
+            self.pos = pos + 1
+            return n
+        
+        self.pos = pos + 5
+        return UINT32.unpack_from(data, pos + 1)[0]
+    
+    def decode_slice(self):
+        n = self.decode_length()
+        pos = self.pos
+        self.pos = pos + n
+        return self.data[pos:pos + n]
+    
+    def decode_value(self):
+        data = self.data
+        pos = self.pos
+        tag = data[pos]
+        # Inline the most common types
+        if tag == TAG_STR:
+            n = data[pos + 1]
+            if n < 255:
+                self.pos = pos + 2 + n
+                return str(data[pos + 2:pos + 2 + n], 'utf-8')
+        elif tag == TAG_SMALL_INT:
+            self.pos = pos + 2
+            return data[pos + 1]
+        
+        self.pos = pos + 1
+        decoder = self.tags.get(tag)
+        if decoder is None:
+            raise I18nException('Unknown tag %r at position %d' % (chr(tag), self.pos - 1))
+        return decoder()
+    
+    def decode_small_int(self):
+        self.pos += 1
+        return self.data[self.pos - 1]
+    
+    def decode_int(self):
+        self.pos += 8
+        return INT64.unpack_from(self.data, self.pos - 8)[0]
+    
+    def decode_big_int(self):
+        return int.from_bytes(self.decode_slice(), 'little', signed=True)
+    
+    def decode_float(self):
+        self.pos += 8
+        return FLOAT.unpack_from(self.data, self.pos - 8)[0]
+    
+    def decode_str(self):
+        return str(self.decode_slice(), 'utf-8')
+    
+    def decode_bytes(self):
+        return self.decode_slice().tobytes()
+    
+    def decode_list(self):
+        return [self.decode_value() for i in range(self.decode_length())]
+    
+    def decode_dict(self):
+        result = {}
+        for i in range(self.decode_length()):
+            key = self.decode_value()
+            result[key] = self.decode_value()
+        return result
+    
+    def decode_timedelta(self):
+        days, seconds, microseconds = (INT64.unpack_from(self.data, self.pos + offset)[0] for offset in (0, 8, 16))
+        self.pos += 24
+        return datetime.timedelta(days, seconds, microseconds)
+    
+    def decode_message(self):
+        index = self.decode_length()
+        locale = self.decode_value()
+        args = tuple(self.decode_value() for i in range(self.decode_length()))
+        
+        kwargs = {}
+        for i in range(self.decode_length()):
+            name = self.strings[self.decode_length()]
+            tag = self.data[self.pos]
+            if tag == TAG_ARG_REF:
+                self.pos += 1
+                kwargs[name] = args[self.decode_length()]
+            elif tag == TAG_ARGS_TAIL:
+                self.pos += 1
+                kwargs[name] = args[self.decode_length():]
+            else:
+                kwargs[name] = self.decode_value()
+        
+        key = self.keys.get(index)
+        if key is None:
+            # Share the key string of this process and its ID
+            key_id = message_id(self.strings[index])
+            key = self.keys[index] = (message_keys[key_id], key_id)
+        
+        message = I18NMessage(key[0], locale, *args, **kwargs)
+        message.key_id = key[1]
+        return message
+
+def encode_messages(messages):
+    '''Encode a list of I18N messages into bytes.'''
+    return Encoder().encode(messages)
+
+def decode_messages(data):
+    '''Decode the result of encode_messages(); data can be bytes, bytearray or memoryview.'''
+    return Decoder(data).decode()
@@ -9,6 +9,7 @@
 # THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 from pdark.i18n import *
+from pdark.i18n import I18nException, MessageParser, MessageProvider
 from pdark.i18n.test_support import *
 import locale
 import unittest
@@ -273,22 +274,55 @@ class TestSimple(unittest.TestCase):
     def test_plural_none(self):
         message = plural(0)
         text = self.service.translate(message)
-        assert '0 houses'
+        assert '0 houses' == text
 
     def test_plural_one(self):
         message = plural(1)
         text = self.service.translate(message)
-        assert '1 house'
+        assert '1 house' == text
 
     def test_plural_two(self):
         message = plural(2)
         text = self.service.translate(message)
-        assert '2 houses'
+        assert '2 houses' == text
 
     def test_plural_10(self):
         message = plural(10)
         text = self.service.translate(message)
-        assert '10 houses'
+        assert '10 houses' == text
+
+class DictMessageProvider(MessageProvider):
+    '''A provider which only implements lookup_message().'''
+    def __init__(self, ts, texts):
+        super(DictMessageProvider, self).__init__()
+        
+        parser = MessageParser(ts)
+        self.formatters = dict((key, parser.parse(pattern)) for key, pattern in texts.items())
+    
+    def lookup_message(self, i18n_message, locale):
+        formatter = self.formatters.get(i18n_message.key)
+        if formatter is None:
+            return self.missing_text_strategy.apply(i18n_message, locale)
+        return formatter
+
+class TestLookupMessageOnly(unittest.TestCase):
+    def setUp(self):
+        self.service = TranslationService(default_locale=EN_LOCALE)
+        self.service.message_provider = DictMessageProvider(self.service, {
+            'pdark.i18n.number.int': '%d',
+            'test_basics.plural.one': 'house',
+            'test_basics.plural.other': 'houses',
+            'test_basics.plural': [{'arg': 'n', 'plural': 'test_basics.plural'}],
+        })
+    
+    def test_plural(self):
+        assert '1 house' == self.service.translate(plural(1))
+        assert '2 houses' == self.service.translate(plural(2))
+    
+    def test_missing_text(self):
+        assert MISSING is self.service.try_translate(color())
+        with self.assertRaisesRegex(I18nException, "Missing text for 'test_basics.color'"):
+            self.service.translate(color())
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+from pdark.i18n import *
+from pdark.i18n import BoundedMessageProvider, I18nException, MessageParser
+from pdark.i18n.catalog import CatalogSource
+from pdark.i18n.test_support import *
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+EN_LOCALE = 'en'
+DE_LOCALE = 'de'
+DE_CH_LOCALE = 'de_CH'
+
+@i18n
+def hello(name):
+    pass
+
+@i18n
+def bye():
+    pass
+
+CATALOGS = {
+    EN_LOCALE: {
+        'test_bounded_provider.hello': ['Hello, ', {'arg': 'name'}],
+        'test_bounded_provider.bye': 'Bye',
+        'other.module.title': 'Title',
+    },
+    DE_LOCALE: {
+        'test_bounded_provider.hello': ['Hallo, ', {'arg': 'name'}],
+        'other.module.title': 'Titel',
+    },
+    DE_CH_LOCALE: {
+        'test_bounded_provider.bye': 'Ade',
+    },
+}
+
+class CountingSource(object):
+    def __init__(self, catalogs):
+        self.catalogs = catalogs
+        self.calls = []
+    
+    def __call__(self, locale, namespace):
+        self.calls.append((locale, namespace))
+        # Return everything; the provider must only keep the namespace
+        return self.catalogs.get(locale)
+
+class TestBoundedMessageProvider(unittest.TestCase):
+    def setUp(self):
+        setupLogging()
+        self.source = CountingSource(CATALOGS)
+    
+    def create_service(self, budget):
+        ts = TranslationService(default_locale=EN_LOCALE)
+        ts.message_provider = BoundedMessageProvider(EN_LOCALE, MessageParser(ts), self.source, budget, locales=CATALOGS)
+        return ts, ts.message_provider
+    
+    def test_namespaces(self):
+        ts, provider = self.create_service(100000)
+        
+        # Modules with I18N functions
+        assert 'test_bounded_provider' == provider.namespace_of('test_bounded_provider.hello')
+        assert 'other.module' == provider.namespace_of('other.module.title')
+        
+        provider.namespaces = {'other': None}
+        assert 'other' == provider.namespace_of('other.module.page.title')
+        assert 'foo' == provider.namespace_of('foo.bar')
+    
+    def test_lookup_with_fallback(self):
+        ts, provider = self.create_service(100000)
+        
+        assert 'Ade' == ts.translate(bye(), DE_CH_LOCALE)
+        assert 'Hallo, Bob' == ts.translate(hello('Bob'), DE_CH_LOCALE)
+        assert 'Titel' == ts.translate(I18NMessage('other.module.title'), DE_CH_LOCALE)
+        
+        assert [(DE_CH_LOCALE, 'test_bounded_provider'), (DE_LOCALE, 'test_bounded_provider'), (DE_CH_LOCALE, 'other.module'), (DE_LOCALE, 'other.module')] == self.source.calls
+        # Only the namespace is kept
+        assert set(['test_bounded_provider.hello']) == provider.partitions[(DE_LOCALE, 'test_bounded_provider')].keys()
+        
+        self.source.calls = []
+        assert 'Hallo, Bob' == ts.translate(hello('Bob'), DE_CH_LOCALE)
+        assert [] == self.source.calls
+        assert set(CATALOGS) == provider.locales()
+    
+    def test_missing_text(self):
+        ts, provider = self.create_service(100000)
+        with self.assertRaisesRegex(I18nException, "Missing text for 'test_bounded_provider.unknown'"):
+            ts.translate(I18NMessage('test_bounded_provider.unknown'))
+        assert not provider.has_message('test_bounded_provider.hello', DE_CH_LOCALE)
+        assert provider.has_message('test_bounded_provider.bye', DE_CH_LOCALE)
+    
+    def test_eviction(self):
+        ts, provider = self.create_service(1)
+        
+        assert 'Hello, Bob' == ts.translate(hello('Bob'), EN_LOCALE)
+        assert 'Title' == ts.translate(I18NMessage('other.module.title'), EN_LOCALE)
+        
+        # The budget is too small, so only the last partition stays
+        assert [(EN_LOCALE, 'other.module')] == list(provider.partitions)
+        assert provider.partitions[(EN_LOCALE, 'other.module')].size == provider.resident_size
+        
+        # Evicted partitions are loaded again
+        assert 'Hello, Alice' == ts.translate(hello('Alice'), EN_LOCALE)
+        stats = provider.stats()
+        assert (3, 2, 1) == (stats['loads'], stats['evictions'], stats['partitions'])
+    
+    def test_empty_partitions_dont_count(self):
+        ts, provider = self.create_service(100000)
+        assert 'Titel' == ts.translate(I18NMessage('other.module.title'), DE_CH_LOCALE)
+        
+        assert [(DE_LOCALE, 'other.module')] == list(provider.partitions)
+        assert set([(DE_CH_LOCALE, 'other.module')]) == provider.empty_partitions
+        assert provider.partitions[(DE_LOCALE, 'other.module')].size == provider.resident_size
+        
+        # A budget for exactly the partition with the text
+        provider.budget = provider.resident_size
+        self.source.calls = []
+        assert 'Titel' == ts.translate(I18NMessage('other.module.title'), DE_CH_LOCALE)
+        assert [] == self.source.calls
+        assert 0 == provider.evictions
+    
+    def test_least_recently_used(self):
+        ts, provider = self.create_service(100000)
+        ts.translate(hello('Bob'), EN_LOCALE)
+        ts.translate(I18NMessage('other.module.title'), EN_LOCALE)
+        ts.translate(hello('Bob'), EN_LOCALE)
+        
+        provider.budget = provider.resident_size - 1
+        provider.evict()
+        assert [(EN_LOCALE, 'test_bounded_provider')] == list(provider.partitions)
+        assert 1 == provider.evictions
+    
+    def test_size_includes_parsed_texts(self):
+        ts, provider = self.create_service(100000)
+        provider.has_message('test_bounded_provider.hello', EN_LOCALE)
+        before = provider.resident_size
+        
+        ts.translate(hello('Bob'), EN_LOCALE)
+        assert provider.resident_size != before
+        assert provider.resident_size == sum(partition.size for partition in provider.partitions.values())
+
+class TestCatalogSource(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for locale, catalog in CATALOGS.items():
+            with open(os.path.join(self.directory, locale + '.json'), 'w', encoding='utf-8') as fh:
+                json.dump(catalog, fh)
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def test_source(self):
+        source = CatalogSource(self.directory)
+        
+        assert [DE_LOCALE, DE_CH_LOCALE, EN_LOCALE] == sorted(source.locales())
+        assert {'other.module.title': 'Titel'} == source(DE_LOCALE, 'other.module')
+        assert {} == source('fr', 'other.module')
+        
+        ts = TranslationService(default_locale=EN_LOCALE)
+        ts.message_provider = BoundedMessageProvider(EN_LOCALE, MessageParser(ts), source, 1000, locales=source.locales())
+        assert 'Hallo, Bob' == ts.translate(hello('Bob'), DE_CH_LOCALE)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+from pdark.i18n import *
+from pdark.i18n import DetailFormatter, DetailFormatterFactory, I18nBudgetException, I18nException, RenderBudget
+from pdark.i18n.incremental import IncrementalRenderer
+from pdark.i18n.test_support import *
+from pdark.i18n.web import PayloadRenderer
+import json
+import pickle
+import time
+import unittest
+
+EN_LOCALE = 'en'
+
+@i18n
+def wrap(inner):
+    pass
+
+@i18n
+def items(values):
+    pass
+
+@i18n
+def slow(value):
+    pass
+
+class Slow(object):
+    pass
+
+class SlowFormatter(DetailFormatter):
+    def format(self, inst):
+        time.sleep(0.02)
+        return 'slow'
+
+class SlowFormatterFactory(DetailFormatterFactory):
+    def can_handle(self, inst):
+        return isinstance(inst, Slow)
+    
+    def create_formatter(self, locale, **options):
+        return SlowFormatter()
+
+def nested(depth):
+    message = 'x'
+    for i in range(depth):
+        message = wrap(message)
+    return message
+
+class TestRenderBudget(unittest.TestCase):
+    def create_service(self, budget):
+        setupLogging()
+        
+        ts = TranslationService(default_locale=EN_LOCALE, budget=budget)
+        ts.formatter_factory.register(SlowFormatterFactory())
+        ts.message_provider.merge_catalogs({
+            EN_LOCALE: {
+                'pdark.i18n.number.int': '%d',
+                'pdark.i18n.list.comma': ', ',
+                'pdark.i18n.list.and': ' and ',
+                'test_budget.wrap': ['(', {'arg': 'inner'}, ')'],
+                'test_budget.items': ['Items: ', {'arg': 'values'}],
+                'test_budget.slow': ['Slow: ', {'arg': 'value'}],
+            },
+        })
+        return ts
+    
+    def test_no_budget(self):
+        ts = self.create_service(None)
+        
+        assert 'Items: 1, 2 and 3' == ts.translate(items([1, 2, 3]))
+    
+    def test_within_budget(self):
+        budget = RenderBudget(max_time=10, max_length=100, max_depth=10)
+        ts = self.create_service(budget)
+        
+        assert 'Items: 1, 2 and 3' == ts.translate(items([1, 2, 3]))
+        assert '(((x)))' == ts.translate(nested(3))
+        assert 0 == sum(budget.exceeded.values())
+    
+    def test_length(self):
+        budget = RenderBudget(max_length=20)
+        ts = self.create_service(budget)
+        
+        assert 'Items: 0, 1, 2, 3, 4…' == ts.translate(items(list(range(1000))))
+        assert {'length': 1} == budget.exceeded
+    
+    def test_depth(self):
+        budget = RenderBudget(max_depth=3)
+        ts = self.create_service(budget)
+        
+        assert '(((…' == ts.translate(nested(5))
+        assert {'depth': 1} == budget.exceeded
+    
+    def test_depth_key(self):
+        budget = RenderBudget(max_depth=3, degrade=RenderBudget.KEY)
+        ts = self.create_service(budget)
+        
+        assert 'test_budget.wrap' == ts.translate(nested(5))
+    
+    def test_time(self):
+        budget = RenderBudget(max_time=0.03, ellipsis='...')
+        ts = self.create_service(budget)
+        
+        text = ts.translate(items([slow(Slow()) for i in range(100)]))
+        assert 'Items: Slow: slow, Slow: slow...' == text
+        assert {'time': 1} == budget.exceeded
+    
+    def test_each_render_has_its_own_deadline(self):
+        budget = RenderBudget(max_time=0.03)
+        ts = self.create_service(budget)
+        
+        for i in range(3):
+            assert 'Slow: slow' == ts.translate(slow(Slow()))
+        assert 0 == sum(budget.exceeded.values())
+    
+    def test_unknown_degrade(self):
+        with self.assertRaisesRegex(I18nException, "Unknown way to degrade: 'drop'"):
+            RenderBudget(degrade='drop')
+    
+    def test_errors_are_not_hidden(self):
+        ts = self.create_service(RenderBudget(max_length=20))
+        
+        with self.assertRaisesRegex(I18nException, "Missing text for 'test_budget.unknown'"):
+            ts.translate(I18NMessage('test_budget.unknown'))
+    
+    def test_incremental_renderer(self):
+        budget = RenderBudget(max_depth=3)
+        renderer = IncrementalRenderer(self.create_service(budget))
+        
+        assert '((x))' == renderer.render(nested(2))
+        assert '(((…' == renderer.render(wrap(wrap(wrap(wrap('y')))))
+        # The texts of the last complete render are kept
+        assert '((x))' == renderer.render(nested(2))
+        assert 1 == renderer.hits
+    
+    def test_payload(self):
+        ts = self.create_service(RenderBudget(max_length=15))
+        
+        data = json.loads(PayloadRenderer(ts).render({'a': items([1, 2]), 'b': items(list(range(100)))}, EN_LOCALE).decode('utf-8'))
+        assert {'a': 'Items: 1 and 2', 'b': 'Items: 0, 1, 2,…'} == data
+    
+    def test_pickle(self):
+        e = pickle.loads(pickle.dumps(I18nBudgetException('time', 'abc')))
+        
+        assert ('time', 'abc') == (e.reason, e.partial)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+from pdark.i18n import *
+from pdark.i18n.bulk import BulkRenderer, CatalogSetup
+from pdark.i18n.test_support import setupLogging
+import unittest
+
+@i18n
+def hello(name):
+    pass
+
+@i18n
+def chain(inner):
+    pass
+
+CATALOGS = {
+    'en': {
+        'test_bulk.hello': ['Hello, ', {'arg': 'name'}],
+        'test_bulk.chain': ['(', {'arg': 'inner'}, ')'],
+    },
+    'de': {
+        'test_bulk.hello': ['Hallo, ', {'arg': 'name'}],
+    },
+}
+
+class Unencodable(str):
+    '''The wire format can't send this; the chunk must be pickled.'''
+
+def numbered(count, produced):
+    for i in range(count):
+        produced.append(i)
+        yield hello(str(i))
+
+class TestBulkRenderer(unittest.TestCase):
+    def setUp(self):
+        setupLogging()
+        self.setup = CatalogSetup('en', CATALOGS)
+    
+    def test_in_process(self):
+        with BulkRenderer(self.setup, max_workers=1) as renderer:
+            assert ['Hallo, 1', 'Hallo, 2'] == list(renderer.render([hello('1'), hello('2')], 'de'))
+    
+    def test_pool_keeps_order(self):
+        messages = [hello(str(i)) if i % 3 else chain(hello(str(i))) for i in range(50)]
+        with BulkRenderer(self.setup, max_workers=2, chunk_size=7) as renderer:
+            actual = list(renderer.render(messages, 'de'))
+        
+        expected = ['Hallo, %d' % i if i % 3 else '(Hallo, %d)' % i for i in range(50)]
+        assert expected == actual
+    
+    def test_pickle_fallback(self):
+        with BulkRenderer(self.setup, max_workers=2) as renderer:
+            assert ['Hello, odd'] == list(renderer.render([hello(Unencodable('odd'))], 'en'))
+    
+    def test_bounded_in_flight(self):
+        produced = []
+        with BulkRenderer(self.setup, max_workers=2, chunk_size=10, max_in_flight=2) as renderer:
+            texts = renderer.render(numbered(1000, produced), 'en')
+            assert 'Hello, 0' == next(texts)
+            assert len(produced) <= 2 * 10
+            
+            assert 999 == len(list(texts))
+        assert 1000 == len(produced)
+
+if __name__ == '__main__':
+    unittest.main()
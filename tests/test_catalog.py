@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+from pdark.i18n import *
+from pdark.i18n import I18nException
+from pdark.i18n.catalog import CatalogLoader, CatalogPatch, PackedCatalog, read_patch
+from pdark.i18n.test_support import *
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import unittest
+
+setupLogging()
+
+EN_LOCALE = 'en'
+DE_LOCALE = 'de'
+
+@i18n
+def hello(name):
+    pass
+
+@i18n
+def color():
+    pass
+
+class TestCatalogLoader(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.write(EN_LOCALE, {'test_catalog.hello': ['Hello, ', {'arg': 'name'}], 'test_catalog.color': 'color'})
+        self.write(DE_LOCALE, {'test_catalog.hello': ['Hallo, ', {'arg': 'name'}]})
+        
+        self.service = TranslationService(default_locale=EN_LOCALE)
+        self.message_provider = self.service.message_provider
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def write(self, locale, catalog):
+        with open(os.path.join(self.directory, locale + '.json'), 'w', encoding='utf-8') as fh:
+            json.dump(catalog, fh)
+    
+    def test_find_catalogs(self):
+        with open(os.path.join(self.directory, 'README.txt'), 'w') as fh:
+            fh.write('Not a catalog')
+        
+        catalogs = CatalogLoader(self.message_provider).find_catalogs(self.directory)
+        assert [DE_LOCALE, EN_LOCALE] == list(catalogs)
+    
+    def test_load_serial(self):
+        counts = CatalogLoader(self.message_provider, max_workers=1).load_directory(self.directory)
+        assert {EN_LOCALE: 2, DE_LOCALE: 1} == counts
+        assert 'Hallo, Anna' == self.service.translate(hello('Anna'), DE_LOCALE)
+        assert 'color' == self.service.translate(color(), DE_LOCALE)
+    
+    def test_load_process_pool(self):
+        CatalogLoader(self.message_provider, max_workers=2).load_directory(self.directory)
+        assert 'Hallo, Anna' == self.service.translate(hello('Anna'), DE_LOCALE)
+        assert 'Hello, Anna' == self.service.translate(hello('Anna'), EN_LOCALE)
+    
+    def test_parsed_on_first_use(self):
+        CatalogLoader(self.message_provider, max_workers=1).load_directory(self.directory)
+        assert {} == self.message_provider.pattern_cache[DE_LOCALE]
+        
+        self.service.translate(hello('Anna'), DE_LOCALE)
+        assert ['test_catalog.hello'] == list(self.message_provider.pattern_cache[DE_LOCALE])
+        assert {} == self.message_provider.unparsed[DE_LOCALE]
+    
+    def test_known_keys(self):
+        CatalogLoader(self.message_provider, max_workers=1).load_directory(self.directory)
+        assert set(['test_catalog.hello', 'test_catalog.color']) == self.message_provider.known_keys()
+    
+    def test_replaces_registered_message(self):
+        self.message_provider.register_message('test_catalog.hello', DE_LOCALE, 'old')
+        assert 'old' == self.service.translate(hello('Anna'), DE_LOCALE)
+        
+        CatalogLoader(self.message_provider, max_workers=1).load_directory(self.directory)
+        assert 'Hallo, Anna' == self.service.translate(hello('Anna'), DE_LOCALE)
+    
+    def test_error(self):
+        self.write('it', {'test_catalog.hello': ['Ciao, ', 5]})
+        loader = CatalogLoader(self.message_provider, max_workers=1, validate=True)
+        with self.assertRaisesRegex(I18nException, "it.json, key 'test_catalog.hello'"):
+            loader.load_directory(self.directory)
+    
+    def test_error_on_first_use(self):
+        self.write('it', {'test_catalog.hello': ['Ciao, ', 5]})
+        CatalogLoader(self.message_provider, max_workers=1).load_directory(self.directory)
+        
+        with self.assertRaises(I18nException):
+            self.service.translate(hello('Anna'), 'it')
+    
+    def test_packed_catalog(self):
+        catalog = {'test_catalog.hello': ['Hallo, ', {'arg': 'name'}], 'test_catalog.color': 'Farbe'}
+        packed = pickle.loads(pickle.dumps(PackedCatalog(catalog)))
+        
+        assert 2 == len(packed)
+        assert set(catalog) == set(packed)
+        items = dict(packed.items())
+        assert 'Farbe' == items['test_catalog.color']
+        assert catalog['test_catalog.hello'] == json.loads(items['test_catalog.hello'])
+        assert ['test_catalog.hello'] == packed.json_keys
+    
+    def test_merge_packed_catalog(self):
+        catalog = {'test_catalog.hello': ['Hallo, ', {'arg': 'name'}], 'test_catalog.color': 'Farbe'}
+        self.message_provider.merge_catalogs({DE_LOCALE: PackedCatalog(catalog)})
+        assert 'Hallo, Anna' == self.service.translate(hello('Anna'), DE_LOCALE)
+        assert 'Farbe' == self.service.translate(color(), DE_LOCALE)
+    
+    def test_merge_replaces_json_text(self):
+        self.message_provider.merge_catalogs({DE_LOCALE: PackedCatalog({'test_catalog.hello': ['Hallo, ', {'arg': 'name'}]})})
+        self.message_provider.merge_catalogs({DE_LOCALE: {'test_catalog.hello': '["Hallo"]'}})
+        
+        assert '["Hallo"]' == self.service.translate(hello('Anna'), DE_LOCALE)
+    
+    def test_packed_text_parsed_by_two_threads(self):
+        provider = self.message_provider
+        provider.merge_catalogs({DE_LOCALE: PackedCatalog({'test_catalog.hello': ['Hallo, ', {'arg': 'name'}]})})
+        
+        results = {}
+        def lookup(name):
+            results[name] = provider.lookup_single_locale('test_catalog.hello', DE_LOCALE)
+        other = threading.Thread(target=lookup, args=('other',))
+        
+        parse = provider.parser.parse
+        def slow_parse(pattern):
+            # The other thread looks up the same text while this one parses it
+            if not other.is_alive() and 'other' not in results:
+                other.start()
+                other.join(0.2)
+            return parse(pattern)
+        provider.parser.parse = slow_parse
+        
+        lookup('first')
+        other.join()
+        for formatter in results.values():
+            assert 'Hallo, Anna' == formatter.format(DE_LOCALE, ('Anna',), {'name': 'Anna'})
+        assert results['first'] is provider.lookup_single_locale('test_catalog.hello', DE_LOCALE)
+    
+    def test_not_an_object(self):
+        with open(os.path.join(self.directory, 'it.json'), 'w') as fh:
+            fh.write('[]')
+        
+        loader = CatalogLoader(self.message_provider, max_workers=1)
+        with self.assertRaisesRegex(I18nException, 'Expected a JSON object'):
+            loader.load_directory(self.directory)
+
+class TestCatalogPatch(unittest.TestCase):
+    def setUp(self):
+        self.service = TranslationService(default_locale=EN_LOCALE)
+        self.message_provider = self.service.message_provider
+        self.message_provider.register_message('test_catalog.hello', EN_LOCALE, ['Hello, ', {'arg': 'name'}])
+        self.message_provider.register_message('test_catalog.hello', DE_LOCALE, ['Hallo, ', {'arg': 'name'}])
+        self.message_provider.register_message('test_catalog.color', EN_LOCALE, 'color')
+        self.service.warm_up([DE_LOCALE, EN_LOCALE])
+        
+        self.changes = []
+        self.message_provider.add_change_listener(lambda version, changes: self.changes.append((version, changes)))
+    
+    def test_change(self):
+        self.message_provider.apply_patch(CatalogPatch(1, 0).change(DE_LOCALE, 'test_catalog.hello', ['Servus, ', {'arg': 'name'}]))
+        assert 'Servus, Anna' == self.service.translate(hello('Anna'), DE_LOCALE)
+        assert 1 == self.message_provider.version
+    
+    def test_add_and_remove(self):
+        patch = CatalogPatch(1).add(DE_LOCALE, 'test_catalog.color', 'Farbe').remove(EN_LOCALE, 'test_catalog.color')
+        self.message_provider.apply_patch(patch)
+        assert 'Farbe' == self.service.translate(color(), DE_LOCALE)
+        with self.assertRaises(I18nException):
+            self.service.translate(color(), EN_LOCALE)
+    
+    def test_only_dependent_lookups_are_dropped(self):
+        self.message_provider.apply_patch(CatalogPatch(1).add(DE_LOCALE, 'test_catalog.color', 'Farbe'))
+        assert set(['test_catalog.hello']) == self.message_provider.cached_keys(DE_LOCALE)
+        assert set(['test_catalog.hello', 'test_catalog.color']) == self.message_provider.cached_keys(EN_LOCALE)
+    
+    def test_listener(self):
+        self.message_provider.apply_patch(CatalogPatch(7).add(DE_LOCALE, 'test_catalog.color', 'Farbe'))
+        assert [(7, set([(DE_LOCALE, 'test_catalog.color')]))] == self.changes
+    
+    def test_wrong_base_version(self):
+        with self.assertRaisesRegex(I18nException, 'needs version 3 but texts have version 0'):
+            self.message_provider.apply_patch(CatalogPatch(4, 3))
+    
+    def test_add_existing(self):
+        with self.assertRaisesRegex(I18nException, 'already exists'):
+            self.message_provider.apply_patch(CatalogPatch(1).add(EN_LOCALE, 'test_catalog.color', 'colour'))
+    
+    def test_failed_patch_changes_nothing(self):
+        patch = CatalogPatch(1).change(DE_LOCALE, 'test_catalog.hello', 'Servus').remove(DE_LOCALE, 'test_catalog.color')
+        with self.assertRaisesRegex(I18nException, "No text for 'test_catalog.color'"):
+            self.message_provider.apply_patch(patch)
+        
+        assert 'Hallo, Anna' == self.service.translate(hello('Anna'), DE_LOCALE)
+        assert 0 == self.message_provider.version
+    
+    def test_unparsed_messages(self):
+        self.message_provider.register_patterns('it', {'test_catalog.hello': 'Ciao'})
+        self.message_provider.apply_patch(CatalogPatch(1).change('it', 'test_catalog.hello', ['Ciao, ', {'arg': 'name'}]))
+        assert 'Ciao, Anna' == self.service.translate(hello('Anna'), 'it')
+    
+    def test_json_format(self):
+        data = {'version': 2, 'base_version': 1, 'locales': {DE_LOCALE: {'add': {'a': 'A'}, 'change': {'b': 'B'}, 'remove': ['c']}}}
+        patch = CatalogPatch.from_dict(data)
+        assert [('add', DE_LOCALE, 'a', 'A'), ('change', DE_LOCALE, 'b', 'B'), ('remove', DE_LOCALE, 'c', None)] == patch.operations
+        assert data == patch.to_dict()
+    
+    def test_read_patch(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'patch.json')
+            with open(path, 'w', encoding='utf-8') as fh:
+                json.dump({'version': 1, 'locales': {DE_LOCALE: {'add': {'test_catalog.color': 'Farbe'}}}}, fh)
+            
+            self.message_provider.apply_patch(read_patch(path))
+            assert 'Farbe' == self.service.translate(color(), DE_LOCALE)
+        finally:
+            shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    unittest.main()
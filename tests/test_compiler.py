@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+from pdark.i18n import *
+from pdark.i18n import I18nException
+from pdark.i18n.catalog import CatalogPatch
+from pdark.i18n.compiled import CompiledMessageProvider
+from pdark.i18n.compiler import CatalogCompiler, main
+from pdark.i18n.icu import IcuMessageParser
+from pdark.i18n.test_support import *
+from io import StringIO
+import itertools
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import pdark.i18n.icu
+
+setupLogging()
+
+EN_LOCALE = 'en'
+DE_LOCALE = 'de'
+DE_CH_LOCALE = 'de_CH'
+
+@i18n
+def hello(name):
+    pass
+
+@i18n
+def inbox(who, count):
+    pass
+
+@i18n
+def liked(gender, count):
+    pass
+
+@i18n
+def items(items):
+    pass
+
+@i18n
+def color():
+    pass
+
+@i18n
+def pair(a, b):
+    pass
+
+CATALOGS = {
+    EN_LOCALE: {
+        'pdark.i18n.number.int': '%d',
+        'pdark.i18n.list.comma': ', ',
+        'pdark.i18n.list.or': ' or ',
+        'test_compiler.hello': 'Hello, {name}!',
+        'test_compiler.inbox': '{who} has {count, plural, =0 {no messages} one {# message} other {# messages}}.',
+        'test_compiler.liked': "{gender, select, female {She liked {count, plural, one {# post} other {# posts}}} other {They liked it}}",
+        'test_compiler.items': '{items, list, or}',
+        'test_compiler.color': "It''s '{red}'",
+        'test_compiler.pair': '{1}-{0}',
+    },
+    DE_LOCALE: {
+        'test_compiler.hello': 'Hallo, {name}!',
+        'test_compiler.color': 'Rot',
+    },
+    DE_CH_LOCALE: {
+        'test_compiler.hello': 'Grüezi, {name}!',
+    },
+}
+
+# Each test needs a new package since Python caches imported modules
+package_numbers = itertools.count()
+
+class TestCompiler(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        sys.path.insert(0, self.directory)
+        self.package = 'compiled_texts_%d' % next(package_numbers)
+        self.output = os.path.join(self.directory, self.package)
+    
+    def tearDown(self):
+        sys.path.remove(self.directory)
+        shutil.rmtree(self.directory)
+    
+    def compile(self, catalogs=CATALOGS, functions=None):
+        return CatalogCompiler(IcuMessageParser(None), functions).compile_catalogs(catalogs, self.output)
+    
+    def create_service(self):
+        ts = TranslationService(default_locale=EN_LOCALE)
+        ts.message_provider = CompiledMessageProvider(EN_LOCALE, IcuMessageParser(ts), self.package)
+        return ts
+    
+    def test_same_texts_as_parser(self):
+        assert {EN_LOCALE: 9, DE_LOCALE: 2, DE_CH_LOCALE: 1} == self.compile()
+        compiled = self.create_service()
+        
+        parsed = TranslationService(default_locale=EN_LOCALE)
+        pdark.i18n.icu.setup(parsed)
+        parsed.message_provider.merge_catalogs(CATALOGS)
+        
+        messages = [
+            hello('World'),
+            inbox('Bob', 0), inbox('Bob', 1), inbox('Bob', 5),
+            liked('female', 1), liked('female', 2), liked('male', 2),
+            items(['a', 'b', 'c']),
+            color(),
+            pair('a', 'b'),
+        ]
+        for message in messages:
+            for locale in (EN_LOCALE, DE_LOCALE, DE_CH_LOCALE):
+                assert parsed.translate(message, locale) == compiled.translate(message, locale), (message, locale)
+        
+        assert 'Grüezi, Bob!' == compiled.translate(hello('Bob'), DE_CH_LOCALE)
+        assert 'Rot' == compiled.translate(color(), DE_CH_LOCALE)
+        assert "It's {red}" == compiled.translate(color())
+    
+    def test_modules_are_imported_on_demand(self):
+        self.compile()
+        ts = self.create_service()
+        
+        assert {EN_LOCALE, DE_LOCALE, DE_CH_LOCALE} == ts.message_provider.locales()
+        assert '%s.locale_de' % self.package not in sys.modules
+        
+        ts.translate(hello('Bob'), DE_LOCALE)
+        assert '%s.locale_de' % self.package in sys.modules
+        assert '%s.locale_de_CH' % self.package not in sys.modules
+    
+    def test_known_keys(self):
+        self.compile()
+        provider = self.create_service().message_provider
+        
+        assert set(CATALOGS[EN_LOCALE]) == provider.known_keys()
+        assert provider.has_message('test_compiler.color', DE_LOCALE)
+        assert not provider.has_message('test_compiler.inbox', DE_LOCALE)
+    
+    def test_registered_text_wins(self):
+        self.compile()
+        ts = self.create_service()
+        ts.message_provider.register_message('test_compiler.hello', EN_LOCALE, 'Hi, {name}')
+        
+        assert 'Hi, Bob' == ts.translate(hello('Bob'))
+    
+    def test_removed_text_stays_removed(self):
+        self.compile()
+        ts = self.create_service()
+        provider = ts.message_provider
+        assert 'Rot' == ts.translate(color(), DE_LOCALE)
+        
+        provider.apply_patch(CatalogPatch(1).remove(DE_LOCALE, 'test_compiler.color'))
+        assert not provider.has_message('test_compiler.color', DE_LOCALE)
+        assert "It's {red}" == ts.translate(color(), DE_LOCALE)
+        
+        provider.apply_patch(CatalogPatch(2).add(DE_LOCALE, 'test_compiler.color', 'Blau'))
+        assert 'Blau' == ts.translate(color(), DE_LOCALE)
+    
+    def test_format_outside_of_translations(self):
+        self.compile()
+        provider = self.create_service().message_provider
+        message = inbox('Bob', 2)
+        formatter = provider.lookup_message(message, EN_LOCALE)
+        
+        assert 'Bob has 2 messages.' == formatter.format(EN_LOCALE, message.args, message.kwargs)
+    
+    def test_deferred_arguments(self):
+        self.compile()
+        ts = self.create_service()
+        
+        assert 'Bob has 1 message.' == ts.translate(inbox(defer(lambda: 'Bob'), defer(lambda: 1)))
+    
+    def test_identical_texts_share_a_function(self):
+        self.compile({EN_LOCALE: {'a.x': 'Hello, {name}!', 'a.y': 'Hello, {name}!', 'a.z': 'Hi'}})
+        
+        with open(os.path.join(self.output, 'locale_en.py'), encoding='utf-8') as fh:
+            source = fh.read()
+        assert 2 == source.count('\ndef ')
+        assert "'a.x': m0," in source and "'a.y': m0," in source
+    
+    def test_unknown_parameter(self):
+        catalogs = {EN_LOCALE: {'test_compiler.hello': 'Hello, {nam}!', 'test_compiler.pair': '{2}', 'other.key': '{anything}'}}
+        try:
+            self.compile(catalogs)
+            assert False
+        except I18nException as e:
+            assert str(e) == '''Errors in the texts for locale 'en':
+test_compiler.hello: hello() has no parameter 'nam'
+test_compiler.pair: pair() has only 2 positional parameters, not 3'''
+        
+        # Nothing was written
+        assert not os.path.exists(self.output)
+    
+    def test_unchanged_files_are_not_written(self):
+        self.compile()
+        path = os.path.join(self.output, 'locale_en.py')
+        os.utime(path, (0, 0))
+        
+        self.compile()
+        assert 0 == os.stat(path).st_mtime
+    
+    def test_format_is_checked(self):
+        self.compile()
+        path = os.path.join(self.output, '__init__.py')
+        with open(path, encoding='utf-8') as fh:
+            source = fh.read()
+        with open(path, 'w', encoding='utf-8') as fh:
+            fh.write(source.replace('FORMAT = 2', 'FORMAT = 0'))
+        
+        try:
+            self.create_service()
+            assert False
+        except I18nException as e:
+            assert 'compile the catalogs again' in str(e)
+    
+    def test_main(self):
+        catalog_directory = os.path.join(self.directory, 'catalogs')
+        os.mkdir(catalog_directory)
+        for locale, catalog in CATALOGS.items():
+            with open(os.path.join(catalog_directory, locale + '.json'), 'w', encoding='utf-8') as fh:
+                json.dump(catalog, fh)
+        
+        out = StringIO()
+        assert 0 == main([catalog_directory, self.output, '--icu'], out)
+        assert 'de              2 texts\nde_CH           1 texts\nen              9 texts\n' == out.getvalue()
+        assert 'Hallo, Bob!' == self.create_service().translate(hello('Bob'), DE_LOCALE)
+        
+        with open(os.path.join(catalog_directory, 'de.json'), 'w', encoding='utf-8') as fh:
+            json.dump({'test_compiler.hello': 'Hallo, {x}'}, fh)
+        out = StringIO()
+        assert 1 == main([catalog_directory, self.output, '--icu'], out)
+        assert "hello() has no parameter 'x'" in out.getvalue()
+
+if __name__ == '__main__':
+    unittest.main()
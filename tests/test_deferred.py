@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+from pdark.i18n import *
+from pdark.i18n.test_support import *
+from pdark.i18n.wire import decode_messages, encode_messages
+import threading
+import unittest
+import pdark.i18n.icu
+
+EN_LOCALE = 'en'
+DE_LOCALE = 'de'
+
+@i18n
+def hello(name):
+    pass
+
+@i18n
+def items(items):
+    pass
+
+@i18n
+def inbox(count):
+    pass
+
+class Counter(object):
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+    
+    def __call__(self, *args):
+        self.calls += 1
+        return self.value + ''.join(args)
+
+class TestDeferred(unittest.TestCase):
+    def setUp(self):
+        setupLogging()
+        
+        self.ts = TranslationService(default_locale=EN_LOCALE)
+        pdark.i18n.icu.setup(self.ts)
+        
+        self.ts.message_provider.register_patterns(EN_LOCALE, {
+            'test_deferred.hello': 'Hello, {name}',
+            'test_deferred.items': '{items}',
+            'test_deferred.inbox': '{count, plural, one {# message} other {# messages}}',
+            'pdark.i18n.number.int': '%d',
+            'pdark.i18n.list.comma': ', ',
+            'pdark.i18n.list.and': ' and ',
+        })
+        self.ts.message_provider.register_patterns(DE_LOCALE, {
+            'test_deferred.hello': 'Hallo, {name}',
+        })
+    
+    def test_not_evaluated_unless_rendered(self):
+        counter = Counter('World')
+        message = hello(defer(counter))
+        
+        assert 0 == counter.calls
+        assert not message.args[0].evaluated
+    
+    def test_evaluated_once(self):
+        counter = Counter('Wor')
+        message = hello(defer(counter, 'ld'))
+        
+        assert 'Hello, World' == self.ts.translate(message)
+        assert 'Hallo, World' == self.ts.translate(message, DE_LOCALE)
+        assert 'Hello, World' == self.ts.translate(message)
+        assert 1 == counter.calls
+        assert message.args[0].evaluated
+    
+    def test_keyword_argument(self):
+        assert 'Hello, World' == self.ts.translate(hello(name=defer(Counter('World'))))
+    
+    def test_list_items(self):
+        counter = Counter('b')
+        message = items(['a', defer(counter), 'c'])
+        
+        assert 'a, b and c' == self.ts.translate(message)
+        assert 1 == counter.calls
+    
+    def test_plural(self):
+        assert '1 message' == self.ts.translate(inbox(defer(lambda: 1)))
+        assert '3 messages' == self.ts.translate(inbox(defer(lambda: 3)))
+    
+    def test_repr_evaluates(self):
+        counter = Counter('World')
+        message = hello(defer(counter))
+        
+        assert "I18NMessage(test_deferred.hello, ('World',), {'name': 'World'})" == repr(message)
+        assert 1 == counter.calls
+    
+    def test_equality(self):
+        assert defer(lambda: 'a') == 'a'
+        assert defer(lambda: 'a') == defer(lambda: 'a')
+        assert defer(lambda: 'a') != defer(lambda: 'b')
+        assert hello(defer(lambda: 'a')) == hello('a')
+        assert hash(defer(lambda: 'a')) == hash('a')
+    
+    def test_error_is_raised_again(self):
+        calls = []
+        def fail():
+            calls.append(1)
+            raise ValueError('Database is down')
+        
+        message = hello(defer(fail))
+        counts = []
+        for i in range(2):
+            try:
+                self.ts.translate(message)
+                assert False
+            except ValueError as e:
+                assert 'Database is down' == str(e)
+            counts.append(len(calls))
+        # The failure isn't cached
+        assert counts[0] < counts[1]
+    
+    def test_threads_evaluate_once(self):
+        counter = Counter('World')
+        message = hello(defer(counter))
+        results = []
+        
+        def render():
+            results.append(self.ts.translate(message))
+        threads = [threading.Thread(target=render) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert ['Hello, World'] * 8 == results
+        assert 1 == counter.calls
+    
+    def test_other_arguments_not_blocked(self):
+        started = threading.Event()
+        release = threading.Event()
+        finished = []
+        def slow():
+            started.set()
+            release.wait(5)
+            finished.append(1)
+            return 'slow'
+        
+        thread = threading.Thread(target=lambda: self.ts.translate(hello(defer(slow))))
+        thread.start()
+        try:
+            assert started.wait(5)
+            # Evaluated while the other thread is still inside slow()
+            assert 'Hello, World' == self.ts.translate(hello(defer(Counter('World'))))
+            assert [] == finished
+        finally:
+            release.set()
+            thread.join()
+    
+    def test_wire_sends_value(self):
+        counter = Counter('World')
+        decoded, = decode_messages(encode_messages([hello(defer(counter))]))
+        
+        assert ('World',) == decoded.args
+        assert 'Hello, World' == self.ts.translate(decoded)
+
+if __name__ == '__main__':
+    unittest.main()
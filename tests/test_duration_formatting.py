@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+from pdark.i18n import *
+from pdark.i18n import I18nException
+from pdark.i18n.babel import DurationTable, RelativeTime
+from pdark.i18n.test_support import *
+from babel.dates import format_timedelta
+import datetime
+import unittest
+import pdark.i18n.babel
+
+EN_LOCALE = 'en'
+DE_LOCALE = 'de_DE'
+RU_LOCALE = 'ru'
+
+@i18n
+def uptime(duration):
+    pass
+
+@i18n
+def uptime_short(duration):
+    pass
+
+@i18n
+def posted(when):
+    pass
+
+class TestDurationFormatting(unittest.TestCase):
+    def setUp(self):
+        setupLogging()
+        
+        self.service = TranslationService(default_locale=EN_LOCALE)
+        pdark.i18n.babel.setup(self.service)
+        
+        message_provider = self.service.message_provider
+        message_provider.register_message('test_duration_formatting.uptime', EN_LOCALE, ['Up for ', {'arg': 'duration'}])
+        message_provider.register_message('test_duration_formatting.uptime', DE_LOCALE, ['Läuft seit ', {'arg': 'duration'}])
+        message_provider.register_message('test_duration_formatting.uptime_short', EN_LOCALE, ['Up ', {'arg': 'duration', 'style': 'narrow', 'granularity': 'hour'}])
+        message_provider.register_message('test_duration_formatting.posted', EN_LOCALE, ['Posted ', {'arg': 'when'}])
+        message_provider.register_message('test_duration_formatting.posted', RU_LOCALE, ['Опубликовано ', {'arg': 'when'}])
+    
+    def test_duration(self):
+        assert 'Up for 3 hours' == self.service.translate(uptime(datetime.timedelta(hours=3)))
+        assert 'Up for 1 second' == self.service.translate(uptime(datetime.timedelta(seconds=1)))
+        assert 'Läuft seit 2 Tage' == self.service.translate(uptime(datetime.timedelta(days=2)), DE_LOCALE)
+    
+    def test_options(self):
+        assert 'Up 1h' == self.service.translate(uptime_short(datetime.timedelta(minutes=3)))
+        assert 'Up 5d' == self.service.translate(uptime_short(datetime.timedelta(days=5)))
+    
+    def test_relative_time(self):
+        assert 'Posted 3 minutes ago' == self.service.translate(posted(RelativeTime(datetime.timedelta(minutes=-3))))
+        assert 'Posted in 2 days' == self.service.translate(posted(RelativeTime(datetime.timedelta(days=2))))
+        assert 'Опубликовано 5 минут назад' == self.service.translate(posted(RelativeTime(datetime.timedelta(minutes=-5))), RU_LOCALE)
+    
+    def test_formatters_are_shared(self):
+        factory = self.service.formatter_factory
+        delta = datetime.timedelta(hours=1)
+        
+        assert factory.create_formatter(EN_LOCALE, delta, {}) is factory.create_formatter(EN_LOCALE, delta, {})
+    
+    def test_unknown_style(self):
+        with self.assertRaisesRegex(I18nException, "Unknown style for durations: 'medium'"):
+            self.service.formatter_factory.create_formatter(EN_LOCALE, datetime.timedelta(hours=1), {'style': 'medium'})
+    
+    def test_unknown_granularity(self):
+        with self.assertRaisesRegex(I18nException, "Unknown granularity: 'decade'"):
+            DurationTable(EN_LOCALE, 'long', 'decade', None)
+    
+    def test_warm_up(self):
+        self.service.formatter_factory.warm_up(DE_LOCALE)
+    
+    def test_same_as_babel(self):
+        values = list(range(0, 200)) + [3599, 3600, 86399, 86400 * 6, 86400 * 30, 86400 * 400, 10 ** 10]
+        for locale in (EN_LOCALE, RU_LOCALE, 'ja', 'zh_Hant'):
+            for style in ('long', 'short', 'narrow'):
+                for granularity in ('second', 'hour', 'year'):
+                    durations = DurationTable(locale, style, granularity, None)
+                    future = DurationTable(locale, style, granularity, 'future')
+                    past = DurationTable(locale, style, granularity, 'past')
+                    for seconds in values:
+                        for threshold in (0.85, 1.1):
+                            options = dict(granularity=granularity, threshold=threshold, format=style, locale=locale)
+                            
+                            assert format_timedelta(seconds, **options) == durations.format(seconds, threshold)
+                            assert format_timedelta(seconds, add_direction=True, **options) == future.format(seconds, threshold)
+                            if seconds > 0:
+                                assert format_timedelta(-seconds, add_direction=True, **options) == past.format(seconds, threshold)
+    
+    def test_missing_relative_patterns(self):
+        # Babel fails with a KeyError since there is no short pattern for the future
+        assert 'in 2 Monaten' == DurationTable(DE_LOCALE, 'short', 'second', 'future').format(86400 * 60, 0.85)
+        assert 'vor 2\xa0Monaten' == DurationTable(DE_LOCALE, 'short', 'second', 'past').format(86400 * 60, 0.85)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+from pdark.i18n import *
+from pdark.i18n import I18nException
+from pdark.i18n.test_support import *
+import unittest
+import pdark.i18n.icu
+
+EN_LOCALE = 'en'
+EN_GB_LOCALE = 'en_GB'
+DE_LOCALE = 'de'
+DE_CH_LOCALE = 'de_CH'
+FR_LOCALE = 'fr'
+LOCALES = [EN_LOCALE, EN_GB_LOCALE, DE_LOCALE, DE_CH_LOCALE, FR_LOCALE]
+
+@i18n
+def hello(name):
+    pass
+
+@i18n
+def wrap(inner):
+    pass
+
+@i18n
+def inbox(count):
+    pass
+
+@i18n
+def language(name):
+    pass
+
+@i18n
+def unknown():
+    pass
+
+@i18n
+def status(count, name):
+    pass
+
+class CountingService(TranslationService):
+    def __init__(self, **kwargs):
+        super(CountingService, self).__init__(**kwargs)
+        self.calls = []
+    
+    def translate_in_context(self, i18n_message, locale, context):
+        self.calls.append((i18n_message.key, locale))
+        return super(CountingService, self).translate_in_context(i18n_message, locale, context)
+
+class TestTranslateToLocales(unittest.TestCase):
+    def setUp(self):
+        setupLogging()
+        
+        self.ts = CountingService(default_locale=EN_LOCALE)
+        pdark.i18n.icu.setup(self.ts)
+        self.ts.message_provider.merge_catalogs({
+            EN_LOCALE: {
+                'pdark.i18n.number.int': '%d',
+                'test_fan_out.hello': 'Hello, {name}',
+                'test_fan_out.wrap': '({inner})',
+                'test_fan_out.inbox': '{count, plural, one {# message} other {# messages}}',
+                'test_fan_out.language': '{name}',
+                'test_fan_out.status': '{name}: {count, plural, one {# message} other {# messages}}',
+            },
+            DE_LOCALE: {
+                'test_fan_out.hello': 'Hallo, {name}',
+                'test_fan_out.inbox': '{count, plural, one {# Nachricht} other {# Nachrichten}}',
+            },
+        })
+    
+    def test_same_as_translate(self):
+        for message in (hello('Bob'), wrap(hello('Bob')), inbox(1), inbox(3), wrap(inbox(2)), language('Deutsch'), status(1, hello('Bob'))):
+            expected = dict((locale, self.ts.translate(message, locale)) for locale in LOCALES)
+            assert expected == self.ts.translate_to_locales(message, LOCALES), message
+    
+    def test_order_of_locales(self):
+        assert LOCALES[::-1] == list(self.ts.translate_to_locales(hello('Bob'), LOCALES[::-1]))
+    
+    def test_shared_output(self):
+        texts = self.ts.translate_to_locales(wrap(hello('Bob')), LOCALES)
+        
+        assert {EN_LOCALE: '(Hello, Bob)', EN_GB_LOCALE: '(Hello, Bob)', DE_LOCALE: '(Hallo, Bob)', DE_CH_LOCALE: '(Hallo, Bob)', FR_LOCALE: '(Hello, Bob)'} == texts
+        # One translation per text
+        assert [('test_fan_out.wrap', EN_LOCALE), ('test_fan_out.wrap', DE_LOCALE)] == self.ts.calls
+    
+    def test_shared_nested_messages(self):
+        provider = self.ts.message_provider
+        lookups = []
+        def lookup_message(i18n_message, locale):
+            lookups.append((i18n_message.key, locale))
+            return type(provider).lookup_message(provider, i18n_message, locale)
+        provider.lookup_message = lookup_message
+        
+        message = status(2, wrap(hello('Bob')))
+        texts = self.ts.translate_to_locales(message, LOCALES)
+        
+        assert '(Hello, Bob): 2 messages' == texts[EN_GB_LOCALE]
+        assert '(Hallo, Bob): 2 messages' == texts[DE_CH_LOCALE]
+        # The plural is rendered per locale, the name once per text
+        assert len(LOCALES) == len([key for key, locale in self.ts.calls if key == 'test_fan_out.status'])
+        assert [EN_LOCALE, DE_LOCALE] == [locale for key, locale in lookups if key == 'test_fan_out.wrap']
+        assert [EN_LOCALE, DE_LOCALE] == [locale for key, locale in lookups if key == 'test_fan_out.hello']
+    
+    def test_plural_is_not_shared(self):
+        self.ts.translate_to_locales(inbox(1), LOCALES)
+        
+        assert len(LOCALES) == len(self.ts.calls)
+    
+    def test_deferred_arguments_are_evaluated_once(self):
+        calls = []
+        def name():
+            calls.append(1)
+            return 'Bob'
+        
+        texts = self.ts.translate_to_locales(hello(defer(name)), LOCALES)
+        assert 'Hallo, Bob' == texts[DE_CH_LOCALE]
+        assert 1 == len(calls)
+    
+    def test_thread_pool(self):
+        message = wrap(inbox(2))
+        expected = dict((locale, self.ts.translate(message, locale)) for locale in LOCALES)
+        
+        assert expected == self.ts.translate_to_locales(message, LOCALES, max_workers=2)
+    
+    def test_missing_text(self):
+        with self.assertRaisesRegex(I18nException, "Missing text for 'test_fan_out.unknown'"):
+            self.ts.translate_to_locales(unknown(), LOCALES)
+
+if __name__ == '__main__':
+    unittest.main()
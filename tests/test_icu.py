@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+from pdark.i18n import *
+from pdark.i18n import I18nException
+from pdark.i18n.icu import IcuMessageParser
+from pdark.i18n.test_support import *
+import unittest
+import pdark.i18n.babel
+import pdark.i18n.icu
+
+EN_LOCALE = 'en'
+RU_LOCALE = 'ru'
+
+def parse(input):
+    return IcuMessageParser(None).parse(input)
+
+def test_plain_text():
+    assert "MessageFormatter(text('xxx'),)" == repr(parse('xxx'))
+
+def test_arguments():
+    assert "MessageFormatter(text('Hello, '), arg(['name']), text('!'))" == repr(parse('Hello, {name}!'))
+    assert "MessageFormatter(arg([0]), text(' '), arg([1]))" == repr(parse('{0} {1}'))
+
+def test_lists_are_still_supported():
+    assert "MessageFormatter(text('a'), arg([0]))" == repr(parse(['a', {'arg': 0}]))
+
+def test_argument_types():
+    assert "MessageFormatter(arg(['n']),)" == repr(parse('{n, number}'))
+    assert "MessageFormatter(arg(['d'], {'style': 'short'}),)" == repr(parse('{ d , date , short }'))
+    assert "MessageFormatter(arg(['d'], {'pattern': 'EEEE'}),)" == repr(parse('{d, date, EEEE}'))
+    assert "MessageFormatter(arg(['items'], {'type': 'or'}),)" == repr(parse('{items, list, or}'))
+
+def test_quotes():
+    assert '''MessageFormatter(text("It's {literal} # {x}"),)''' == repr(parse("It''s '{literal}' # '{x}'"))
+    assert '''MessageFormatter(text("'{'"),)''' == repr(parse("'''{'''"))
+    assert "MessageFormatter(text(\"don't\"),)" == repr(parse("don't"))
+
+def test_plural():
+    actual = parse('{n, plural, =0 {none} one {# item} other {# items}}')
+    assert "MessageFormatter(plural(['n'], {'=0': [text('none')], 'one': [arg(['n']), text(' item')], 'other': [arg(['n']), text(' items')]}),)" == repr(actual)
+
+def test_select():
+    actual = parse('{g, select, female {She} other {They}} said')
+    assert "MessageFormatter(select(['g'], {'female': [text('She')], 'other': [text('They')]}), text(' said'))" == repr(actual)
+
+def test_errors():
+    for pattern, error in (
+            ('{', 'Expected argument name at 1'),
+            ('a}', 'Unexpected } at 1'),
+            ('{n, plural, one {x}}', 'Missing "other" branch'),
+            ('{n, plural, lots {x} other {y}}', "Unknown plural category 'lots'"),
+            ('{n, plural, one {x} one {y} other {z}}', "Duplicate selector 'one'"),
+            ('{n, plural, other {x}', 'Expected selector at 21'),
+            ('{n, currency}', "Unknown argument type 'currency'"),
+            ('{n, number, percent}', "Unsupported number style 'percent'"),
+            ('{n, select, other {x', 'Missing } at end of text'),
+        ):
+        try:
+            parse(pattern)
+            assert False, pattern
+        except I18nException as e:
+            assert str(e).startswith('Error parsing %r: %s' % (pattern, error)), str(e)
+
+@i18n
+def inbox(count, who):
+    pass
+
+@i18n
+def liked(gender, count):
+    pass
+
+@i18n
+def hello(name):
+    pass
+
+class TestRendering(unittest.TestCase):
+    def setUp(self):
+        setupLogging()
+        
+        self.ts = TranslationService(default_locale=EN_LOCALE)
+        pdark.i18n.icu.setup(self.ts)
+        
+        self.ts.message_provider.register_patterns(EN_LOCALE, {
+            'pdark.i18n.number.int': '%d',
+            'pdark.i18n.number.float': '%.1f',
+            'test_icu.hello': 'Hello, {name}',
+            'test_icu.inbox': '{who} has {count, plural, =0 {no messages} one {# message} other {# messages}}.',
+            'test_icu.liked': '{gender, select, female {She liked {count, plural, one {# post} other {# posts}}} other {They liked it}}',
+        })
+        self.ts.message_provider.register_patterns(RU_LOCALE, {
+            'test_icu.inbox': '{count, plural, one {# сообщение} few {# сообщения} other {# сообщений}}',
+        })
+    
+    def test_argument(self):
+        assert 'Hello, World' == self.ts.translate(hello('World'))
+    
+    def test_plural(self):
+        assert 'Bob has no messages.' == self.ts.translate(inbox(0, 'Bob'))
+        assert 'Bob has 1 message.' == self.ts.translate(inbox(1, 'Bob'))
+        assert 'Bob has 5 messages.' == self.ts.translate(inbox(5, 'Bob'))
+        assert 'Bob has 1.5 messages.' == self.ts.translate(inbox(1.5, 'Bob'))
+    
+    def test_select_with_nested_plural(self):
+        assert 'She liked 1 post' == self.ts.translate(liked('female', 1))
+        assert 'She liked 3 posts' == self.ts.translate(liked('female', 3))
+        assert 'They liked it' == self.ts.translate(liked('unknown', 3))
+    
+    def test_default_plural_rules(self):
+        # Without Babel, only "one" and "other" are known
+        assert '2 сообщений' == self.ts.translate(inbox(2, 'Ivan'), RU_LOCALE)
+    
+    def test_babel_plural_rules(self):
+        pdark.i18n.babel.setup(self.ts)
+        
+        assert '1 сообщение' == self.ts.translate(inbox(1, 'Ivan'), RU_LOCALE)
+        assert '2 сообщения' == self.ts.translate(inbox(2, 'Ivan'), RU_LOCALE)
+        assert '5 сообщений' == self.ts.translate(inbox(5, 'Ivan'), RU_LOCALE)
+        assert '21 сообщение' == self.ts.translate(inbox(21, 'Ivan'), RU_LOCALE)
+        # Locales which Babel doesn't know use the default rules
+        assert 'Bob has 1 message.' == self.ts.translate(inbox(1, 'Bob'), 'xx_YY')
+
+if __name__ == '__main__':
+    unittest.main()
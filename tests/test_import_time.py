@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+# Make sure that importing pdark.i18n stays cheap.
+
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def imported_modules(code):
+    '''Run code in a new interpreter and return the names of all modules reported by python -X importtime.'''
+    # Without LANG, TranslationService() has to ask the locale module
+    env = dict(os.environ, LANG='en_US.UTF-8')
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT, env=env, check=True, capture_output=True, text=True)
+    
+    modules = set()
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and not 'cumulative' in line:
+            modules.add(line.split('|')[2].strip())
+    return modules
+
+EXPENSIVE = set(('inspect', 'locale', 'babel', 'babel.dates'))
+
+class TestImportTime(unittest.TestCase):
+    def setUp(self):
+        # Applications always load logging, so it's not our cost
+        self.baseline = imported_modules('import logging')
+    
+    def assert_cheap(self, code):
+        added = imported_modules(code) - self.baseline
+        assert set() == added & EXPENSIVE, 'Unexpected imports: %s' % sorted(added)
+    
+    def test_import(self):
+        self.assert_cheap('import pdark.i18n')
+    
+    def test_create_service(self):
+        self.assert_cheap('import pdark.i18n; pdark.i18n.TranslationService()')
+    
+    def test_setup_babel(self):
+        self.assert_cheap('import pdark.i18n, pdark.i18n.babel; pdark.i18n.babel.setup(pdark.i18n.TranslationService("en"))')
+    
+    def test_babel_is_loaded_on_first_use(self):
+        code = '''
+import datetime, pdark.i18n, pdark.i18n.babel
+ts = pdark.i18n.TranslationService('en')
+pdark.i18n.babel.setup(ts)
+ts.formatter_factory.create_formatter('en', datetime.date(2017, 1, 1), {})
+'''
+        assert 'babel.dates' in imported_modules(code)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+from pdark.i18n import *
+from pdark.i18n import DetailFormatter, DetailFormatterFactory, I18nException
+from pdark.i18n.catalog import CatalogPatch
+from pdark.i18n.incremental import IncrementalRenderer
+from pdark.i18n.test_support import *
+import datetime
+import decimal
+import unittest
+import pdark.i18n.babel
+
+EN_LOCALE = 'en'
+DE_LOCALE = 'de'
+
+@i18n
+def row(name, value):
+    pass
+
+@i18n
+def table(rows):
+    pass
+
+@i18n
+def wrap(inner):
+    pass
+
+@i18n
+def number(n):
+    pass
+
+def dashboard(values):
+    return table([row('row%d' % i, number(value)) for i, value in enumerate(values)])
+
+class DecimalFormatter(DetailFormatter):
+    def format(self, inst):
+        return str(inst)
+
+class DecimalFormatterFactory(DetailFormatterFactory):
+    def can_handle(self, inst):
+        return isinstance(inst, decimal.Decimal)
+    
+    def create_formatter(self, locale):
+        return DecimalFormatter()
+
+class TestIncrementalRenderer(unittest.TestCase):
+    def setUp(self):
+        setupLogging()
+        
+        self.ts = TranslationService(default_locale=EN_LOCALE)
+        self.ts.message_provider.merge_catalogs({
+            EN_LOCALE: {
+                'pdark.i18n.number.int': '%d',
+                'pdark.i18n.number.float': '%.1f',
+                'pdark.i18n.list.comma': ', ',
+                'pdark.i18n.list.and': ' and ',
+                'test_incremental.row': [{'arg': 'name'}, '=', {'arg': 'value'}],
+                'test_incremental.table': ['[', {'arg': 'rows'}, ']'],
+                'test_incremental.wrap': ['(', {'arg': 'inner'}, ')'],
+                'test_incremental.number': [{'arg': 'n'}],
+            },
+            DE_LOCALE: {
+                'test_incremental.table': ['Tabelle: ', {'arg': 'rows'}],
+            },
+        })
+        self.renderer = IncrementalRenderer(self.ts)
+    
+    def test_same_text_as_translate(self):
+        message = dashboard([1, 2, 3])
+        
+        assert self.ts.translate(message) == self.renderer.render(message)
+        assert '[row0=1, row1=2 and row2=3]' == self.renderer.render(message)
+    
+    def test_unchanged_tree_is_reused(self):
+        self.renderer.render(dashboard([1, 2, 3]))
+        # 7 messages plus the texts for numbers and lists
+        assert 10 == self.renderer.misses
+        
+        assert '[row0=1, row1=2 and row2=3]' == self.renderer.render(dashboard([1, 2, 3]))
+        assert 10 == self.renderer.misses
+        # Only the root was needed
+        assert 1 == self.renderer.hits
+    
+    def test_only_changed_paths_are_rendered(self):
+        self.renderer.render(dashboard([1, 2, 3]))
+        self.renderer.misses = 0
+        
+        assert '[row0=1, row1=5 and row2=3]' == self.renderer.render(dashboard([1, 5, 3]))
+        # table, row1 and the number
+        assert 3 == self.renderer.misses
+        # row0, row2 and the texts for numbers and lists
+        assert 5 == self.renderer.hits
+    
+    def test_types_are_part_of_the_fingerprint(self):
+        assert '[row0=1]' == self.renderer.render(dashboard([1]))
+        assert '[row0=1.0]' == self.renderer.render(dashboard([1.0]))
+        assert '[row0=1]' == self.renderer.render(dashboard([True]))
+    
+    def test_equal_values_with_other_texts(self):
+        self.ts.formatter_factory.register(DecimalFormatterFactory())
+        
+        assert '[row0=1.0]' == self.renderer.render(dashboard([decimal.Decimal('1.0')]))
+        assert '[row0=1.00]' == self.renderer.render(dashboard([decimal.Decimal('1.00')]))
+        
+        assert '[row0=0.0]' == self.renderer.render(dashboard([0.0]))
+        assert '[row0=-0.0]' == self.renderer.render(dashboard([-0.0]))
+    
+    def test_time_zones(self):
+        pdark.i18n.babel.setup(self.ts)
+        utc = datetime.datetime(2017, 1, 1, 23, 30, tzinfo=datetime.timezone.utc)
+        tokyo = utc.astimezone(datetime.timezone(datetime.timedelta(hours=9)))
+        assert utc == tokyo
+        
+        assert '[row0=Jan 1, 2017]' == self.renderer.render(dashboard([utc]))
+        assert '[row0=Jan 2, 2017]' == self.renderer.render(dashboard([tokyo]))
+    
+    def test_locales(self):
+        assert '[row0=1]' == self.renderer.render(dashboard([1]))
+        assert 'Tabelle: row0=1' == self.renderer.render(dashboard([1]), DE_LOCALE)
+    
+    def test_only_the_last_render_is_kept(self):
+        self.renderer.render(dashboard([1, 2, 3]))
+        self.renderer.render(dashboard([4]))
+        
+        # table, row, number and the text for numbers
+        assert 4 == len(self.renderer.previous)
+    
+    def test_deferred_arguments_are_always_rendered(self):
+        calls = []
+        def value():
+            calls.append(1)
+            return 'x'
+        
+        assert '(x)' == self.renderer.render(wrap(defer(value)))
+        assert '(x)' == self.renderer.render(wrap(defer(value)))
+        assert 2 == len(calls)
+        assert 0 == self.renderer.hits
+    
+    def test_patches_clear_the_texts(self):
+        self.renderer.render(dashboard([1]))
+        self.ts.message_provider.apply_patch(CatalogPatch(1).change(EN_LOCALE, 'test_incremental.row', [{'arg': 'name'}, ': ', {'arg': 'value'}]))
+        
+        assert '[row0: 1]' == self.renderer.render(dashboard([1]))
+    
+    def test_clear(self):
+        self.renderer.render(dashboard([1]))
+        self.ts.message_provider.register_message('test_incremental.row', EN_LOCALE, [{'arg': 'value'}])
+        self.renderer.clear()
+        
+        assert '[1]' == self.renderer.render(dashboard([1]))
+    
+    def test_cycle(self):
+        message = wrap(None)
+        message.kwargs['inner'] = message
+        with self.assertRaisesRegex(I18nException, 'Message test_incremental.wrap contains itself'):
+            self.renderer.render(message)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,7 +8,7 @@
 # 
 # THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
-from pdark.i18n import LocaleFallbackStrategy
+from pdark.i18n import LocaleFallbackStrategy, locale_from_environment
 from pdark.i18n.test_support import *
 import locale
 import unittest
@@ -31,5 +31,37 @@ class TestLocaleFallbackStrategy(unittest.TestCase):
         actual = s.apply('de_CH')
         assert ['de_CH', 'de', 'en_US', 'en'] == actual
 
+class TestLocaleFromEnvironment(unittest.TestCase):
+    def test_lang(self):
+        assert 'de_CH' == locale_from_environment({'LANG': 'de_CH.UTF-8'})
+
+    def test_modifier(self):
+        assert 'de_DE' == locale_from_environment({'LANG': 'de_DE@euro'})
+
+    def test_lc_all_wins(self):
+        assert 'it' == locale_from_environment({'LANG': 'de_CH.UTF-8', 'LC_ALL': 'it'})
+
+    def test_language_list(self):
+        assert 'fr_CH' == locale_from_environment({'LANGUAGE': 'fr_CH:fr:en'})
+
+    def test_posix(self):
+        assert None == locale_from_environment({'LANG': 'C.UTF-8'})
+    
+    def test_normalization(self):
+        assert 'de_DE' == locale_from_environment({'LANG': 'german'})
+        assert 'en_US' == locale_from_environment({'LANG': 'en_us.UTF-8'})
+    
+    def test_windows(self):
+        import _locale
+        old = getattr(_locale, '_getdefaultlocale', None)
+        _locale._getdefaultlocale = lambda: ('0x0407', 'cp1252')
+        try:
+            assert 'de_DE' == locale_from_environment({})
+        finally:
+            if old is None:
+                del _locale._getdefaultlocale
+            else:
+                _locale._getdefaultlocale = old
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+from pdark.i18n import *
+from pdark.i18n.log_support import I18nLogFilter, I18nLogFormatter
+from io import StringIO
+import logging
+import unittest
+
+EN_LOCALE = 'en'
+DE_LOCALE = 'de'
+
+@i18n
+def order_rejected(order):
+    pass
+
+@i18n
+def unknown_problem(order):
+    pass
+
+class CountingTranslationService(TranslationService):
+    def __init__(self, *args, **kwargs):
+        super(CountingTranslationService, self).__init__(*args, **kwargs)
+        self.count = 0
+    
+    def translate(self, i18n_message, locale=None):
+        self.count += 1
+        return super(CountingTranslationService, self).translate(i18n_message, locale)
+
+class TestLazyTranslation(unittest.TestCase):
+    def setUp(self):
+        self.service = CountingTranslationService(default_locale=EN_LOCALE)
+        
+        message_provider = self.service.message_provider
+        message_provider.register_message('test_log_support.order_rejected', EN_LOCALE, ['Order ', {'arg': 'order'}, ' was rejected'])
+        message_provider.register_message('test_log_support.order_rejected', DE_LOCALE, ['Bestellung ', {'arg': 'order'}, ' wurde abgelehnt'])
+    
+    def test_not_translated_until_str(self):
+        text = self.service.lazy(order_rejected('A1'))
+        assert 0 == self.service.count
+        assert 'Order A1 was rejected' == str(text)
+        assert 1 == self.service.count
+    
+    def test_cached_per_locale(self):
+        text = self.service.lazy(order_rejected('A1'))
+        assert 'Order A1 was rejected' == str(text)
+        assert 'Order A1 was rejected' == '%s' % text
+        assert 'Bestellung A1 wurde abgelehnt' == text.in_locale(DE_LOCALE)
+        assert 'Bestellung A1 wurde abgelehnt' == text.in_locale(DE_LOCALE)
+        assert 2 == self.service.count
+    
+    def test_format(self):
+        text = self.service.lazy(order_rejected('A1'), DE_LOCALE)
+        assert '[Bestellung A1 wurde abgelehnt]' == '[{}]'.format(text)
+
+class TestLogging(unittest.TestCase):
+    def setUp(self):
+        self.service = CountingTranslationService(default_locale=EN_LOCALE)
+        self.service.message_provider.register_message('test_log_support.order_rejected', DE_LOCALE, ['Bestellung ', {'arg': 'order'}, ' wurde abgelehnt'])
+        
+        self.output = StringIO()
+        self.handler = logging.StreamHandler(self.output)
+        
+        self.log = logging.getLogger('test_log_support.%s' % self.id())
+        self.log.propagate = False
+        self.log.setLevel(logging.INFO)
+        self.log.addHandler(self.handler)
+    
+    def tearDown(self):
+        self.log.removeHandler(self.handler)
+    
+    def test_filter_translates_args(self):
+        self.handler.addFilter(I18nLogFilter(self.service, DE_LOCALE))
+        self.log.info('Problem: %s', order_rejected('A1'))
+        assert 'Problem: Bestellung A1 wurde abgelehnt\n' == self.output.getvalue()
+    
+    def test_filter_translates_msg(self):
+        self.handler.addFilter(I18nLogFilter(self.service, DE_LOCALE))
+        self.log.info(order_rejected('A1'))
+        assert 'Bestellung A1 wurde abgelehnt\n' == self.output.getvalue()
+    
+    def test_filter_doesnt_raise(self):
+        self.handler.addFilter(I18nLogFilter(self.service, DE_LOCALE))
+        errors = logging.getLogger('pdark.i18n.log_support.I18nLogFilter')
+        with self.assertLogs(errors, logging.WARNING) as captured:
+            self.log.info('Problem: %s', unknown_problem('A1'))
+        
+        assert "Problem: I18NMessage(test_log_support.unknown_problem, ('A1',), {'order': 'A1'})\n" == self.output.getvalue()
+        assert 'Missing text for' in captured.output[0]
+    
+    def test_formatter_translates_dict_args(self):
+        self.handler.setFormatter(I18nLogFormatter(self.service, DE_LOCALE, '%(levelname)s %(message)s'))
+        self.log.warning('Problem: %(reason)s', {'reason': order_rejected('A1')})
+        assert 'WARNING Problem: Bestellung A1 wurde abgelehnt\n' == self.output.getvalue()
+    
+    def test_formatter_keeps_record(self):
+        records = []
+        self.handler.setFormatter(I18nLogFormatter(self.service, DE_LOCALE))
+        self.handler.addFilter(lambda record: records.append(record) or True)
+        message = order_rejected('A1')
+        self.log.info('Problem: %s', message)
+        assert (message,) == records[0].args
+    
+    def test_disabled_level_is_not_translated(self):
+        self.handler.addFilter(I18nLogFilter(self.service, DE_LOCALE))
+        self.log.debug('Problem: %s', order_rejected('A1'))
+        assert 0 == self.service.count
+        assert '' == self.output.getvalue()
+    
+    def test_handler_level_is_not_translated(self):
+        self.handler.setLevel(logging.ERROR)
+        self.handler.addFilter(I18nLogFilter(self.service, DE_LOCALE))
+        self.log.info('Problem: %s', order_rejected('A1'))
+        assert 0 == self.service.count
+
+if __name__ == '__main__':
+    unittest.main()
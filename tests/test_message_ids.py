@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+from pdark.i18n import *
+from pdark.i18n import message_id, message_keys
+from pdark.i18n.test_support import *
+import unittest
+
+setupLogging()
+
+EN_LOCALE = 'en'
+DE_LOCALE = 'de'
+DE_CH_LOCALE = 'de_CH'
+
+@i18n
+def hello(name):
+    pass
+
+class TestMessageIds(unittest.TestCase):
+    def setUp(self):
+        self.service = TranslationService(default_locale=EN_LOCALE)
+        self.message_provider = self.service.message_provider
+        self.message_provider.register_message('test_message_ids.hello', EN_LOCALE, ['Hello, ', {'arg': 'name'}])
+        self.message_provider.register_message('test_message_ids.hello', DE_LOCALE, ['Hallo, ', {'arg': 'name'}])
+    
+    def test_decorator_assigns_id(self):
+        message = hello('Anna')
+        assert message_id('test_message_ids.hello') == message.key_id
+        assert 'test_message_ids.hello' == message_keys[message.key_id]
+    
+    def test_ids_are_stable(self):
+        key_id = message_id('test_message_ids.other')
+        assert key_id == message_id('test_message_ids.other')
+        assert key_id != message_id('test_message_ids.hello')
+    
+    def test_with_locale_keeps_id(self):
+        message = hello('Anna')
+        assert message.key_id == message.with_locale(DE_LOCALE).key_id
+    
+    def test_message_without_id(self):
+        message = I18NMessage('test_message_ids.hello', None, name='Anna')
+        assert None == message.key_id
+        assert 'Hallo, Anna' == self.service.translate(message, DE_LOCALE)
+    
+    def test_table_contains_fallback(self):
+        message = hello('Anna')
+        assert 'Hallo, Anna' == self.service.translate(message, DE_CH_LOCALE)
+        
+        table = self.message_provider.lookup_tables[DE_CH_LOCALE]
+        assert self.message_provider.pattern_cache[DE_LOCALE]['test_message_ids.hello'] is table[message.key_id]
+    
+    def test_keys_are_shared_between_locales(self):
+        en_key, = self.message_provider.pattern_cache[EN_LOCALE]
+        de_key, = self.message_provider.pattern_cache[DE_LOCALE]
+        assert en_key is de_key
+    
+    def test_register_message_updates_table(self):
+        assert 'Hallo, Anna' == self.service.translate(hello('Anna'), DE_CH_LOCALE)
+        self.message_provider.register_message('test_message_ids.hello', DE_CH_LOCALE, ['Grüezi, ', {'arg': 'name'}])
+        assert 'Grüezi, Anna' == self.service.translate(hello('Anna'), DE_CH_LOCALE)
+
+if __name__ == '__main__':
+    unittest.main()
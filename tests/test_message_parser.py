@@ -70,5 +70,41 @@ def test_escape_before_param():
     actual = parse(['{a}', {'arg': 0}])
     assert "MessageFormatter(text('{a}'), arg([0]))" == repr(actual)
 
+def test_shared_fragments():
+    parser = MessageParser(None)
+    a = parser.parse(['Hello, ', {'arg': 'name'}, ' and ', {'arg': 'date', 'style': 'long'}])
+    b = parser.parse(['Hallo, ', {'arg': 'name'}, ' and ', {'arg': 'date', 'style': 'long'}])
+    
+    assert a.fragments[1] is b.fragments[1]
+    assert a.fragments[2] is b.fragments[2]
+    assert a.fragments[3] is b.fragments[3]
+    assert a.fragments[1].ref is parser.parse([{'arg': 'name', 'style': 'x'}]).fragments[0].ref
+    assert "MessageFormatter(text('Hallo, '), arg(['name']), text(' and '), arg(['date'], {'style': 'long'}))" == repr(b)
+
+def test_shared_formatters():
+    parser = MessageParser(None)
+    assert parser.parse('OK') is parser.parse(['OK'])
+    assert parser.parse([{'arg': 0}]) is parser.parse([{'arg': 0}])
+    assert parser.parse([{'arg': 0}]) is not parser.parse([{'arg': 1}])
+
+def test_option_types_are_not_shared():
+    parser = MessageParser(None)
+    fragments = [parser.parse([{'arg': 0, 'digits': value}]).fragments[0] for value in (1, True, 1.0)]
+    
+    assert [int, bool, float] == [type(fragment.options['digits']) for fragment in fragments]
+    assert fragments[0] is parser.parse([{'arg': 0, 'digits': 1}]).fragments[0]
+
+def test_unhashable_options():
+    parser = MessageParser(None)
+    a = parser.parse([{'arg': 0, 'values': [1, 2]}])
+    b = parser.parse([{'arg': 0, 'values': [1, 2]}])
+    assert a.fragments[0] is not b.fragments[0]
+    assert "MessageFormatter(arg([0], {'values': [1, 2]}),)" == repr(a)
+
+def test_no_instance_dicts():
+    formatter = parse(['a', {'arg': 'name'}])
+    for value in (formatter, formatter.fragments[0], formatter.fragments[1], formatter.fragments[1].ref):
+        assert not hasattr(value, '__dict__'), value
+
 if __name__ == '__main__':
     unittest.main()
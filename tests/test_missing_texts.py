@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+from pdark.i18n import *
+from pdark.i18n import BoundedMessageProvider, I18nException, I18nFormatException, LogMissingTextStrategy, MessageParser
+from pdark.i18n.test_support import *
+import pickle
+import unittest
+
+EN_LOCALE = 'en'
+DE_LOCALE = 'de'
+DE_CH_LOCALE = 'de_CH'
+
+@i18n
+def title():
+    pass
+
+@i18n
+def admin_title():
+    pass
+
+@i18n
+def greeting(name):
+    pass
+
+@i18n
+def unknown():
+    pass
+
+CATALOGS = {
+    EN_LOCALE: {
+        'test_missing_texts.title': 'Title',
+        'test_missing_texts.greeting': ['Hello, ', {'arg': 'name'}],
+    },
+    DE_LOCALE: {
+        'test_missing_texts.title': 'Titel',
+    },
+    DE_CH_LOCALE: {
+        'test_missing_texts.admin_title': 'Verwaltung',
+    },
+}
+
+class CountingStrategy(LogMissingTextStrategy):
+    def __init__(self):
+        super(CountingStrategy, self).__init__()
+        self.missing = []
+    
+    def apply(self, i18n_message, locale):
+        self.missing.append(i18n_message.key)
+        return super(CountingStrategy, self).apply(i18n_message, locale)
+
+def create_service():
+    ts = TranslationService(default_locale=EN_LOCALE)
+    ts.message_provider.merge_catalogs(CATALOGS)
+    return ts
+
+def create_base():
+    ts = create_service()
+    ts.message_provider.add_key_fallback('test_missing_texts.admin_title', ['test_missing_texts.title'])
+    return ts
+
+class TestMissingTexts(unittest.TestCase):
+    def setUp(self):
+        setupLogging()
+        self.ts = create_service()
+        self.provider = self.ts.message_provider
+    
+    def test_find_message(self):
+        assert MISSING is self.provider.find_message(unknown(), EN_LOCALE)
+        assert 'Titel' == self.provider.find_message(title(), DE_CH_LOCALE).format(DE_CH_LOCALE, (), {})
+    
+    def test_missing(self):
+        assert not MISSING
+        assert 'MISSING' == repr(MISSING)
+    
+    def test_try_translate(self):
+        assert MISSING is self.ts.try_translate(unknown())
+        assert 'Titel' == self.ts.try_translate(title(), DE_LOCALE)
+        assert 'Hello, Bob' == self.ts.try_translate(greeting('Bob'))
+    
+    def test_translate_still_fails(self):
+        with self.assertRaisesRegex(I18nException, "Missing text for 'test_missing_texts.unknown'"):
+            self.ts.translate(unknown())
+    
+    def test_fallback_key(self):
+        self.provider.add_key_fallback('test_missing_texts.admin_title', ['test_missing_texts.title'])
+        
+        assert 'Title' == self.ts.translate(admin_title())
+        assert 'Titel' == self.ts.translate(admin_title(), DE_LOCALE)
+        # The text for the key in a fallback locale wins over the fallback key
+        assert 'Verwaltung' == self.ts.translate(admin_title(), DE_CH_LOCALE)
+    
+    def test_cached_fallbacks_are_forgotten(self):
+        self.provider.add_key_fallback('test_missing_texts.admin_title', ['test_missing_texts.title'])
+        assert 'Title' == self.ts.translate(admin_title())
+        
+        self.provider.register_message('test_missing_texts.title', EN_LOCALE, 'New title')
+        assert 'New title' == self.ts.translate(admin_title())
+        
+        self.provider.register_message('test_missing_texts.admin_title', EN_LOCALE, 'Admin')
+        assert 'Admin' == self.ts.translate(admin_title())
+    
+    def test_default_text(self):
+        self.provider.add_key_fallback('test_missing_texts.unknown', ['test_missing_texts.other'], 'Unknown')
+        
+        assert 'Unknown' == self.ts.translate(unknown())
+        assert 'Unknown' == self.ts.try_translate(unknown())
+    
+    def test_fallback_keys_have_no_fallbacks(self):
+        self.provider.add_key_fallback('test_missing_texts.unknown', ['test_missing_texts.other'])
+        self.provider.add_key_fallback('test_missing_texts.other', [], 'Other')
+        
+        assert MISSING is self.ts.try_translate(unknown())
+    
+    def test_strategy_is_not_used(self):
+        strategy = CountingStrategy()
+        self.provider.missing_text_strategy = strategy
+        self.provider.add_key_fallback('test_missing_texts.admin_title', ['test_missing_texts.title'])
+        
+        assert MISSING is self.ts.try_translate(unknown())
+        assert 'Title' == self.ts.translate(admin_title())
+        assert [] == strategy.missing
+        
+        assert "I18NMessage(test_missing_texts.unknown, (), {})" == self.ts.translate(unknown())
+        assert ['test_missing_texts.unknown'] == strategy.missing
+    
+    def test_frozen(self):
+        self.provider.freeze()
+        with self.assertRaisesRegex(I18nException, 'frozen'):
+            self.provider.add_key_fallback('test_missing_texts.unknown', default='Unknown')
+    
+    def test_overlay(self):
+        base = shared_service(create_base)
+        tenant = overlay_service(base)
+        tenant.message_provider.register_message('test_missing_texts.title', EN_LOCALE, 'Tenant')
+        tenant.message_provider.add_key_fallback('test_missing_texts.unknown', default='Unknown')
+        
+        assert 'Tenant' == tenant.translate(admin_title())
+        assert 'Unknown' == tenant.translate(unknown())
+        assert 'test_missing_texts.unknown' not in base.message_provider.key_fallbacks
+    
+    def test_bounded_provider(self):
+        ts = TranslationService(default_locale=EN_LOCALE)
+        ts.message_provider = BoundedMessageProvider(EN_LOCALE, MessageParser(ts), lambda locale, namespace: CATALOGS.get(locale, {}), 100000)
+        ts.message_provider.add_key_fallback('test_missing_texts.admin_title', ['test_missing_texts.title'])
+        
+        assert 'Titel' == ts.translate(admin_title(), DE_LOCALE)
+        assert MISSING is ts.try_translate(unknown())
+    
+    def test_plural_uses_other(self):
+        self.provider.register_message('pdark.i18n.number.int', EN_LOCALE, '%d')
+        self.provider.register_message('test_missing_texts.house.one', EN_LOCALE, 'house')
+        self.provider.register_message('test_missing_texts.house.other', EN_LOCALE, 'houses')
+        self.provider.register_message('test_missing_texts.house', EN_LOCALE, [{'arg': 0, 'plural': 'test_missing_texts.house'}])
+        
+        assert '1 house' == self.ts.translate(I18NMessage('test_missing_texts.house', None, 1))
+        assert '0 houses' == self.ts.translate(I18NMessage('test_missing_texts.house', None, 0))
+        assert '2 houses' == self.ts.translate(I18NMessage('test_missing_texts.house', None, 2))
+
+class TestFormatException(unittest.TestCase):
+    def test_text(self):
+        e = I18nFormatException('Error formatting x', ('x', 'formatter', (1,), {}, ValueError('oops')))
+        assert "Error formatting x with 'formatter', args=(1,), kwargs={}: oops" == str(e)
+    
+    def test_pickle(self):
+        e = I18nFormatException('Error formatting x', ('x', lambda: None, (1,), {}, ValueError('oops')))
+        copy = pickle.loads(pickle.dumps(e))
+        assert str(e) == str(copy)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+from pdark.i18n import AcceptLanguageNegotiator, TranslationService, normalize_locale
+from pdark.i18n.test_support import *
+import unittest
+
+setupLogging()
+
+class TestNormalizeLocale(unittest.TestCase):
+    def test_dash(self):
+        assert 'en_US' == normalize_locale('en-US')
+
+    def test_lower_case(self):
+        assert 'en_US' == normalize_locale('en_us')
+
+    def test_upper_case(self):
+        assert 'de' == normalize_locale('DE')
+
+    def test_script(self):
+        assert 'zh_Hant_TW' == normalize_locale('zh-hant-tw')
+
+    def test_interned(self):
+        assert normalize_locale('en-' + 'US') is normalize_locale('EN_us')
+
+class TestAcceptLanguageNegotiator(unittest.TestCase):
+    def setUp(self):
+        self.negotiator = AcceptLanguageNegotiator(['en', 'en_US', 'de', 'de_CH', 'fr_FR'], default_locale='en')
+    
+    def test_exact(self):
+        assert 'de_CH' == self.negotiator.negotiate('de-CH')
+    
+    def test_spelling(self):
+        assert 'en_US' == self.negotiator.negotiate('en-us')
+    
+    def test_strip_region(self):
+        assert 'de' == self.negotiator.negotiate('de-AT')
+    
+    def test_same_language(self):
+        assert 'fr_FR' == self.negotiator.negotiate('fr-CA')
+    
+    def test_quality(self):
+        assert 'de' == self.negotiator.negotiate('it;q=0.9, en;q=0.5, de;q=0.8')
+    
+    def test_order_for_same_quality(self):
+        assert 'fr_FR' == self.negotiator.negotiate('fr, de')
+    
+    def test_quality_zero(self):
+        assert 'en' == self.negotiator.negotiate('de;q=0, it')
+    
+    def test_star(self):
+        assert 'en' == self.negotiator.negotiate('it, *;q=0.1')
+    
+    def test_empty(self):
+        assert 'en' == self.negotiator.negotiate('')
+    
+    def test_none(self):
+        assert 'en' == self.negotiator.negotiate(None)
+    
+    def test_invalid_quality(self):
+        assert 'de' == self.negotiator.negotiate('fr;q=x, de')
+    
+    def test_cached(self):
+        self.negotiator.negotiate('de-CH, de;q=0.5')
+        assert {'de-CH, de;q=0.5': 'de_CH'} == self.negotiator.cache
+    
+    def test_cache_is_bounded(self):
+        negotiator = AcceptLanguageNegotiator(['en'], cache_size=2)
+        for header in ('a', 'b', 'c'):
+            negotiator.negotiate(header)
+        assert ['b', 'c'] == list(negotiator.cache)
+    
+    def test_set_available_locales_clears_cache(self):
+        self.negotiator.negotiate('it')
+        self.negotiator.set_available_locales(['en', 'it'])
+        assert 'it' == self.negotiator.negotiate('it')
+    
+    def test_for_provider(self):
+        ts = TranslationService(default_locale='en')
+        ts.message_provider.register_message('x', 'de_CH', 'x')
+        ts.message_provider.register_message('x', 'en', 'x')
+        negotiator = AcceptLanguageNegotiator.for_provider(ts.message_provider)
+        assert 'de_CH' == negotiator.negotiate('de-ch')
+        assert 'en' == negotiator.negotiate('it')
+
+if __name__ == '__main__':
+    unittest.main()
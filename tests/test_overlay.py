@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+from pdark.i18n import *
+from pdark.i18n import I18nException, OverlayMessageProvider, message_id
+from pdark.i18n.test_support import *
+import unittest
+
+EN_LOCALE = 'en'
+DE_LOCALE = 'de'
+DE_CH_LOCALE = 'de_CH'
+
+@i18n
+def greeting(name):
+    pass
+
+@i18n
+def product():
+    pass
+
+@i18n
+def welcome(product):
+    pass
+
+@i18n
+def currency():
+    pass
+
+@i18n
+def title():
+    pass
+
+def create_base():
+    ts = TranslationService(default_locale=EN_LOCALE)
+    ts.message_provider.merge_catalogs({
+        EN_LOCALE: {
+            'test_overlay.greeting': ['Hello, ', {'arg': 'name'}],
+            'test_overlay.product': 'Product',
+            'test_overlay.welcome': ['Welcome to ', {'arg': 'product'}],
+            'test_overlay.currency': 'Dollar',
+        },
+        DE_LOCALE: {
+            'test_overlay.greeting': ['Hallo, ', {'arg': 'name'}],
+            'test_overlay.currency': 'Euro',
+        },
+        DE_CH_LOCALE: {
+            'test_overlay.currency': 'Franken',
+        },
+    })
+    return ts
+
+class TestOverlayMessageProvider(unittest.TestCase):
+    def setUp(self):
+        setupLogging()
+        
+        self.base = shared_service(create_base)
+        self.ts = overlay_service(self.base)
+        self.overlay = self.ts.message_provider
+    
+    def test_shared_service(self):
+        assert self.base is shared_service(create_base)
+        assert self.base.message_provider.frozen
+    
+    def test_frozen_base(self):
+        with self.assertRaisesRegex(I18nException, 'are frozen'):
+            self.base.message_provider.register_message('test_overlay.product', EN_LOCALE, 'Changed')
+        
+        ts = TranslationService(default_locale=EN_LOCALE)
+        with self.assertRaisesRegex(I18nException, 'must be frozen'):
+            OverlayMessageProvider(ts.message_provider)
+    
+    def test_base_texts(self):
+        assert 'Hallo, Bob' == self.ts.translate(greeting('Bob'), DE_LOCALE)
+        assert 'Product' == self.ts.translate(product(), DE_LOCALE)
+    
+    def test_override(self):
+        self.overlay.register_patterns(DE_LOCALE, {'test_overlay.greeting': ['Servus, ', {'arg': 'name'}]})
+        
+        assert 'Servus, Bob' == self.ts.translate(greeting('Bob'), DE_LOCALE)
+        assert 'Servus, Bob' == self.ts.translate(greeting('Bob'), DE_CH_LOCALE)
+        assert 'Hello, Bob' == self.ts.translate(greeting('Bob'), EN_LOCALE)
+        
+        # Other services see the base
+        assert 'Hallo, Bob' == self.base.translate(greeting('Bob'), DE_LOCALE)
+        assert 'Hallo, Bob' == overlay_service(self.base).translate(greeting('Bob'), DE_LOCALE)
+    
+    def test_same_fallback_as_merged_catalogs(self):
+        # The base has a text for de_CH, which is more specific than the override
+        self.overlay.register_message('test_overlay.currency', DE_LOCALE, 'Mark')
+        
+        assert 'Mark' == self.ts.translate(currency(), DE_LOCALE)
+        assert 'Franken' == self.ts.translate(currency(), DE_CH_LOCALE)
+    
+    def test_key_fallback_after_base(self):
+        base = TranslationService(default_locale=EN_LOCALE)
+        base.message_provider.register_message('test_overlay.product', EN_LOCALE, 'Product')
+        base.message_provider.add_key_fallback('test_overlay.title', ['test_overlay.product'])
+        base.message_provider.freeze()
+        ts = overlay_service(base)
+        ts.message_provider.register_message('test_overlay.product', EN_LOCALE, 'Widget Pro')
+        
+        # The base caches the result of its key fallback first
+        assert 'Product' == base.translate(title())
+        assert 'Widget Pro' == ts.translate(title())
+        assert 'Product' == base.translate(title())
+    
+    def test_nested_messages_use_overlay(self):
+        self.overlay.register_message('test_overlay.product', EN_LOCALE, 'Widget Pro')
+        
+        assert 'Welcome to Widget Pro' == self.ts.translate(welcome(product()), EN_LOCALE)
+        assert 'Welcome to Product' == self.base.translate(welcome(product()), EN_LOCALE)
+    
+    def test_lookup_tables(self):
+        self.overlay.register_message('test_overlay.product', EN_LOCALE, 'Widget Pro')
+        
+        self.ts.translate(welcome(product()), EN_LOCALE)
+        
+        # The overlay only caches what it overrides
+        assert [message_id('test_overlay.product')] == list(self.overlay.lookup_tables[EN_LOCALE])
+        assert 'test_overlay.welcome' in self.base.message_provider.cached_keys(EN_LOCALE)
+        
+        self.overlay.register_message('test_overlay.product', EN_LOCALE, 'Widget Max')
+        assert 'Welcome to Widget Max' == self.ts.translate(welcome(product()), EN_LOCALE)
+    
+    def test_keys(self):
+        self.overlay.register_message('test_overlay.new', DE_LOCALE, 'Neu')
+        
+        assert self.overlay.has_message('test_overlay.new', DE_LOCALE)
+        assert self.overlay.has_message('test_overlay.currency', DE_CH_LOCALE)
+        assert not self.base.message_provider.has_message('test_overlay.new', DE_LOCALE)
+        
+        assert set(['test_overlay.new', 'test_overlay.product']) <= self.overlay.known_keys()
+        assert [] == self.overlay.warm_up(DE_CH_LOCALE, ['test_overlay.new', 'test_overlay.product'])
+    
+    def test_missing_text(self):
+        with self.assertRaisesRegex(I18nException, "Missing text for 'test_overlay.unknown'"):
+            self.ts.translate(I18NMessage('test_overlay.unknown'))
+
+if __name__ == '__main__':
+    unittest.main()
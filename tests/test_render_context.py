@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+from pdark.i18n import *
+from pdark.i18n import I18nException, MessageParser, SimpleMessageProvider
+from pdark.i18n.test_support import *
+import unittest
+
+setupLogging()
+
+EN_LOCALE = 'en'
+
+@i18n
+def color():
+    pass
+
+@i18n
+def wrap(inner):
+    pass
+
+@i18n
+def items(*items):
+    pass
+
+class CountingMessageProvider(SimpleMessageProvider):
+    def __init__(self, *args, **kwargs):
+        super(CountingMessageProvider, self).__init__(*args, **kwargs)
+        self.lookups = []
+    
+    def lookup_message(self, i18n_message, locale):
+        self.lookups.append(i18n_message.key)
+        return super(CountingMessageProvider, self).lookup_message(i18n_message, locale)
+
+def chain(depth):
+    message = color()
+    for i in range(depth):
+        message = wrap(message)
+    return message
+
+def cause_chain_length(e):
+    result = 0
+    while e is not None:
+        result += 1
+        e = e.__cause__
+    return result
+
+class TestRenderContext(unittest.TestCase):
+    def setUp(self):
+        self.service = TranslationService(default_locale=EN_LOCALE, max_depth=10)
+        self.message_provider = CountingMessageProvider(EN_LOCALE, MessageParser(self.service))
+        self.service.message_provider = self.message_provider
+        
+        self.message_provider.register_message('test_render_context.color', EN_LOCALE, 'red')
+        self.message_provider.register_message('test_render_context.wrap', EN_LOCALE, ['(', {'arg': 'inner'}, ')'])
+        self.message_provider.register_message('test_render_context.items', EN_LOCALE, [{'arg': 'items'}])
+        self.message_provider.register_message('pdark.i18n.list.comma', EN_LOCALE, ', ')
+        self.message_provider.register_message('pdark.i18n.list.and', EN_LOCALE, ' and ')
+    
+    def test_nested(self):
+        assert '(((red)))' == self.service.translate(chain(3))
+    
+    def test_shared_sub_message_is_rendered_once(self):
+        shared = wrap(color())
+        message = items([shared, shared], [shared])
+        
+        assert '(red) and (red) and (red)' == self.service.translate(message)
+        assert 1 == self.message_provider.lookups.count('test_render_context.wrap')
+        assert 1 == self.message_provider.lookups.count('test_render_context.color')
+    
+    def test_memo_is_per_translation(self):
+        message = wrap(color())
+        self.service.translate(message)
+        self.service.translate(message)
+        assert 2 == self.message_provider.lookups.count('test_render_context.wrap')
+    
+    def test_memo_is_per_locale(self):
+        self.message_provider.register_message('test_render_context.color', 'de', 'rot')
+        shared = color()
+        message = items(shared, shared.with_locale('de'))
+        assert 'red and red' == self.service.translate(message)
+    
+    def test_cycle(self):
+        message = wrap(None)
+        message.kwargs['inner'] = message
+        with self.assertRaisesRegex(I18nException, 'Message test_render_context.wrap contains itself'):
+            self.service.translate(message)
+    
+    def test_cycle_repr(self):
+        message = wrap(None)
+        message.kwargs['inner'] = message
+        assert "I18NMessage(test_render_context.wrap, (None,), {'inner': ...})" == repr(message)
+    
+    def test_max_depth(self):
+        assert self.service.translate(chain(9))
+        with self.assertRaisesRegex(I18nException, 'nested deeper than 10'):
+            self.service.translate(chain(10))
+    
+    def test_default_max_depth(self):
+        service = TranslationService(default_locale=EN_LOCALE)
+        assert TranslationService.DEFAULT_MAX_DEPTH == service.max_depth
+    
+    def test_error_is_wrapped_once(self):
+        message = chain(8)
+        self.message_provider.register_message('test_render_context.color', EN_LOCALE, [{'arg': 'missing'}])
+        try:
+            self.service.translate(message)
+            self.fail('Expected I18nException')
+        except I18nException as e:
+            # Translating, formatting the innermost message, KeyError
+            assert 3 == cause_chain_length(e)
+            assert 'Error formatting test_render_context.color' in str(e)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+from pdark.i18n.report import CoverageReport, SourceScanner, default_cache_file, main, module_name
+from pdark.i18n.test_support import *
+from unittest import mock
+import io
+import json
+import os
+import shutil
+import tempfile
+import textwrap
+import unittest
+
+setupLogging()
+
+SOURCES = {
+    'app/__init__.py': '''
+        from .messages import hello
+    ''',
+    'app/messages.py': '''
+        from pdark.i18n import i18n
+        import pdark.i18n
+        
+        @i18n
+        def hello(name):
+            pass
+        
+        @pdark.i18n.i18n
+        def bye():
+            pass
+        
+        @i18n
+        def forgotten():
+            pass
+        
+        def not_a_message():
+            pass
+    ''',
+    'app/views/page.py': '''
+        from app import hello
+        from .. import messages as m
+        from ..messages import bye as goodbye
+        from pdark.i18n import I18NMessage
+        
+        def render(name):
+            return [hello(name), m.bye(), goodbye(), m.not_a_message(), I18NMessage('app.literal'), I18NMessage('app.typo')]
+    ''',
+    'broken.py': '''
+        def (
+    ''',
+}
+
+CATALOGS = {
+    'en': {'app.messages.hello': 'Hello', 'app.messages.bye': 'Bye', 'app.messages.forgotten': 'x', 'app.literal': 'Literal', 'pdark.i18n.list.and': ' and '},
+    'de': {'app.messages.hello': 'Hallo', 'app.old': 'Alt'},
+}
+
+class TestReport(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.source = os.path.join(self.directory, 'src')
+        for path, text in SOURCES.items():
+            self.write(path, text)
+        
+        self.catalogs = os.path.join(self.directory, 'catalogs')
+        os.mkdir(self.catalogs)
+        for locale, catalog in CATALOGS.items():
+            with open(os.path.join(self.catalogs, locale + '.json'), 'w', encoding='utf-8') as fh:
+                json.dump(catalog, fh)
+        
+        self.cache_file = os.path.join(self.directory, 'cache.json')
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def write(self, path, text):
+        path = os.path.join(self.source, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as fh:
+            fh.write(textwrap.dedent(text))
+    
+    def scan(self, max_workers=1):
+        scanner = SourceScanner(cache_file=self.cache_file, max_workers=max_workers)
+        return scanner, scanner.scan(self.source)
+    
+    def test_module_name(self):
+        assert 'app' == module_name(os.path.join('app', '__init__.py'))
+        assert 'app.views.page' == module_name(os.path.join('app', 'views', 'page.py'))
+    
+    def test_definitions_and_usages(self):
+        scanner, index = self.scan()
+        
+        assert ['app.messages.bye', 'app.messages.forgotten', 'app.messages.hello'] == sorted(index.definitions)
+        assert [(os.path.join('app', 'messages.py'), 6)] == index.definitions['app.messages.hello']
+        
+        page = os.path.join('app', 'views', 'page.py')
+        assert [(page, 8)] == index.usages['app.messages.hello']
+        assert [(page, 8), (page, 8)] == index.usages['app.messages.bye']
+        assert [(page, 8)] == index.usages['app.literal']
+        assert not 'app.messages.not_a_message' in index.usages
+        
+        assert ['broken.py'] == list(index.errors)
+    
+    def test_coverage(self):
+        scanner, index = self.scan()
+        report = CoverageReport(index, CATALOGS, 'en')
+        
+        assert set(['app.messages.forgotten']) == report.unused
+        assert set(['app.typo']) == report.unknown
+        assert set() == report.missing['en']
+        # de falls back to en
+        assert set() == report.missing['de']
+        assert set(['app.old']) == report.obsolete['de']
+        assert set() == report.obsolete['en']
+        
+        report = CoverageReport(index, {'de': CATALOGS['de']}, 'de')
+        assert set(['app.messages.bye', 'app.messages.forgotten']) == report.missing['de']
+    
+    def test_cache(self):
+        scanner, index = self.scan()
+        assert 4 == scanner.parsed
+        
+        scanner, index = self.scan()
+        assert (0, 4) == (scanner.parsed, scanner.cached)
+        
+        self.write('app/messages.py', '''
+            from pdark.i18n import i18n
+            
+            @i18n
+            def hello(name):
+                pass
+        ''')
+        scanner, index = self.scan()
+        assert (1, 3) == (scanner.parsed, scanner.cached)
+        assert ['app.messages.hello'] == sorted(index.definitions)
+    
+    def test_cache_checks_hash(self):
+        scanner, index = self.scan()
+        
+        # Same content, new time stamp
+        path = os.path.join(self.source, 'app', 'messages.py')
+        os.utime(path, ns=(0, 0))
+        scanner, index = self.scan()
+        assert (0, 4) == (scanner.parsed, scanner.cached)
+    
+    def test_process_pool(self):
+        for i in range(120):
+            self.write('gen/mod%d.py' % i, '''
+                from pdark.i18n import i18n
+                
+                @i18n
+                def message():
+                    pass
+            ''')
+        
+        scanner, index = self.scan(max_workers=2)
+        assert 124 == scanner.parsed
+        assert 123 == len(index.definitions)
+    
+    def test_main(self):
+        out = io.StringIO()
+        assert 1 == main([self.source, '--catalogs', self.catalogs, '--cache', self.cache_file, '--usage', 'app.messages.hello'], out)
+        
+        text = out.getvalue()
+        assert 'Messages: 3 defined, 4 used in 5 places, 1 never used\n' in text
+        assert 'Locale de: 2 texts, 0 missing, 1 obsolete\n' in text
+        assert '    used in %s:8\n' % os.path.join('app', 'views', 'page.py') in text
+        assert text.count('Error in broken.py') == 1
+        
+        out = io.StringIO()
+        main([self.source, '--catalogs', self.catalogs, '--cache', '', '--json'], out)
+        data = json.loads(out.getvalue())
+        assert ['app.old'] == data['obsolete']['de']
+        assert ['app.typo'] == data['unknown']
+    
+    def test_default_cache_file(self):
+        cache_home = os.path.join(self.directory, 'cache-home')
+        cwd = os.path.join(self.directory, 'cwd')
+        os.mkdir(cwd)
+        with mock.patch.dict(os.environ, XDG_CACHE_HOME=cache_home):
+            cache_file = default_cache_file(self.source)
+            old_cwd = os.getcwd()
+            os.chdir(cwd)
+            try:
+                main([self.source], io.StringIO())
+            finally:
+                os.chdir(old_cwd)
+        
+        assert os.path.join(cache_home, 'pdark-i18n') == os.path.dirname(cache_file)
+        assert os.path.exists(cache_file)
+        assert [] == os.listdir(cwd)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+# Run the smoke profile of the scale harness against the checked-in ceilings.
+#
+# Only the allocation ceilings are checked; throughput and RSS depend on the
+# machine, so run the harness by hand for those.
+
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class TestScale(unittest.TestCase):
+    def test_smoke_profile(self):
+        # A new process, so the memory of other tests doesn't count
+        harness = os.path.join(ROOT, 'benchmarks', 'scale_harness.py')
+        result = subprocess.run([sys.executable, harness, '--profile', 'smoke', '--allocations-only'], cwd=ROOT, capture_output=True, text=True)
+        assert 0 == result.returncode, result.stdout + result.stderr
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+from pdark.i18n import *
+from pdark.i18n.test_support import *
+import datetime
+import unittest
+import pdark.i18n.babel
+
+setupLogging()
+
+EN_LOCALE = 'en'
+DE_LOCALE = 'de'
+DE_CH_LOCALE = 'de_CH'
+
+@i18n
+def greeting(name):
+    pass
+
+@i18n
+def farewell(name):
+    pass
+
+class TestWarmUp(unittest.TestCase):
+    def setUp(self):
+        self.service = TranslationService(default_locale=EN_LOCALE)
+        pdark.i18n.babel.setup(self.service)
+        
+        message_provider = self.service.message_provider
+        message_provider.register_message('test_warm_up.greeting', EN_LOCALE, ['Hello, ', {'arg': 'name'}])
+        message_provider.register_message('test_warm_up.greeting', DE_LOCALE, ['Hallo, ', {'arg': 'name'}])
+        message_provider.register_message('test_warm_up.farewell', DE_LOCALE, ['Tschüss, ', {'arg': 'name'}])
+    
+    def test_resolves_all_keys(self):
+        report = self.service.warm_up([DE_CH_LOCALE, EN_LOCALE])
+        
+        message_provider = self.service.message_provider
+        assert set(['test_warm_up.greeting', 'test_warm_up.farewell']) == message_provider.cached_keys(DE_CH_LOCALE)
+        assert set(['test_warm_up.greeting']) == message_provider.cached_keys(EN_LOCALE)
+        assert {EN_LOCALE: ['test_warm_up.farewell']} == report.missing
+        assert [DE_CH_LOCALE, EN_LOCALE] == report.locales
+    
+    def test_fallback_chains(self):
+        self.service.warm_up([DE_CH_LOCALE])
+        assert (DE_CH_LOCALE, DE_LOCALE, EN_LOCALE) == self.service.message_provider.fallback_cache[DE_CH_LOCALE]
+    
+    def test_selected_keys(self):
+        report = self.service.warm_up([EN_LOCALE], keys=['test_warm_up.greeting'])
+        assert {} == report.missing
+        assert set(['test_warm_up.greeting']) == self.service.message_provider.cached_keys(EN_LOCALE)
+    
+    def test_phases(self):
+        report = self.service.warm_up([DE_LOCALE], sample_args=[datetime.date(2017, 1, 1), 'x'])
+        assert ['keys', 'fallback', 'formatters', 'messages', 'samples'] == list(report.phases)
+        assert report.total >= sum(report.phases.values())
+        assert 'Warm up of 1 locales, 2 keys (0 missing)' in str(report)
+    
+    def test_samples_fill_formatter_cache(self):
+        self.service.warm_up([DE_LOCALE], sample_args=[datetime.date(2017, 1, 1)])
+        assert datetime.date in self.service.formatter_factory.cache
+    
+    def test_ready(self):
+        assert not self.service.ready.is_set()
+        self.service.warm_up([DE_LOCALE])
+        assert self.service.ready.wait(0)
+    
+    def test_thread_pool(self):
+        locales = ['de', 'de_CH', 'de_AT', 'en', 'en_US', 'en_GB']
+        report = self.service.warm_up(locales, sample_args=[datetime.date(2017, 1, 1)], max_workers=3)
+        assert sorted(locales) == sorted(report.locales)
+        for locale in locales:
+            assert 'test_warm_up.greeting' in self.service.message_provider.cached_keys(locale)
+    
+    def test_register_message_clears_lookup(self):
+        self.service.warm_up([DE_CH_LOCALE])
+        self.service.message_provider.register_message('test_warm_up.greeting', DE_CH_LOCALE, ['Grüezi, ', {'arg': 'name'}])
+        assert 'Grüezi, Hans' == self.service.translate(greeting('Hans'), DE_CH_LOCALE)
+
+if __name__ == '__main__':
+    unittest.main()
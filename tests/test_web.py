@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+from pdark.i18n import *
+from pdark.i18n import I18nException, current_locale
+from pdark.i18n.catalog import CatalogPatch
+from pdark.i18n.test_support import *
+from pdark.i18n.web import I18nAsgiMiddleware, I18nWsgiMiddleware, JsonPayload, send_payload
+import json
+import unittest
+
+EN_LOCALE = 'en'
+DE_LOCALE = 'de'
+
+@i18n
+def title():
+    pass
+
+@i18n
+def greeting(name):
+    pass
+
+@i18n
+def broken():
+    pass
+
+def create_service():
+    ts = TranslationService(default_locale=EN_LOCALE)
+    ts.message_provider.merge_catalogs({
+        EN_LOCALE: {
+            'test_web.title': 'Welcome',
+            'test_web.greeting': ['Hello, ', {'arg': 'name'}],
+            'test_web.broken': ['Oops ', {'arg': 'missing'}],
+        },
+        DE_LOCALE: {
+            'test_web.title': 'Willkommen',
+            'test_web.greeting': ['Hallo, ', {'arg': 'name'}],
+        },
+    })
+    return ts
+
+def payload_app(environ, start_response):
+    shared = title()
+    return JsonPayload({'title': shared, 'again': shared, 'items': [greeting(title()), 5, None], 'locale': environ['pdark.i18n.locale']})
+
+def plain_app(environ, start_response):
+    ts = environ['test.ts']
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    lazy = ts.lazy(title())
+    # The body is created while the server iterates
+    return (('%s/%s' % (ts.translate(greeting('Bob')), lazy)).encode('utf-8') for i in range(1))
+
+async def asgi_app(scope, receive, send):
+    if scope['path'] == '/plain':
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [(b'content-type', b'text/plain')]})
+        await send({'type': 'http.response.body', 'body': current_locale.get().encode('utf-8')})
+        return
+    
+    await send_payload(send, {'greeting': greeting(title())}, status=201, headers=[(b'x-test', b'1')])
+
+class TestWsgiMiddleware(unittest.TestCase):
+    def setUp(self):
+        setupLogging()
+        self.ts = shared_service(create_service)
+    
+    def test_payload(self):
+        app = I18nWsgiMiddleware(payload_app, self.ts)
+        status, headers, body = wsgi_request(app, headers={'Accept-Language': 'de-CH, en;q=0.5'})
+        
+        assert '200 OK' == status
+        assert 'de' == headers['Content-Language']
+        assert 'application/json; charset=utf-8' == headers['Content-Type']
+        assert {'title': 'Willkommen', 'again': 'Willkommen', 'items': ['Hallo, Willkommen', 5, None], 'locale': 'de'} == json.loads(body)
+    
+    def test_default_locale(self):
+        app = I18nWsgiMiddleware(payload_app, self.ts)
+        status, headers, body = wsgi_request(app)
+        
+        assert 'en' == headers['Content-Language']
+        assert 'Hello, Welcome' == json.loads(body)['items'][0]
+    
+    def test_batch_renders_shared_messages_once(self):
+        ts = overlay_service(self.ts)
+        provider = ts.message_provider
+        lookups = []
+        def lookup_message(i18n_message, locale):
+            lookups.append(i18n_message.key)
+            return type(provider).lookup_message(provider, i18n_message, locale)
+        provider.lookup_message = lookup_message
+        
+        wsgi_request(I18nWsgiMiddleware(payload_app, ts))
+        assert ['test_web.title', 'test_web.greeting', 'test_web.title'] == lookups
+    
+    def test_plain_response(self):
+        app = I18nWsgiMiddleware(plain_app, self.ts)
+        def wrapped(environ, start_response):
+            environ['test.ts'] = self.ts
+            return app(environ, start_response)
+        
+        status, headers, body = wsgi_request(wrapped, headers={'Accept-Language': 'de'})
+        assert 'text/plain' == headers['Content-Type']
+        assert 'Hallo, Bob/Willkommen' == body.decode('utf-8')
+        
+        # The locale is only bound during the request
+        assert None == current_locale.get()
+        assert 'Hello, Bob' == self.ts.translate(greeting('Bob'))
+    
+    def test_lazy_translation_follows_request_locale(self):
+        lazy = self.ts.lazy(title())
+        app = I18nWsgiMiddleware(lambda environ, start_response: JsonPayload({'lazy': lazy, 'plain': title()}), self.ts)
+        
+        status, headers, body = wsgi_request(app, headers={'Accept-Language': 'en'})
+        assert {'lazy': 'Welcome', 'plain': 'Welcome'} == json.loads(body)
+        status, headers, body = wsgi_request(app, headers={'Accept-Language': 'de'})
+        assert {'lazy': 'Willkommen', 'plain': 'Willkommen'} == json.loads(body)
+    
+    def test_locales_added_later(self):
+        ts = TranslationService(default_locale=EN_LOCALE)
+        app = I18nWsgiMiddleware(lambda environ, start_response: JsonPayload([title()]), ts)
+        ts.message_provider.register_message('test_web.title', EN_LOCALE, 'Welcome')
+        
+        status, headers, body = wsgi_request(app, headers={'Accept-Language': 'de'})
+        assert 'en' == headers['Content-Language']
+        
+        ts.message_provider.merge_catalogs({DE_LOCALE: {'test_web.title': 'Willkommen'}})
+        status, headers, body = wsgi_request(app, headers={'Accept-Language': 'de'})
+        assert 'de' == headers['Content-Language']
+        assert ['Willkommen'] == json.loads(body)
+        
+        ts.message_provider.apply_patch(CatalogPatch(1).add('fr', 'test_web.title', 'Bienvenue'))
+        status, headers, body = wsgi_request(app, headers={'Accept-Language': 'fr'})
+        assert 'fr' == headers['Content-Language']
+    
+    def test_error(self):
+        app = I18nWsgiMiddleware(lambda environ, start_response: JsonPayload([broken()]), self.ts)
+        with self.assertRaisesRegex(I18nException, r"Error translating I18NMessage\(test_web.broken, \(\), \{\}\), locale='en'"):
+            wsgi_request(app)
+
+class TestAsgiMiddleware(unittest.TestCase):
+    def setUp(self):
+        setupLogging()
+        self.ts = shared_service(create_service)
+        self.app = I18nAsgiMiddleware(asgi_app, self.ts)
+    
+    def test_payload(self):
+        status, headers, body = asgi_request(self.app, headers={'Accept-Language': 'de'})
+        
+        assert 201 == status
+        assert 'de' == headers['content-language']
+        assert '1' == headers['x-test']
+        assert {'greeting': 'Hallo, Willkommen'} == json.loads(body)
+    
+    def test_plain_response(self):
+        status, headers, body = asgi_request(self.app, '/plain', headers={'Accept-Language': 'fr, de;q=0.8'})
+        assert b'de' == body
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2017 Aaron Digulla
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+from pdark.i18n import *
+from pdark.i18n import I18nException, message_id
+from pdark.i18n.wire import decode_messages, encode_messages
+import datetime
+import pickle
+import unittest
+
+@i18n
+def hello(name):
+    pass
+
+@i18n
+def items(first, *rest):
+    pass
+
+@i18n
+def with_default(value, unit='m'):
+    pass
+
+def round_trip(*messages):
+    return decode_messages(encode_messages(list(messages)))
+
+def same(a, b):
+    '''Compare with types, since 1 == 1.0 == True'''
+    if type(a) != type(b):
+        return False
+    if isinstance(a, I18NMessage):
+        return a.key == b.key and a.locale == b.locale and same(a.args, b.args) and same(a.kwargs, b.kwargs)
+    if isinstance(a, (list, tuple)):
+        return len(a) == len(b) and all(same(x, y) for x, y in zip(a, b))
+    if isinstance(a, dict):
+        return list(a) == list(b) and all(same(a[key], b[key]) for key in a)
+    return a == b
+
+VALUES = [
+    None, True, False, 0, 1, 254, 255, -1, 2**63 - 1, -2**63, 2**100, -2**100,
+    0.0, -1.5, 1e300, '', 'text', 'äöü €', 'x' * 1000, b'', b'\x00\xff',
+    [], [1, [2, 'a']], (), (1, 2), {}, {'a': 1, 2: (3,)},
+    datetime.date(2016, 12, 26), datetime.datetime(2016, 12, 26, 13, 14, 15, 123456),
+    datetime.datetime(2016, 12, 26, 13, 14, tzinfo=datetime.timezone(datetime.timedelta(hours=2))),
+    datetime.timedelta(days=-3, seconds=5, microseconds=7),
+]
+
+class TestWireFormat(unittest.TestCase):
+    def test_values(self):
+        for value in VALUES:
+            decoded, = round_trip(hello(value))
+            assert same(hello(value), decoded), value
+    
+    def test_locale(self):
+        decoded, = round_trip(hello('Anna').with_locale('de'))
+        assert 'de' == decoded.locale
+    
+    def test_nested(self):
+        message = hello([hello('a'), items(hello('b'), 'c')])
+        decoded, = round_trip(message)
+        assert same(message, decoded)
+        assert message == decoded
+    
+    def test_kwargs_share_args(self):
+        decoded, = round_trip(items('a', 'b', 'c'))
+        assert ('a', 'b', 'c') == decoded.args
+        assert {'first': 'a', 'rest': ('b', 'c')} == decoded.kwargs
+        assert decoded.kwargs['first'] is decoded.args[0]
+    
+    def test_default_values(self):
+        decoded, = round_trip(with_default(5))
+        assert {'value': 5, 'unit': 'm'} == decoded.kwargs
+    
+    def test_key_id(self):
+        decoded, = round_trip(hello('Anna'))
+        assert message_id('test_wire.hello') == decoded.key_id
+    
+    def test_memoryview(self):
+        data = bytearray(b'xx' + encode_messages([hello('Anna')]))
+        decoded, = decode_messages(memoryview(data)[2:])
+        assert hello('Anna') == decoded
+    
+    def test_batch_writes_key_once(self):
+        messages = [hello(i) for i in range(100)]
+        data = encode_messages(messages)
+        assert 1 == data.count(b'test_wire.hello')
+        assert len(data) < len(pickle.dumps(messages, pickle.HIGHEST_PROTOCOL)) / 3
+        assert messages == decode_messages(data)
+    
+    def test_unsupported_type(self):
+        with self.assertRaisesRegex(I18nException, 'Unsupported type object'):
+            encode_messages([hello(object())])
+    
+    def test_not_encoded(self):
+        with self.assertRaisesRegex(I18nException, 'Not an encoded batch'):
+            decode_messages(b'hello')
+
+if __name__ == '__main__':
+    unittest.main()